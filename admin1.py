@@ -1,12 +1,137 @@
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
-from sqlalchemy import func
+from sqlalchemy import func, not_
+from sqlalchemy.orm import selectinload
 
-from src.models.cms import db, Company, News, Job, Property, Review, User, SiteSettings
+from src.models.cms import db, Company, CompanyPhoto, News, Job, Property, Review, User, SiteSettings
 from src.routes.auth import require_admin
+from src.utils.cache import notify_model_changed
+from src.utils.file_cleanup import collect_orphans, delete_files_after_commit
+from src.utils.patching import RowNotFound, patch_row
+from src.utils.pagination import PaginationError, keyset_paginate, parse_date, parse_limit, parse_sort
+from src.utils.slow_queries import get_top_offenders, reset_slow_queries
+from src.utils.tasks import enqueue
+from src.utils.sync import record_tombstones
+from src.utils.suggest import schedule_refresh
 
 admin_bp = Blueprint('admin', __name__)
 
+# Máximo de IDs explícitos por operação em massa (acima disso, use "filter")
+BULK_MAX_IDS = 1000
+
+COMPANY_BULK_ACTIONS = {
+    'approve': {'approved': True},
+    'reject': {'approved': False},
+    'feature': {'featured': True},
+    'unfeature': {'featured': False},
+    'delete': None
+}
+
+REVIEW_BULK_ACTIONS = {
+    'approve': {'approved': True},
+    'delete': None
+}
+
+# Critérios aceitos em "filter" nas operações em massa
+COMPANY_FILTER_KEYS = ('category', 'plan', 'approved', 'created_from', 'created_to')
+REVIEW_FILTER_KEYS = ('company_id', 'rating', 'approved', 'created_from', 'created_to')
+
+# Configurações padrão se não existirem no banco
+DEFAULT_SETTINGS = {
+    'site_title': 'Eu Indico Cabreúva',
+    'site_description': 'Guia Completo da Cidade',
+    'contact_phone': '(11) 4528-1000',
+    'contact_email': 'contato@euindicocabreuva.com.br',
+    'hero_background_color': '#065f46',
+    'primary_color': '#10b981',
+    'secondary_color': '#059669'
+}
+
+def get_settings_dict():
+    """Configurações do site, completadas com os valores padrão"""
+    settings_dict = dict(DEFAULT_SETTINGS)
+    settings_dict.update((setting.key, setting.value) for setting in SiteSettings.query.all())
+    return settings_dict
+
+def _int_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise PaginationError(f'Valor inválido em "{name}"')
+
+def filter_companies(query, params):
+    """Aplicar filtros de moderação (category, plan, approved, datas) às empresas"""
+    category = params.get('category')
+    plan = params.get('plan')
+    approved = params.get('approved')
+    created_from = parse_date(params.get('created_from'), 'created_from')
+    created_to = parse_date(params.get('created_to'), 'created_to')
+    
+    if category:
+        query = query.filter(Company.category == category)
+    if plan:
+        query = query.filter(Company.plan == plan)
+    if approved is not None:
+        query = query.filter(Company.approved == (str(approved).lower() == 'true'))
+    if created_from:
+        query = query.filter(Company.created_at >= created_from)
+    if created_to:
+        query = query.filter(Company.created_at < created_to)
+    return query
+
+def filter_reviews(query, params):
+    """Aplicar filtros de moderação (company_id, rating, approved, datas) às avaliações"""
+    company_id = _int_param(params, 'company_id')
+    rating = _int_param(params, 'rating')
+    approved = params.get('approved')
+    created_from = parse_date(params.get('created_from'), 'created_from')
+    created_to = parse_date(params.get('created_to'), 'created_to')
+    
+    if company_id is not None:
+        query = query.filter(Review.company_id == company_id)
+    if rating is not None:
+        query = query.filter(Review.rating == rating)
+    if approved is not None:
+        query = query.filter(Review.approved == (str(approved).lower() == 'true'))
+    if created_from:
+        query = query.filter(Review.created_at >= created_from)
+    if created_to:
+        query = query.filter(Review.created_at < created_to)
+    return query
+
+def _bulk_query(model, data, filter_fn, filter_keys):
+    """Selecionar as linhas de uma operação em massa (por ids ou por filtro).
+
+    O filtro só aceita os critérios de ``filter_keys``, todos preenchidos:
+    uma chave digitada errado ou vazia seria ignorada pelo filter_fn e a
+    ação alcançaria todas as linhas.
+    """
+    ids = data.get('ids')
+    filters = data.get('filter')
+    
+    if ids:
+        if not isinstance(ids, list) or len(ids) > BULK_MAX_IDS:
+            raise PaginationError(f'"ids" deve ser uma lista com até {BULK_MAX_IDS} itens')
+        try:
+            ids = [int(item_id) for item_id in ids]
+        except (TypeError, ValueError):
+            raise PaginationError('"ids" deve conter apenas números')
+        return model.query.filter(model.id.in_(ids))
+    
+    if isinstance(filters, dict) and filters:
+        unknown = sorted(set(filters) - set(filter_keys))
+        if unknown:
+            raise PaginationError(f'Filtro desconhecido: {", ".join(unknown)} (use {", ".join(filter_keys)})')
+        empty = sorted(key for key, value in filters.items() if value is None or value == '')
+        if empty:
+            raise PaginationError(f'Filtro vazio: {", ".join(empty)}')
+        return filter_fn(model.query, filters)
+    
+    raise PaginationError('Informe "ids" ou "filter"')
+
 @admin_bp.route('/dashboard/stats', methods=['GET'])
 @cross_origin()
 @require_admin
@@ -65,12 +190,34 @@ def get_dashboard_stats():
 @cross_origin()
 @require_admin
 def get_pending_companies():
-    """Obter empresas pendentes de aprovação"""
+    """Obter empresas pendentes de aprovação (paginação por cursor e filtros)"""
     try:
-        companies = Company.query.filter_by(approved=False).order_by(Company.created_at.desc()).all()
+        query = filter_companies(Company.query.filter(Company.approved == False), request.args)
+        
+        # Modo barato para os contadores do cabeçalho do admin
+        if request.args.get('count_only', 'false').lower() == 'true':
+            return jsonify({'total': query.order_by(None).count()})
+        
+        sort_column, descending = parse_sort(
+            request.args.get('sort'),
+            {'created_at': Company.created_at, 'name': Company.name},
+            '-created_at'
+        )
+        limit = parse_limit(request.args.get('limit', type=int))
+        
+        companies, next_cursor = keyset_paginate(
+            query.options(selectinload(Company.photos)),
+            sort_column, Company.id, descending,
+            request.args.get('cursor'), limit
+        )
+        
         return jsonify({
-            'companies': [company.to_dict() for company in companies]
+            'companies': [company.to_dict() for company in companies],
+            'next_cursor': next_cursor,
+            'limit': limit
         })
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -114,18 +261,71 @@ def reject_company(company_id):
 @cross_origin()
 @require_admin
 def toggle_company_feature(company_id):
-    """Alternar destaque da empresa"""
+    """Alternar destaque da empresa (UPDATE atômico, sem ler antes)"""
     try:
-        company = Company.query.get_or_404(company_id)
-        company.featured = not company.featured
+        company = patch_row(Company, company_id, {'featured': not_(Company.featured)})
         db.session.commit()
         
-        status = "destacada" if company.featured else "removida dos destaques"
+        status = "destacada" if company['featured'] else "removida dos destaques"
         return jsonify({
             'success': True,
-            'featured': company.featured,
-            'message': f'Empresa "{company.name}" {status}'
+            'featured': company['featured'],
+            'version': company['version'],
+            'message': f'Empresa "{company["name"]}" {status}'
         })
+    except RowNotFound:
+        db.session.rollback()
+        return jsonify({'error': 'Empresa não encontrada'}), 404
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/companies/bulk', methods=['POST'])
+@cross_origin()
+@require_admin
+def bulk_moderate_companies():
+    """Aprovar, rejeitar, destacar ou deletar várias empresas de uma vez"""
+    try:
+        data = request.json or {}
+        action = data.get('action')
+        
+        if action not in COMPANY_BULK_ACTIONS:
+            return jsonify({'error': f'Ação inválida: use {", ".join(COMPANY_BULK_ACTIONS)}'}), 400
+        
+        query = _bulk_query(Company, data, filter_companies, COMPANY_FILTER_KEYS)
+        
+        if action == 'delete':
+            deleted_ids = [company_id for (company_id,) in query.with_entities(Company.id)]
+            record_tombstones(Company, deleted_ids)
+            enqueue('related.remove', {'entity': 'company', 'item_ids': deleted_ids})
+            company_ids = query.with_entities(Company.id).scalar_subquery()
+            delete_files_after_commit([filename for (filename,) in db.session.query(CompanyPhoto.filename).filter(
+                CompanyPhoto.company_id.in_(company_ids)
+            )])
+            # DELETE em massa não aplica o cascade do ORM: remover dependentes antes
+            CompanyPhoto.query.filter(CompanyPhoto.company_id.in_(company_ids)).delete(synchronize_session=False)
+            Review.query.filter(Review.company_id.in_(company_ids)).delete(synchronize_session=False)
+            affected = query.delete(synchronize_session=False)
+        else:
+            values = dict(COMPANY_BULK_ACTIONS[action], version=Company.version + 1)
+            affected = query.update(values, synchronize_session=False)
+        
+        # UPDATE/DELETE em massa não passa pelo flush: agendar o índice de sugestões aqui
+        schedule_refresh()
+        db.session.commit()
+        
+        # Uma única invalidação de cache para o lote (arquivos saem após o commit)
+        notify_model_changed(Company, CompanyPhoto, Review)
+        
+        return jsonify({
+            'success': True,
+            'action': action,
+            'affected': affected,
+            'message': f'{affected} empresa(s) processada(s)'
+        })
+    except PaginationError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -134,11 +334,28 @@ def toggle_company_feature(company_id):
 @cross_origin()
 @require_admin
 def get_pending_reviews():
-    """Obter avaliações pendentes de aprovação"""
+    """Obter avaliações pendentes de aprovação (paginação por cursor e filtros)"""
     try:
-        reviews = db.session.query(Review, Company.name).join(
+        query = db.session.query(Review, Company.name).join(
             Company, Review.company_id == Company.id
-        ).filter(Review.approved == False).order_by(Review.created_at.desc()).all()
+        ).filter(Review.approved == False)
+        query = filter_reviews(query, request.args)
+        
+        # Modo barato para os contadores do cabeçalho do admin
+        if request.args.get('count_only', 'false').lower() == 'true':
+            return jsonify({'total': query.with_entities(func.count(Review.id)).scalar()})
+        
+        sort_column, descending = parse_sort(
+            request.args.get('sort'),
+            {'created_at': Review.created_at, 'rating': Review.rating},
+            '-created_at'
+        )
+        limit = parse_limit(request.args.get('limit', type=int))
+        
+        reviews, next_cursor = keyset_paginate(
+            query, sort_column, Review.id, descending,
+            request.args.get('cursor'), limit
+        )
         
         result = []
         for review, company_name in reviews:
@@ -146,7 +363,9 @@ def get_pending_reviews():
             review_dict['company_name'] = company_name
             result.append(review_dict)
         
-        return jsonify({'reviews': result})
+        return jsonify({'reviews': result, 'next_cursor': next_cursor, 'limit': limit})
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -158,6 +377,8 @@ def reject_review(review_id):
     try:
         review = Review.query.get_or_404(review_id)
         db.session.delete(review)
+        if review.approved:
+            enqueue('companies.recompute_ratings', {'company_ids': [review.company_id]})
         db.session.commit()
         
         return jsonify({
@@ -168,31 +389,53 @@ def reject_review(review_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@admin_bp.route('/reviews/bulk', methods=['POST'])
+@cross_origin()
+@require_admin
+def bulk_moderate_reviews():
+    """Aprovar ou deletar várias avaliações de uma vez"""
+    try:
+        data = request.json or {}
+        action = data.get('action')
+        
+        if action not in REVIEW_BULK_ACTIONS:
+            return jsonify({'error': f'Ação inválida: use {", ".join(REVIEW_BULK_ACTIONS)}'}), 400
+        
+        query = _bulk_query(Review, data, filter_reviews, REVIEW_FILTER_KEYS)
+        
+        # Notas das empresas afetadas são recalculadas pela fila
+        company_ids = [company_id for (company_id,) in query.with_entities(Review.company_id).distinct()]
+        if company_ids:
+            enqueue('companies.recompute_ratings', {'company_ids': company_ids})
+        
+        if action == 'delete':
+            affected = query.delete(synchronize_session=False)
+        else:
+            affected = query.update(REVIEW_BULK_ACTIONS[action], synchronize_session=False)
+        
+        db.session.commit()
+        notify_model_changed(Review)
+        
+        return jsonify({
+            'success': True,
+            'action': action,
+            'affected': affected,
+            'message': f'{affected} avaliação(ões) processada(s)'
+        })
+    except PaginationError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @admin_bp.route('/settings', methods=['GET'])
 @cross_origin()
 @require_admin
 def get_site_settings():
     """Obter configurações do site"""
     try:
-        settings = SiteSettings.query.all()
-        settings_dict = {setting.key: setting.value for setting in settings}
-        
-        # Configurações padrão se não existirem
-        default_settings = {
-            'site_title': 'Eu Indico Cabreúva',
-            'site_description': 'Guia Completo da Cidade',
-            'contact_phone': '(11) 4528-1000',
-            'contact_email': 'contato@euindicocabreuva.com.br',
-            'hero_background_color': '#065f46',
-            'primary_color': '#10b981',
-            'secondary_color': '#059669'
-        }
-        
-        for key, default_value in default_settings.items():
-            if key not in settings_dict:
-                settings_dict[key] = default_value
-        
-        return jsonify({'settings': settings_dict})
+        return jsonify({'settings': get_settings_dict()})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -227,12 +470,43 @@ def update_site_settings():
 @cross_origin()
 @require_admin
 def get_users():
-    """Listar todos os usuários"""
+    """Listar usuários (paginação por cursor e filtros)"""
     try:
-        users = User.query.order_by(User.created_at.desc()).all()
+        query = User.query
+        
+        is_admin = request.args.get('is_admin')
+        created_from = parse_date(request.args.get('created_from'), 'created_from')
+        created_to = parse_date(request.args.get('created_to'), 'created_to')
+        
+        if is_admin is not None:
+            query = query.filter(User.is_admin == (is_admin.lower() == 'true'))
+        if created_from:
+            query = query.filter(User.created_at >= created_from)
+        if created_to:
+            query = query.filter(User.created_at < created_to)
+        
+        if request.args.get('count_only', 'false').lower() == 'true':
+            return jsonify({'total': query.order_by(None).count()})
+        
+        sort_column, descending = parse_sort(
+            request.args.get('sort'),
+            {'created_at': User.created_at, 'name': User.name, 'email': User.email},
+            '-created_at'
+        )
+        limit = parse_limit(request.args.get('limit', type=int))
+        
+        users, next_cursor = keyset_paginate(
+            query, sort_column, User.id, descending,
+            request.args.get('cursor'), limit
+        )
+        
         return jsonify({
-            'users': [user.to_dict() for user in users]
+            'users': [user.to_dict() for user in users],
+            'next_cursor': next_cursor,
+            'limit': limit
         })
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -240,19 +514,56 @@ def get_users():
 @cross_origin()
 @require_admin
 def toggle_user_admin(user_id):
-    """Alternar status de admin do usuário"""
+    """Alternar status de admin do usuário (UPDATE atômico, sem ler antes)"""
     try:
-        user = User.query.get_or_404(user_id)
-        user.is_admin = not user.is_admin
+        user = patch_row(User, user_id, {'is_admin': not_(User.is_admin)})
         db.session.commit()
         
-        status = "promovido a administrador" if user.is_admin else "removido da administração"
+        status = "promovido a administrador" if user['is_admin'] else "removido da administração"
         return jsonify({
             'success': True,
-            'is_admin': user.is_admin,
-            'message': f'Usuário "{user.name}" {status}'
+            'is_admin': user['is_admin'],
+            'message': f'Usuário "{user["name"]}" {status}'
         })
+    except RowNotFound:
+        db.session.rollback()
+        return jsonify({'error': 'Usuário não encontrado'}), 404
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@admin_bp.route('/slow-queries', methods=['GET'])
+@cross_origin()
+@require_admin
+def get_slow_queries():
+    """Consultas lentas mais custosas (agregadas por instrução, por worker)"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        order_by = {
+            'total': 'total_time',
+            'count': 'count',
+            'max': 'max_time'
+        }.get(request.args.get('order_by', 'total'), 'total_time')
+        
+        return jsonify({'queries': get_top_offenders(limit=limit, order_by=order_by)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/slow-queries', methods=['DELETE'])
+@cross_origin()
+@require_admin
+def clear_slow_queries():
+    """Limpar o registro de consultas lentas"""
+    reset_slow_queries()
+    return jsonify({'success': True, 'message': 'Registro de consultas lentas limpo'})
+
+@admin_bp.route('/uploads/gc', methods=['POST'])
+@cross_origin()
+@require_admin
+def run_uploads_gc():
+    """Reconciliar fotos do banco com a pasta de uploads e remover órfãos"""
+    try:
+        dry_run = request.args.get('dry_run', 'true').lower() == 'true'
+        return jsonify({'report': collect_orphans(dry_run=dry_run)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
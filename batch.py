@@ -0,0 +1,124 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_cors import cross_origin
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+batch_bp = Blueprint('batch', __name__)
+
+# Padrão (pode ser sobrescrito via app.config['BATCH_MAX_REQUESTS'])
+BATCH_MAX_REQUESTS = 20
+
+# Cabeçalhos repassados às sub-requisições (sessão/autenticação compartilhadas)
+FORWARDED_HEADERS = ('Cookie', 'Authorization', 'Accept-Language')
+
+
+def not_batchable(view):
+    """Marcar uma rota que não pode rodar dentro do lote (ex.: streams SSE)"""
+    view.batch_excluded = True
+    return view
+
+
+def _batchable(response):
+    # Só corpos JSON/texto já prontos: arquivos e streams ficariam presos no lote
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    mimetype = response.mimetype or ''
+    return mimetype == 'application/json' or mimetype.endswith('+json') or mimetype.startswith('text/')
+
+
+def _unsupported():
+    response = jsonify({'error': 'Rota não suportada no lote (resposta em stream ou arquivo)'})
+    response.status_code = 415
+    return response
+
+
+def _dispatch(app, path):
+    """Executar um GET interno pela mesma tabela de rotas dos blueprints"""
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    builder = EnvironBuilder(
+        path=path,
+        method='GET',
+        base_url=request.host_url,
+        headers=headers
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    # Roda só a view (sem before/after_request de novo): o app context, a
+    # sessão do banco e o usuário já carregado são compartilhados com o lote
+    with app.request_context(environ):
+        rule = request.url_rule
+        if rule is not None and getattr(app.view_functions.get(rule.endpoint), 'batch_excluded', False):
+            return _unsupported()
+        try:
+            response = app.make_response(app.dispatch_request())
+        except HTTPException as e:
+            response = e.get_response()
+        except Exception as e:
+            response = jsonify({'error': str(e)})
+            response.status_code = 500
+
+        if not _batchable(response):
+            response.close()
+            return _unsupported()
+
+    return response
+
+
+@batch_bp.route('/batch', methods=['POST'])
+@cross_origin(supports_credentials=True)
+def batch():
+    """Executar vários GETs internos em uma única requisição"""
+    try:
+        data = request.get_json(silent=True) or {}
+        sub_requests = data.get('requests')
+
+        if not isinstance(sub_requests, list) or not sub_requests:
+            return jsonify({'error': 'Informe uma lista "requests"'}), 400
+
+        max_requests = current_app.config.get('BATCH_MAX_REQUESTS', BATCH_MAX_REQUESTS)
+        if len(sub_requests) > max_requests:
+            return jsonify({'error': f'Máximo de {max_requests} requisições por lote'}), 400
+
+        app = current_app._get_current_object()
+        responses = []
+
+        for index, item in enumerate(sub_requests):
+            if isinstance(item, str):
+                item = {'path': item}
+            if not isinstance(item, dict):
+                responses.append({'id': index, 'path': None, 'status': 400,
+                                  'body': {'error': 'Item inválido: use um caminho ou {"path": ...}'}})
+                continue
+            item_id = item.get('id', index)
+            path = item.get('path') or ''
+            method = item.get('method', 'GET')
+
+            if not isinstance(path, str) or not isinstance(method, str):
+                responses.append({'id': item_id, 'path': None, 'status': 400,
+                                  'body': {'error': 'Item inválido: "path" e "method" devem ser texto'}})
+                continue
+            method = method.upper()
+
+            if method != 'GET':
+                responses.append({'id': item_id, 'path': path, 'status': 405,
+                                  'body': {'error': 'Apenas GET é permitido no lote'}})
+                continue
+
+            if not path.startswith('/api/') or path.split('?', 1)[0].rstrip('/') == '/api/batch':
+                responses.append({'id': item_id, 'path': path, 'status': 400,
+                                  'body': {'error': 'Caminho inválido'}})
+                continue
+
+            response = _dispatch(app, path)
+            body = response.get_json(silent=True)
+            if body is None:
+                body = response.get_data(as_text=True)
+            responses.append({'id': item_id, 'path': path, 'status': response.status_code, 'body': body})
+
+        return jsonify({'responses': responses})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,125 @@
+"""Benchmark: to_dict escrito à mão + json da stdlib vs serializador compilado + orjson.
+
+Também mede só a montagem dos dicts (sem JSON), onde entra a leitura direta
+do __dict__ das instâncias já carregadas.
+
+Uso: python bench_serialization.py [linhas] [repetições]
+"""
+import json
+import sys
+import os
+import timeit
+
+from src_layout import bootstrap
+bootstrap()  # src.* a partir dos módulos da raiz (como nos testes)
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from src.models.cms import db, Company, CompanyPhoto
+from src.utils.serializers import ORJSONProvider, ISOJSONProvider, orjson
+
+
+def legacy_photo_to_dict(photo):
+    return {
+        'id': photo.id,
+        'filename': photo.filename,
+        'original_name': photo.original_name,
+        'is_main': photo.is_main,
+        'url': f'/api/photos/{photo.filename}',
+        'created_at': photo.created_at.isoformat()
+    }
+
+
+def legacy_company_to_dict(company):
+    """Cópia do Company.to_dict anterior aos serializadores compilados"""
+    return {
+        'id': company.id,
+        'name': company.name,
+        'description': company.description,
+        'category': company.category,
+        'address': company.address,
+        'phone': company.phone,
+        'email': company.email,
+        'website': company.website,
+        'plan': company.plan,
+        'approved': company.approved,
+        'featured': company.featured,
+        'rating': company.rating,
+        'review_count': company.review_count,
+        'photos': [legacy_photo_to_dict(photo) for photo in company.photos],
+        'created_at': company.created_at.isoformat(),
+        'updated_at': company.updated_at.isoformat(),
+        # Acrescentados depois, de propósito (coordenadas e edição otimista)
+        'latitude': company.latitude,
+        'longitude': company.longitude,
+        'version': company.version
+    }
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        for i in range(rows):
+            company = Company(
+                name=f'Empresa {i}',
+                description='Descrição de exemplo ' * 10,
+                category='Alimentação',
+                address='Centro, Cabreúva',
+                phone='(11) 4528-1000',
+                email=f'contato{i}@exemplo.com.br',
+                approved=True
+            )
+            company.photos = [CompanyPhoto(filename=f'{i}-{n}.jpg', original_name='foto.jpg') for n in range(3)]
+            db.session.add(company)
+        db.session.commit()
+
+        companies = Company.query.all()
+        for company in companies:
+            company.photos  # carregar relacionamentos antes de medir
+
+        stdlib = DefaultJSONProvider(app)
+        iso = ISOJSONProvider(app)
+        serialize = Company.to_dict
+
+        cases = [
+            ('to_dict manual + json stdlib',
+             lambda: stdlib.dumps({'companies': [legacy_company_to_dict(c) for c in companies]})),
+            ('serializador compilado + json stdlib',
+             lambda: iso.dumps({'companies': [serialize(c) for c in companies]})),
+        ]
+        if orjson is not None:
+            fast = ORJSONProvider(app)
+            cases.append(('serializador compilado + orjson',
+                          lambda: fast.dumps({'companies': [serialize(c) for c in companies]})))
+
+        # Os caminhos devem produzir o mesmo documento
+        reference = json.loads(cases[0][1]())
+        for name, func in cases[1:]:
+            assert json.loads(func()) == reference, name
+
+        # Só a montagem dos dicts (o to_dict antigo já formatava as datas;
+        # o compilado deixa isso para o provider JSON)
+        dict_cases = [
+            ('to_dict manual (sem JSON)', lambda: [legacy_company_to_dict(c) for c in companies]),
+            ('serializador compilado (sem JSON)', lambda: [serialize(c) for c in companies]),
+        ]
+
+        for group in (cases, dict_cases):
+            baseline = None
+            for name, func in group:
+                elapsed = min(timeit.repeat(func, number=repeat, repeat=3))
+                per_second = rows * repeat / elapsed
+                baseline = baseline or per_second
+                print(f'{name:40s} {per_second:12,.0f} linhas/s  ({per_second / baseline:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark: pico de memória ao processar uma foto grande (caminho antigo vs draft).
+
+Cada modo roda em um subprocesso novo e mede o aumento do RSS máximo.
+Uso: python bench_uploads.py [largura] [altura]
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from src_layout import bootstrap
+bootstrap()  # src.* a partir dos módulos da raiz (como nos testes)
+
+from PIL import Image
+
+
+def _max_rss_mb():
+    # ru_maxrss é em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run(mode, source, target):
+    if mode == 'legacy':
+        def process():
+            # Caminho anterior das rotas de upload
+            image = Image.open(source)
+            image.thumbnail((1200, 800), Image.Resampling.LANCZOS)
+            if image.mode in ('RGBA', 'P'):
+                image = image.convert('RGB')
+            image.save(target, 'JPEG', quality=85, optimize=True)
+    else:
+        from src.utils.images import save_photo
+
+        def process():
+            with open(source, 'rb') as stream:
+                save_photo(stream, target)
+
+    before = _max_rss_mb()
+    start = time.perf_counter()
+    process()
+    elapsed = time.perf_counter() - start
+    print(f'{mode:8s} pico +{_max_rss_mb() - before:7.1f} MB  {elapsed * 1000:7.1f} ms')
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'foto.jpg')
+        # Gerada em outro processo: o RSS máximo do pai é herdado pelos filhos
+        subprocess.run([sys.executable, __file__, '--make', str(width), str(height), source], check=True)
+        print(f'Imagem de teste: {width}x{height} ({width * height / 1e6:.0f} MP), '
+              f'{os.path.getsize(source) / 1024 / 1024:.1f} MB em disco')
+
+        for mode in ('legacy', 'draft'):
+            subprocess.run(
+                [sys.executable, __file__, '--run', mode, source, os.path.join(tmp, mode + '.jpg')],
+                check=True
+            )
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--make':
+        Image.effect_noise((int(sys.argv[2]), int(sys.argv[3])), 64).convert('RGB').save(sys.argv[4], 'JPEG', quality=90)
+    elif len(sys.argv) > 1 and sys.argv[1] == '--run':
+        _run(*sys.argv[2:5])
+    else:
+        main()
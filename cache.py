@@ -0,0 +1,69 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.utils.metrics import record_cache_lookup
+
+
+class TTLCache:
+    """Cache em memória (por processo) com validade por chave"""
+
+    def __init__(self, name):
+        self.name = name
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            hit = entry is not None and entry[0] > time.monotonic()
+        record_cache_lookup(self.name, hit)
+        return entry[1] if hit else None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            if not keys:
+                self._data.clear()
+            for key in keys:
+                self._data.pop(key, None)
+
+
+# Modelo -> funções chamadas após um commit que altere linhas desse modelo
+_model_listeners = {}
+
+
+def on_model_commit(model, callback):
+    """Registrar callback(modelo) para commits que inserem/alteram/removem o modelo"""
+    _model_listeners.setdefault(model, []).append(callback)
+
+
+def notify_model_changed(*models):
+    """Disparar os callbacks manualmente (ex.: após UPDATE/DELETE em massa)"""
+    for model in models:
+        for callback in _model_listeners.get(model, ()):
+            callback(model)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_models(session, flush_context):
+    changed = session.info.setdefault('changed_models', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        changed.add(type(obj))
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_changed_models(session):
+    changed = session.info.pop('changed_models', None)
+    if changed:
+        notify_model_changed(*changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_models(session):
+    session.info.pop('changed_models', None)
@@ -0,0 +1,223 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import text
+
+from src.models.cms import db, Company, MapCell, Property
+
+# Modelos exibidos no mapa -> (tipo, coluna que decide se o pin aparece)
+CLUSTER_SOURCES = {Company: ('company', 'approved'), Property: ('property', 'active')}
+
+# Padrões (podem ser sobrescritos via app.config)
+MAP_MAX_CLUSTERS = 600  # células por tipo na resposta, qualquer que seja o volume
+
+# Zooms pré-agregados. A grade é em graus (aproximação equirretangular): no
+# zoom z uma célula mede 360 / 2^(z + CELL_SHIFT) graus, ~64 px na tela.
+MIN_ZOOM = 0
+MAX_ZOOM = 16
+CELL_SHIFT = 2
+
+
+def cell_size(zoom):
+    return 360.0 / 2 ** (zoom + CELL_SHIFT)
+
+
+def cell_of(lat, lng, zoom):
+    # Mesma conta das triggers (divisão e truncamento)
+    size = cell_size(zoom)
+    return int((lng + 180) / size), int((lat + 90) / size)
+
+
+def _zoom_values():
+    return ', '.join(f'({zoom}, {cell_size(zoom)!r})' for zoom in range(MIN_ZOOM, MAX_ZOOM + 1))
+
+
+def _sqlite_triggers(conn, model):
+    """Triggers que somam/subtraem o pin nas células de todos os zooms.
+
+    Lat/lng são deslocadas para valores positivos, então CAST trunca como floor.
+    Células que chegam a zero ficam na tabela e são ignoradas na leitura.
+    """
+    kind, visible = CLUSTER_SOURCES[model]
+    table = model.__table__.name
+
+    def apply(row, sign):
+        # Só pins visíveis e com coordenadas; sign='-' desfaz o pin anterior
+        return (
+            f"INSERT INTO map_cell (kind, zoom, x, y, count, lat_sum, lng_sum, id_sum) "
+            f"SELECT '{kind}', z.column1, CAST(({row}.longitude + 180) / z.column2 AS INTEGER), "
+            f"CAST(({row}.latitude + 90) / z.column2 AS INTEGER), {sign}1, {sign}{row}.latitude, "
+            f"{sign}{row}.longitude, {sign}{row}.id FROM (VALUES {_zoom_values()}) AS z "
+            f"WHERE {row}.{visible} AND {row}.latitude IS NOT NULL AND {row}.longitude IS NOT NULL "
+            f"ON CONFLICT (kind, zoom, x, y) DO UPDATE SET count = count + excluded.count, "
+            f"lat_sum = lat_sum + excluded.lat_sum, lng_sum = lng_sum + excluded.lng_sum, "
+            f"id_sum = id_sum + excluded.id_sum;"
+        )
+
+    conn.execute(text(
+        f'CREATE TRIGGER {table}_map_insert AFTER INSERT ON {table} BEGIN {apply("NEW", "")} END'
+    ))
+    conn.execute(text(
+        f'CREATE TRIGGER {table}_map_update AFTER UPDATE OF latitude, longitude, {visible} ON {table} '
+        f'BEGIN {apply("OLD", "-")} {apply("NEW", "")} END'
+    ))
+    conn.execute(text(
+        f'CREATE TRIGGER {table}_map_delete AFTER DELETE ON {table} BEGIN {apply("OLD", "-")} END'
+    ))
+
+
+_PG_FUNCTION = '''
+-- Versão antiga com item_id integer (sign * id somado em int4 estourava)
+DROP FUNCTION IF EXISTS map_cell_apply(text, double precision, double precision, integer, integer);
+
+CREATE OR REPLACE FUNCTION map_cell_apply(kind text, lat double precision, lng double precision,
+                                          item_id bigint, sign integer) RETURNS void AS $$
+BEGIN
+    INSERT INTO map_cell (kind, zoom, x, y, count, lat_sum, lng_sum, id_sum)
+    SELECT kind, z.zoom, floor((lng + 180) / z.size)::integer, floor((lat + 90) / z.size)::integer,
+           sign, sign * lat, sign * lng, sign * item_id
+    FROM (VALUES {zooms}) AS z (zoom, size)
+    ON CONFLICT (kind, zoom, x, y) DO UPDATE SET count = map_cell.count + excluded.count,
+        lat_sum = map_cell.lat_sum + excluded.lat_sum, lng_sum = map_cell.lng_sum + excluded.lng_sum,
+        id_sum = map_cell.id_sum + excluded.id_sum;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION map_cell_trigger() RETURNS trigger AS $$
+DECLARE
+    old_row jsonb;
+    new_row jsonb;
+BEGIN
+    -- TG_ARGV: tipo do pin e coluna de visibilidade
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        old_row := to_jsonb(OLD);
+        IF (old_row ->> TG_ARGV[1])::boolean AND OLD.latitude IS NOT NULL AND OLD.longitude IS NOT NULL THEN
+            PERFORM map_cell_apply(TG_ARGV[0], OLD.latitude, OLD.longitude, OLD.id, -1);
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        new_row := to_jsonb(NEW);
+        IF (new_row ->> TG_ARGV[1])::boolean AND NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL THEN
+            PERFORM map_cell_apply(TG_ARGV[0], NEW.latitude, NEW.longitude, NEW.id, 1);
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+'''
+
+
+def rebuild_clusters(conn, model):
+    """Recalcular do zero as células de um modelo (uma agregação por zoom)"""
+    kind, visible = CLUSTER_SOURCES[model]
+    table = model.__table__.name
+    floor = 'floor' if conn.dialect.name == 'postgresql' else ''
+    conn.execute(text('DELETE FROM map_cell WHERE kind = :kind'), {'kind': kind})
+    for zoom in range(MIN_ZOOM, MAX_ZOOM + 1):
+        x = f'CAST({floor}((longitude + 180) / :size) AS INTEGER)'
+        y = f'CAST({floor}((latitude + 90) / :size) AS INTEGER)'
+        conn.execute(text(
+            f'INSERT INTO map_cell (kind, zoom, x, y, count, lat_sum, lng_sum, id_sum) '
+            f'SELECT :kind, :zoom, {x}, {y}, count(*), sum(latitude), sum(longitude), sum(id) FROM {table} '
+            f'WHERE {visible} AND latitude IS NOT NULL AND longitude IS NOT NULL GROUP BY {x}, {y}'
+        ), {'kind': kind, 'zoom': zoom, 'size': cell_size(zoom)})
+
+
+def _has_trigger(conn, name):
+    if conn.dialect.name == 'sqlite':
+        query = "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"
+    else:
+        query = 'SELECT 1 FROM pg_trigger WHERE tgname = :name'
+    return conn.execute(text(query), {'name': name}).first() is not None
+
+
+def init_cluster_index(db):
+    """Criar as triggers que mantêm map_cell; na primeira vez, agregar o que já existe"""
+    engine = db.engine
+    if engine.dialect.name not in ('sqlite', 'postgresql'):
+        return
+    with engine.begin() as conn:
+        if engine.dialect.name == 'postgresql':
+            # Bancos criados com id_sum integer: a soma dos ids de uma célula passa de 2^31
+            id_sum_type = conn.execute(text(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = 'map_cell' AND column_name = 'id_sum'"
+            )).scalar()
+            if id_sum_type == 'integer':
+                conn.execute(text('ALTER TABLE map_cell ALTER COLUMN id_sum TYPE bigint'))
+            conn.execute(text(_PG_FUNCTION.format(zooms=_zoom_values())))
+        for model, (kind, visible) in CLUSTER_SOURCES.items():
+            table = model.__table__.name
+            if engine.dialect.name == 'sqlite':
+                if _has_trigger(conn, f'{table}_map_insert'):
+                    continue
+                _sqlite_triggers(conn, model)
+            else:
+                if _has_trigger(conn, f'{table}_map'):
+                    continue
+                conn.execute(text(
+                    f'CREATE TRIGGER {table}_map AFTER INSERT OR DELETE OR UPDATE OF latitude, longitude, {visible} '
+                    f"ON {table} FOR EACH ROW EXECUTE FUNCTION map_cell_trigger('{kind}', '{visible}')"
+                ))
+            rebuild_clusters(conn, model)
+
+
+def _fit_zoom(zoom, bbox, limit):
+    """Maior zoom <= o pedido em que a grade do bbox tem no máximo `limit` células"""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    zoom = max(MIN_ZOOM, min(zoom, MAX_ZOOM))
+    while zoom > MIN_ZOOM:
+        min_x, min_y = cell_of(min_lat, min_lng, zoom)
+        max_x, max_y = cell_of(max_lat, max_lng, zoom)
+        if (max_x - min_x + 1) * (max_y - min_y + 1) <= limit:
+            break
+        zoom -= 1
+    return zoom
+
+
+def get_clusters(bbox, zoom, kinds):
+    """Células com pins dentro do bbox, já agregadas.
+
+    O zoom efetivo é reduzido até que o bbox caiba em MAP_MAX_CLUSTERS
+    células (por tipo), então o tamanho da resposta não depende do número de anúncios.
+    Retorna (zoom efetivo, lista de clusters).
+    """
+    limit = current_app.config.get('MAP_MAX_CLUSTERS', MAP_MAX_CLUSTERS)
+    zoom = _fit_zoom(zoom, bbox, limit)
+    min_lng, min_lat, max_lng, max_lat = bbox
+    min_x, min_y = cell_of(min_lat, min_lng, zoom)
+    max_x, max_y = cell_of(max_lat, max_lng, zoom)
+
+    cells = MapCell.query.filter(
+        MapCell.kind.in_(kinds),
+        MapCell.zoom == zoom,
+        MapCell.x.between(min_x, max_x),
+        MapCell.y.between(min_y, max_y),
+        MapCell.count > 0
+    ).all()
+
+    size = cell_size(zoom)
+    clusters = []
+    for cell in cells:
+        clusters.append({
+            'type': cell.kind,
+            'count': cell.count,
+            'lat': round(cell.lat_sum / cell.count, 6),
+            'lng': round(cell.lng_sum / cell.count, 6),
+            'id': cell.id_sum if cell.count == 1 else None,
+            'bbox': [
+                round(cell.x * size - 180, 6), round(cell.y * size - 90, 6),
+                round((cell.x + 1) * size - 180, 6), round((cell.y + 1) * size - 90, 6)
+            ]
+        })
+    return zoom, clusters
+
+
+@click.command('map-rebuild')
+@with_appcontext
+def map_rebuild_command():
+    """Recalcular os clusters do mapa (ex.: após importação com as triggers desligadas)"""
+    with db.engine.begin() as conn:
+        for model in CLUSTER_SOURCES:
+            rebuild_clusters(conn, model)
+    click.echo(f'{MapCell.query.filter(MapCell.count > 0).count()} célula(s) com pins')
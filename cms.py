@@ -2,30 +2,46 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import os
 
+from src.utils.serializers import ModelSerializer
+
 db = SQLAlchemy()
 
+def photo_url(photo):
+    return f'/api/photos/{photo.filename}'
+
 class User(db.Model):
+    # Índices para a listagem paginada do admin
+    __table_args__ = (
+        db.Index('ix_user_created_at', 'created_at', 'id'),
+        db.Index('ix_user_admin_created_at', 'is_admin', 'created_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     name = db.Column(db.String(100), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'email': self.email,
-            'name': self.name,
-            'is_admin': self.is_admin,
-            'created_at': self.created_at.isoformat()
-        }
+    to_dict = ModelSerializer(('id', 'email', 'name', 'is_admin', 'created_at'))
 
 class Company(db.Model):
+    # Índices para a fila de moderação (filtro por aprovação + ordenação)
+    __table_args__ = (
+        db.Index('ix_company_approved_created_at', 'approved', 'created_at', 'id'),
+        db.Index('ix_company_approved_category_created_at', 'approved', 'category', 'created_at', 'id'),
+        db.Index('ix_company_approved_plan_created_at', 'approved', 'plan', 'created_at', 'id'),
+        db.Index('ix_company_approved_name', 'approved', 'name', 'id'),
+        # Sincronização incremental (changed_since)
+        db.Index('ix_company_changed_at', 'changed_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     category = db.Column(db.String(100), nullable=False)
     address = db.Column(db.String(300))
+    latitude = db.Column(db.Float)  # opcional; preenchido pelo gazetteer de bairros se ausente
+    longitude = db.Column(db.Float)
     phone = db.Column(db.String(20))
     email = db.Column(db.String(120))
     website = db.Column(db.String(200))
@@ -36,30 +52,18 @@ class Company(db.Model):
     review_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # controle otimista de edição
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default='1970-01-01 00:00:00')  # sincronização incremental (inclui fotos)
     
     # Relacionamentos
     photos = db.relationship('CompanyPhoto', backref='company', lazy=True, cascade='all, delete-orphan')
     reviews = db.relationship('Review', backref='company', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'category': self.category,
-            'address': self.address,
-            'phone': self.phone,
-            'email': self.email,
-            'website': self.website,
-            'plan': self.plan,
-            'approved': self.approved,
-            'featured': self.featured,
-            'rating': self.rating,
-            'review_count': self.review_count,
-            'photos': [photo.to_dict() for photo in self.photos],
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+    # version (edição otimista) e coordenadas acrescentados ao formato original
+    to_dict = ModelSerializer((
+        'id', 'name', 'description', 'category', 'address', 'phone', 'email', 'website', 'plan', 'approved',
+        'featured', 'rating', 'review_count', 'photos', 'created_at', 'updated_at', 'latitude', 'longitude', 'version'
+    ), nested=('photos',))
 
 class CompanyPhoto(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -69,17 +73,15 @@ class CompanyPhoto(db.Model):
     is_main = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'filename': self.filename,
-            'original_name': self.original_name,
-            'is_main': self.is_main,
-            'url': f'/api/photos/{self.filename}',
-            'created_at': self.created_at.isoformat()
-        }
+    to_dict = ModelSerializer(('id', 'filename', 'original_name', 'is_main', 'url', 'created_at'), extra={'url': photo_url})
 
 class Review(db.Model):
+    # Índices para a fila de moderação de avaliações
+    __table_args__ = (
+        db.Index('ix_review_approved_created_at', 'approved', 'created_at', 'id'),
+        db.Index('ix_review_company_id', 'company_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
     author_name = db.Column(db.String(100), nullable=False)
@@ -89,15 +91,7 @@ class Review(db.Model):
     approved = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'author_name': self.author_name,
-            'rating': self.rating,
-            'comment': self.comment,
-            'approved': self.approved,
-            'created_at': self.created_at.isoformat()
-        }
+    to_dict = ModelSerializer(('id', 'author_name', 'rating', 'comment', 'approved', 'created_at'))
 
 class News(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -112,24 +106,19 @@ class News(db.Model):
     image_url = db.Column(db.String(300))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # controle otimista de edição
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'content': self.content,
-            'category': self.category,
-            'author': self.author,
-            'featured': self.featured,
-            'urgent': self.urgent,
-            'published': self.published,
-            'views': self.views,
-            'image_url': self.image_url,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+    to_dict = ModelSerializer((
+        'id', 'title', 'content', 'category', 'author', 'featured', 'urgent', 'published', 'views', 'image_url',
+        'created_at', 'updated_at', 'version'
+    ))
 
 class Job(db.Model):
+    # Sincronização incremental (changed_since)
+    __table_args__ = (
+        db.Index('ix_job_changed_at', 'changed_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     company_name = db.Column(db.String(200), nullable=False)
@@ -142,24 +131,20 @@ class Job(db.Model):
     contact_email = db.Column(db.String(120))
     contact_phone = db.Column(db.String(20))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # controle otimista de edição
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default='1970-01-01 00:00:00')  # sincronização incremental
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'company_name': self.company_name,
-            'description': self.description,
-            'location': self.location,
-            'salary': self.salary,
-            'contract_type': self.contract_type,
-            'category': self.category,
-            'active': self.active,
-            'contact_email': self.contact_email,
-            'contact_phone': self.contact_phone,
-            'created_at': self.created_at.isoformat()
-        }
+    to_dict = ModelSerializer((
+        'id', 'title', 'company_name', 'description', 'location', 'salary', 'contract_type', 'category', 'active',
+        'contact_email', 'contact_phone', 'created_at', 'version'
+    ))
 
 class Property(db.Model):
+    # Sincronização incremental (changed_since)
+    __table_args__ = (
+        db.Index('ix_property_changed_at', 'changed_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(300), nullable=False)
     description = db.Column(db.Text)
@@ -168,6 +153,8 @@ class Property(db.Model):
     price = db.Column(db.Float, nullable=False)
     address = db.Column(db.String(300))
     neighborhood = db.Column(db.String(100))
+    latitude = db.Column(db.Float)  # opcional; preenchido pelo gazetteer de bairros se ausente
+    longitude = db.Column(db.Float)
     bedrooms = db.Column(db.Integer)
     bathrooms = db.Column(db.Integer)
     area = db.Column(db.Float)  # em m²
@@ -177,31 +164,18 @@ class Property(db.Model):
     active = db.Column(db.Boolean, default=True)
     featured = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # controle otimista de edição
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default='1970-01-01 00:00:00')  # sincronização incremental (inclui fotos)
     
     # Relacionamentos
     photos = db.relationship('PropertyPhoto', backref='property', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'property_type': self.property_type,
-            'purpose': self.purpose,
-            'price': self.price,
-            'address': self.address,
-            'neighborhood': self.neighborhood,
-            'bedrooms': self.bedrooms,
-            'bathrooms': self.bathrooms,
-            'area': self.area,
-            'contact_name': self.contact_name,
-            'contact_email': self.contact_email,
-            'contact_phone': self.contact_phone,
-            'active': self.active,
-            'featured': self.featured,
-            'photos': [photo.to_dict() for photo in self.photos],
-            'created_at': self.created_at.isoformat()
-        }
+    # version (edição otimista) e coordenadas acrescentados ao formato original
+    to_dict = ModelSerializer((
+        'id', 'title', 'description', 'property_type', 'purpose', 'price', 'address', 'neighborhood', 'bedrooms',
+        'bathrooms', 'area', 'contact_name', 'contact_email', 'contact_phone', 'active', 'featured', 'photos',
+        'created_at', 'latitude', 'longitude', 'version'
+    ), nested=('photos',))
 
 class PropertyPhoto(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -211,15 +185,7 @@ class PropertyPhoto(db.Model):
     is_main = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'filename': self.filename,
-            'original_name': self.original_name,
-            'is_main': self.is_main,
-            'url': f'/api/photos/{self.filename}',
-            'created_at': self.created_at.isoformat()
-        }
+    to_dict = ModelSerializer(('id', 'filename', 'original_name', 'is_main', 'url', 'created_at'), extra={'url': photo_url})
 
 class SiteSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -228,12 +194,130 @@ class SiteSettings(db.Model):
     description = db.Column(db.String(300))
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'key': self.key,
-            'value': self.value,
-            'description': self.description,
-            'updated_at': self.updated_at.isoformat()
-        }
+    to_dict = ModelSerializer(('id', 'key', 'value', 'description', 'updated_at'))
+
+class Flipbook(db.Model):
+    """Revista digital (mesma tabela do modelo legado em src.models.flipbook)"""
+    __tablename__ = 'flipbooks'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    pdf_url = db.Column(db.String(500))  # URL do PDF original
+    pdf_filename = db.Column(db.String(200))  # PDF enviado para o servidor (uploads/flipbooks)
+    flipbook_url = db.Column(db.String(500))  # URL do flipbook (ex: Issuu)
+    embed_code = db.Column(db.Text)  # Código de incorporação
+    thumbnail_url = db.Column(db.String(500))  # URL da imagem de capa
+    category = db.Column(db.String(50))  # categoria da revista
+    featured = db.Column(db.Boolean, default=False)
+    active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    to_dict = ModelSerializer((
+        'id', 'title', 'description', 'pdf_url', 'pdf_filename', 'flipbook_url', 'embed_code', 'thumbnail_url',
+        'category', 'featured', 'active', 'created_at', 'updated_at'
+    ))
+
+class UploadSession(db.Model):
+    """Upload retomável em partes (fotos e PDFs de flipbook)"""
+    id = db.Column(db.String(32), primary_key=True)  # token aleatório
+    kind = db.Column(db.String(30), nullable=False)  # company_photo, property_photo, flipbook_pdf
+    target_id = db.Column(db.Integer, nullable=False)
+    filename = db.Column(db.String(200), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    received = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    to_dict = ModelSerializer(('id', 'kind', 'target_id', 'filename', 'size', 'received', 'created_at', 'expires_at'))
+
+class BackgroundTask(db.Model):
+    """Tarefa da fila em segundo plano (executada por `flask tasks worker`)"""
+    # Índice da consulta de retirada: próximas tarefas prontas por prioridade
+    __table_args__ = (
+        db.Index('ix_background_task_ready', 'status', 'priority', 'run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text)  # JSON com os argumentos
+    priority = db.Column(db.Integer, nullable=False, default=0)  # maior roda antes
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime)  # fim da visibilidade exclusiva do worker
+    locked_by = db.Column(db.String(100))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    to_dict = ModelSerializer((
+        'id', 'name', 'payload', 'priority', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_until',
+        'locked_by', 'last_error', 'created_at', 'finished_at'
+    ))
+
+class StreamEvent(db.Model):
+    """Evento publicado para os clientes SSE (lido por todos os processos)"""
+    id = db.Column(db.Integer, primary_key=True)  # também é o id do evento SSE
+    channel = db.Column(db.String(30), nullable=False)  # news, moderation
+    event = db.Column(db.String(50), nullable=False)
+    data = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class Tombstone(db.Model):
+    """Registro de exclusão para a sincronização incremental (changed_since)"""
+    __table_args__ = (
+        db.Index('ix_tombstone_entity_deleted_at', 'entity', 'deleted_at', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(30), nullable=False)  # company, job, property
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+class MapCell(db.Model):
+    """Pins do mapa agregados por célula da grade de cada zoom (mantido por triggers)"""
+    kind = db.Column(db.String(20), primary_key=True)  # company, property
+    zoom = db.Column(db.Integer, primary_key=True)
+    x = db.Column(db.Integer, primary_key=True)
+    y = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    lat_sum = db.Column(db.Float, nullable=False, default=0.0)  # centro = soma / count
+    lng_sum = db.Column(db.Float, nullable=False, default=0.0)
+    id_sum = db.Column(db.BigInteger, nullable=False, default=0)  # com count = 1, é o id do item (soma passa de 2^31)
+
+class RelatedTerm(db.Model):
+    """Índice invertido TF-IDF para itens relacionados (peso do termo no documento)"""
+    __table_args__ = (
+        db.Index('ix_related_term_item', 'entity', 'item_id'),
+    )
+    
+    entity = db.Column(db.String(20), primary_key=True)  # company, news
+    term = db.Column(db.String(60), primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+    weight = db.Column(db.Float, nullable=False)  # vetor do documento normalizado (norma 1)
+
+class RelatedItem(db.Model):
+    """Vizinhos pré-calculados de cada item (top N por similaridade de cosseno)"""
+    __table_args__ = (
+        db.Index('ix_related_item_lookup', 'entity', 'item_id', 'score'),
+        db.Index('ix_related_item_related', 'entity', 'related_id'),
+    )
+    
+    entity = db.Column(db.String(20), primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+    related_id = db.Column(db.Integer, primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+class SearchTrigram(db.Model):
+    """Trigramas para a busca tolerante a erros no SQLite (mantidos por triggers; no PostgreSQL usa-se pg_trgm)"""
+    __table_args__ = (
+        # item_id primeiro: o planner deve usar a chave primária (entity, trigram) na busca
+        db.Index('ix_search_trigram_item', 'item_id', 'entity'),
+    )
+    
+    entity = db.Column(db.String(20), primary_key=True)  # company, job, property
+    trigram = db.Column(db.String(3), primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
@@ -3,10 +3,21 @@ from flask_cors import cross_origin
 from werkzeug.utils import secure_filename
 import os
 import uuid
-from PIL import Image
 
 from src.models.cms import db, Company, CompanyPhoto, Review
 from src.routes.auth import require_admin
+from src.utils.patching import RowNotFound, VersionConflict, VersionRequired, expected_version, patch_row
+from src.utils.formats import list_response
+from src.utils.pagination import PaginationError
+from src.utils.geo import apply_geocode, geo_search, geocode_values
+from src.utils.sync import sync_response, touch
+from src.utils.instrumentation import perf_timer
+from src.utils.metrics import observe_upload
+from src.utils.file_cleanup import delete_files_after_commit
+from src.utils.images import ImageRejected, save_photo
+from src.utils.tasks import enqueue, task
+from src.utils.events import publish_event
+from src.utils.related import related_items
 
 companies_bp = Blueprint('companies', __name__)
 
@@ -21,6 +32,50 @@ def create_upload_folder():
     if not os.path.exists(UPLOAD_FOLDER):
         os.makedirs(UPLOAD_FOLDER)
 
+def store_company_photo(company, stream, original_name):
+    """Redimensionar, salvar e registrar uma foto da empresa (sem commit)"""
+    create_upload_folder()
+    
+    # Gerar nome único para o arquivo
+    filename = str(uuid.uuid4()) + '.' + original_name.rsplit('.', 1)[1].lower()
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    
+    with observe_upload('company_photo'):
+        # Redimensionar mantendo proporção (máximo 1200x800) e salvar como JPEG
+        save_photo(stream, filepath)
+    
+    # Criar registro no banco
+    photo = CompanyPhoto(
+        company_id=company.id,
+        filename=filename,
+        original_name=original_name,
+        is_main=len(company.photos) == 0  # Primeira foto é a principal
+    )
+    db.session.add(photo)
+    touch(company)  # fotos fazem parte da linha sincronizada
+    return photo
+
+@task('companies.recompute_ratings')
+def recompute_ratings(company_ids):
+    """Recalcular nota média e total de avaliações aprovadas das empresas"""
+    stats = {
+        company_id: (rating, count)
+        for company_id, rating, count in db.session.query(
+            Review.company_id, db.func.avg(Review.rating), db.func.count(Review.id)
+        ).filter(
+            Review.company_id.in_(company_ids),
+            Review.approved == True
+        ).group_by(Review.company_id)
+    }
+    for company_id in company_ids:
+        rating, count = stats.get(company_id, (0, 0))
+        db.session.execute(
+            db.update(Company).where(Company.id == company_id).values(
+                rating=round(float(rating or 0), 2),
+                review_count=count
+            )
+        )
+
 @companies_bp.route('/companies', methods=['GET'])
 @cross_origin()
 def get_companies():
@@ -31,6 +86,15 @@ def get_companies():
         category = request.args.get('category')
         approved_only = request.args.get('approved_only', 'true').lower() == 'true'
         search = request.args.get('search')
+        changed_since = request.args.get('changed_since')
+        
+        # Sincronização incremental: só o que mudou desde o token ('0' = tudo)
+        if changed_since:
+            return sync_response(
+                'companies', Company, changed_since,
+                lambda company: company.approved or not approved_only,
+                request.args.get('limit', type=int)
+            )
         
         query = Company.query
         
@@ -48,6 +112,11 @@ def get_companies():
                 )
             )
         
+        # Busca por proximidade/área (índice espacial), ordenada por distância
+        if request.args.get('near') or request.args.get('bbox'):
+            items = geo_search(query, Company, request.args)
+            return list_response('companies', items, total=len(items))
+        
         query = query.order_by(Company.featured.desc(), Company.created_at.desc())
         
         companies = query.paginate(
@@ -56,14 +125,20 @@ def get_companies():
             error_out=False
         )
         
-        return jsonify({
-            'companies': [company.to_dict() for company in companies.items],
-            'total': companies.total,
-            'pages': companies.pages,
-            'current_page': page,
-            'per_page': per_page
-        })
+        with perf_timer('serialize'):
+            items = [company.to_dict() for company in companies.items]
         
+        return list_response(
+            'companies',
+            items,
+            total=companies.total,
+            pages=companies.pages,
+            current_page=page,
+            per_page=per_page
+        )
+        
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -77,6 +152,16 @@ def get_company(company_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@companies_bp.route('/companies/<int:company_id>/related', methods=['GET'])
+@cross_origin()
+def get_related_companies(company_id):
+    """Empresas relacionadas (similaridade de texto pré-calculada)"""
+    try:
+        items = related_items('company', company_id, request.args.get('limit', 5, type=int))
+        return list_response('companies', items)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @companies_bp.route('/companies', methods=['POST'])
 @cross_origin()
 def create_company():
@@ -93,10 +178,19 @@ def create_company():
             email=data.get('email'),
             website=data.get('website'),
             plan=data.get('plan', 'basico'),
+            latitude=data.get('latitude'),
+            longitude=data.get('longitude'),
             approved=False  # Sempre começa não aprovada
         )
+        apply_geocode(company)
         
         db.session.add(company)
+        db.session.flush()
+        
+        # Novo item na fila de moderação do admin (SSE), no mesmo commit
+        publish_event('moderation', 'pending_company', company.to_dict())
+        enqueue('related.update', {'entity': 'company', 'item_id': company.id})
+        
         db.session.commit()
         
         return jsonify({
@@ -109,28 +203,49 @@ def create_company():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@companies_bp.route('/companies/<int:company_id>', methods=['PUT'])
+@companies_bp.route('/companies/<int:company_id>', methods=['PUT', 'PATCH'])
 @cross_origin()
 @require_admin
 def update_company(company_id):
-    """Atualizar empresa (apenas admin)"""
+    """Atualizar empresa (apenas admin; UPDATE único com controle de versão)"""
     try:
-        company = Company.query.get_or_404(company_id)
-        data = request.json
+        data = request.json or {}
+        values = {
+            field: data[field]
+            for field in ['name', 'description', 'category', 'address', 'phone', 'email', 'website', 'plan', 'approved', 'featured', 'latitude', 'longitude']
+            if field in data
+        }
         
-        # Atualizar campos
-        for field in ['name', 'description', 'category', 'address', 'phone', 'email', 'website', 'plan', 'approved', 'featured']:
-            if field in data:
-                setattr(company, field, data[field])
+        if not values:
+            return jsonify({'error': 'Nenhum campo para atualizar'}), 400
         
+        geocode_values(values, Company, company_id)
+        company = patch_row(Company, company_id, values, expected_version(data))
+        if values.keys() & {'name', 'category', 'description'}:
+            enqueue('related.update', {'entity': 'company', 'item_id': company_id})
         db.session.commit()
         
+        # Mesmo formato do to_dict() de antes (fotos e demais campos públicos)
+        company = db.session.get(Company, company_id)
+        
         return jsonify({
             'success': True,
             'company': company.to_dict(),
             'message': 'Empresa atualizada com sucesso'
         })
         
+    except RowNotFound:
+        db.session.rollback()
+        return jsonify({'error': 'Empresa não encontrada'}), 404
+    except VersionRequired:
+        db.session.rollback()
+        return jsonify({'error': 'Informe a versão atual ("version" ou If-Match) para editar via PATCH'}), 428
+    except VersionConflict as e:
+        db.session.rollback()
+        return jsonify({
+            'error': 'A empresa foi alterada por outra pessoa. Recarregue e tente novamente.',
+            'current_version': e.current_version
+        }), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -143,13 +258,11 @@ def delete_company(company_id):
     try:
         company = Company.query.get_or_404(company_id)
         
-        # Deletar fotos associadas
-        for photo in company.photos:
-            photo_path = os.path.join(UPLOAD_FOLDER, photo.filename)
-            if os.path.exists(photo_path):
-                os.remove(photo_path)
+        # Arquivos das fotos são removidos só depois do commit
+        delete_files_after_commit([photo.filename for photo in company.photos])
         
         db.session.delete(company)
+        enqueue('related.remove', {'entity': 'company', 'item_ids': [company_id]})
         db.session.commit()
         
         return jsonify({
@@ -177,33 +290,7 @@ def upload_company_photo(company_id):
             return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
         
         if file and allowed_file(file.filename):
-            create_upload_folder()
-            
-            # Gerar nome único para o arquivo
-            filename = str(uuid.uuid4()) + '.' + file.filename.rsplit('.', 1)[1].lower()
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            
-            # Salvar e redimensionar a imagem
-            image = Image.open(file.stream)
-            
-            # Redimensionar mantendo proporção (máximo 1200x800)
-            image.thumbnail((1200, 800), Image.Resampling.LANCZOS)
-            
-            # Salvar como JPEG para otimizar tamanho
-            if image.mode in ("RGBA", "P"):
-                image = image.convert("RGB")
-            
-            image.save(filepath, "JPEG", quality=85, optimize=True)
-            
-            # Criar registro no banco
-            photo = CompanyPhoto(
-                company_id=company_id,
-                filename=filename,
-                original_name=file.filename,
-                is_main=len(company.photos) == 0  # Primeira foto é a principal
-            )
-            
-            db.session.add(photo)
+            photo = store_company_photo(company, file.stream, file.filename)
             db.session.commit()
             
             return jsonify({
@@ -214,6 +301,9 @@ def upload_company_photo(company_id):
         
         return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
         
+    except ImageRejected as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
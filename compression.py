@@ -0,0 +1,154 @@
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli é opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard é opcional
+    zstandard = None
+
+# Padrões (podem ser sobrescritos via app.config)
+COMPRESS_MIN_SIZE = 500
+COMPRESS_LEVEL_GZIP = 6
+COMPRESS_LEVEL_BR = 4
+COMPRESS_LEVEL_ZSTD = 3
+COMPRESS_MIMETYPES = (
+    'application/json',
+    'application/vnd.euindico.columnar+json',
+    'application/msgpack',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+    'text/',
+)
+
+# Rotas que servem arquivos já comprimidos (fotos JPEG/PNG/WebP)
+SKIP_ENDPOINTS = {'companies.serve_photo'}
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def _available_encodings():
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def _compressor(encoding, config):
+    if encoding == 'zstd':
+        return _Zstd(config.get('COMPRESS_LEVEL_ZSTD', COMPRESS_LEVEL_ZSTD))
+    if encoding == 'br':
+        return _Brotli(config.get('COMPRESS_LEVEL_BR', COMPRESS_LEVEL_BR))
+    return _Gzip(config.get('COMPRESS_LEVEL_GZIP', COMPRESS_LEVEL_GZIP))
+
+
+def _compressible(response, config):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers or request.endpoint in SKIP_ENDPOINTS:
+        return False
+    # send_file/send_from_directory usam direct_passthrough (arquivos estáticos)
+    if response.direct_passthrough:
+        return False
+    # SSE: conexão longa, cada evento precisa sair na hora e fechar limpo
+    if response.mimetype == 'text/event-stream':
+        return False
+    mimetype = response.mimetype or ''
+    return mimetype.startswith(config.get('COMPRESS_MIMETYPES', COMPRESS_MIMETYPES))
+
+
+def _stream(iterable, compressor):
+    for chunk in iterable:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk)
+        # Enviar cada pedaço imediatamente (ex.: exportações longas)
+        data += compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+    if hasattr(iterable, 'close'):
+        iterable.close()
+
+
+def init_compression(app):
+    """Comprimir respostas com zstd/br/gzip conforme o Accept-Encoding"""
+
+    @app.after_request
+    def _compress_response(response):
+        config = app.config
+        response.vary.add('Accept-Encoding')
+
+        if not _compressible(response, config):
+            return response
+
+        encoding = request.accept_encodings.best_match(_available_encodings())
+        if encoding is None:
+            return response
+
+        compressor = _compressor(encoding, config)
+
+        if response.is_streamed:
+            response.response = _stream(response.response, compressor)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config.get('COMPRESS_MIN_SIZE', COMPRESS_MIN_SIZE):
+                return response
+            response.set_data(compressor.compress(data) + compressor.finish())
+
+        response.headers['Content-Encoding'] = encoding
+        # O ETag do corpo original não vale para o corpo comprimido
+        if response.headers.get('ETag') and not response.headers['ETag'].startswith('W/'):
+            response.headers['ETag'] = 'W/' + response.headers['ETag']
+
+        return response
@@ -0,0 +1,236 @@
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, Response
+
+from src.models.cms import db, StreamEvent
+
+logger = logging.getLogger('events')
+
+# Padrões (podem ser sobrescritos via app.config)
+SSE_POLL_INTERVAL = 0.5  # uma consulta por processo, não por cliente
+SSE_KEEPALIVE = 15  # comentário periódico para proxies não fecharem a conexão
+SSE_MAX_DURATION = 300  # depois disso o cliente reconecta (com Last-Event-ID)
+SSE_MAX_CLIENTS = 500  # por processo
+SSE_RETRY_MS = 3000
+SSE_REPLAY_LIMIT = 100
+SSE_EVENT_RETENTION = timedelta(hours=1)
+SSE_CLIENT_QUEUE_SIZE = 100
+# Ids não seguem a ordem de commit (PostgreSQL): eventos criados nos últimos
+# segundos são relidos a cada consulta, e os já entregues são ignorados pelo id
+SSE_OVERLAP = timedelta(seconds=5)
+
+CHANNELS = ('news', 'moderation')
+
+
+def publish_event(channel, event, data, session=None):
+    """Publicar um evento na transação atual (sem commit).
+
+    Os clientes só recebem o evento depois do commit; com rollback ele some.
+    """
+    session = session or db.session
+    stream_event = StreamEvent(channel=channel, event=event, data=current_app.json.dumps(data))
+    session.add(stream_event)
+    return stream_event
+
+
+def _format(stream_event):
+    lines = [f'id: {stream_event.id}', f'event: {stream_event.event}']
+    lines.extend(f'data: {line}' for line in stream_event.data.splitlines() or [''])
+    return '\n'.join(lines) + '\n\n'
+
+
+class _Event:
+    """Cópia desacoplada da sessão, compartilhada entre as filas dos clientes"""
+    __slots__ = ('id', 'channel', 'event', 'data')
+
+    def __init__(self, row):
+        self.id = row.id
+        self.channel = row.channel
+        self.event = row.event
+        self.data = row.data
+
+
+class EventHub:
+    """Distribui os eventos do banco para os clientes conectados neste processo.
+
+    Uma única thread consulta a tabela de eventos (id > último lido, mais os
+    criados dentro de SSE_OVERLAP) e copia cada evento ainda não entregue
+    para a fila de cada cliente do canal. Todos os processos leem a mesma
+    tabela, então um commit em qualquer worker chega a todos.
+    """
+
+    def __init__(self):
+        self._subscribers = {channel: set() for channel in CHANNELS}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._app = None
+        self._last_id = None
+        self._seen = {}  # id -> created_at dos eventos entregues dentro da janela
+        self._last_cleanup = 0.0
+
+    def client_count(self):
+        with self._lock:
+            return sum(len(clients) for clients in self._subscribers.values())
+
+    def _seed(self):
+        # Ponto de partida quando não havia clientes: tudo o que já existe
+        # (inclusive na janela de releitura) conta como entregue
+        since = datetime.utcnow() - current_app.config.get('SSE_OVERLAP', SSE_OVERLAP)
+        last_id = db.session.query(db.func.max(StreamEvent.id)).scalar() or 0
+        seen = dict(db.session.query(StreamEvent.id, StreamEvent.created_at).filter(StreamEvent.created_at >= since))
+        return last_id, seen
+
+    def subscribe(self, channel):
+        client = queue.Queue(maxsize=SSE_CLIENT_QUEUE_SIZE)
+        with self._lock:
+            seeded = self._last_id is not None
+        if not seeded:
+            last_id, seen = self._seed()
+        with self._lock:
+            # Posição definida antes de o cliente entrar: nada commitado depois
+            # da inscrição fica de fora da primeira consulta
+            if self._last_id is None:
+                self._last_id, self._seen = last_id, seen
+            self._subscribers[channel].add(client)
+            if self._thread is None or not self._thread.is_alive():
+                self._app = current_app._get_current_object()
+                self._thread = threading.Thread(target=self._run, name='sse-hub', daemon=True)
+                self._thread.start()
+        return client
+
+    def unsubscribe(self, channel, client):
+        with self._lock:
+            self._subscribers[channel].discard(client)
+
+    def _dispatch(self, stream_event):
+        with self._lock:
+            clients = list(self._subscribers.get(stream_event.channel, ()))
+        for client in clients:
+            try:
+                client.put_nowait(stream_event)
+            except queue.Full:
+                # Cliente lento: desconectar (ele reconecta e recupera pelo Last-Event-ID)
+                self.unsubscribe(stream_event.channel, client)
+                try:
+                    client.get_nowait()
+                except queue.Empty:
+                    pass
+                client.put_nowait(None)
+
+    def _poll(self):
+        with self._lock:
+            last_id = self._last_id
+        if last_id is None:
+            return
+        since = datetime.utcnow() - self._app.config.get('SSE_OVERLAP', SSE_OVERLAP)
+        rows = StreamEvent.query.filter(
+            db.or_(StreamEvent.id > last_id, StreamEvent.created_at >= since)
+        ).order_by(StreamEvent.id).limit(500).all()
+        for row in rows:
+            if row.id in self._seen:
+                continue
+            self._seen[row.id] = row.created_at
+            self._dispatch(_Event(row))
+        with self._lock:
+            if self._last_id is not None:
+                self._last_id = max([self._last_id] + [row.id for row in rows])
+            # Fora da janela e com id <= último lido: não volta mais na consulta
+            self._seen = {event_id: created_at for event_id, created_at in self._seen.items() if created_at >= since}
+
+        # Limpeza ocasional dos eventos antigos (qualquer processo pode fazer)
+        if time.monotonic() - self._last_cleanup > 600:
+            self._last_cleanup = time.monotonic()
+            retention = self._app.config.get('SSE_EVENT_RETENTION', SSE_EVENT_RETENTION)
+            StreamEvent.query.filter(
+                StreamEvent.created_at < datetime.utcnow() - retention
+            ).delete(synchronize_session=False)
+            db.session.commit()
+
+    def _run(self):
+        interval = self._app.config.get('SSE_POLL_INTERVAL', SSE_POLL_INTERVAL)
+        while True:
+            if self.client_count():
+                with self._app.app_context():
+                    try:
+                        self._poll()
+                    except Exception:
+                        logger.exception('Falha ao consultar eventos')
+                    finally:
+                        db.session.rollback()
+            else:
+                # Sem clientes: recomeçar do evento mais novo na próxima conexão
+                with self._lock:
+                    if not any(self._subscribers.values()):
+                        self._last_id = None
+                        self._seen = {}
+            time.sleep(interval)
+
+
+hub = EventHub()
+
+
+def _replay(channel, last_event_id):
+    """Eventos perdidos durante a reconexão (Last-Event-ID)"""
+    try:
+        last_event_id = int(last_event_id)
+    except (TypeError, ValueError):
+        return []
+    rows = StreamEvent.query.filter(
+        StreamEvent.channel == channel,
+        StreamEvent.id > last_event_id
+    ).order_by(StreamEvent.id).limit(SSE_REPLAY_LIMIT).all()
+    return [_Event(row) for row in rows]
+
+
+def event_stream(channel, last_event_id=None):
+    """Resposta text/event-stream para um canal.
+
+    O gerador só espera na fila do cliente (nenhuma consulta por conexão) e
+    encerra após SSE_MAX_DURATION; rode o gunicorn com worker gevent (ver
+    gunicorn.conf.py) para que conexões abertas não prendam workers.
+    """
+    config = current_app.config
+    if hub.client_count() >= config.get('SSE_MAX_CLIENTS', SSE_MAX_CLIENTS):
+        return Response('Muitas conexões abertas\n', status=503, mimetype='text/plain', headers={'Retry-After': '30'})
+
+    # Inscrever antes do replay para não perder eventos entre os dois
+    client = hub.subscribe(channel)
+    missed = _replay(channel, last_event_id)
+    db.session.rollback()
+
+    keepalive = config.get('SSE_KEEPALIVE', SSE_KEEPALIVE)
+    max_duration = config.get('SSE_MAX_DURATION', SSE_MAX_DURATION)
+    retry = config.get('SSE_RETRY_MS', SSE_RETRY_MS)
+
+    def generate():
+        try:
+            yield f'retry: {retry}\n\n'
+            replayed = set()
+            for stream_event in missed:
+                yield _format(stream_event)
+                replayed.add(stream_event.id)
+            deadline = time.monotonic() + max_duration
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    stream_event = client.get(timeout=min(keepalive, remaining))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if stream_event is None:
+                    break
+                if stream_event.id not in replayed:
+                    yield _format(stream_event)
+        finally:
+            hub.unsubscribe(channel, client)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # nginx: não bufferizar
+    })
@@ -0,0 +1,157 @@
+import logging
+import os
+import re
+import time
+
+import click
+from flask.cli import with_appcontext
+
+from src.models.cms import db, CompanyPhoto, Flipbook, PropertyPhoto
+from src.utils.flipbook_pages import FLIPBOOK_FOLDER
+from src.utils.tasks import enqueue, task
+
+logger = logging.getLogger('uploads')
+
+# Mesma pasta usada pelas rotas de upload (src/static/uploads)
+UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'uploads')
+
+# Arquivos mais novos que isso não são considerados órfãos (upload em andamento)
+GC_MIN_AGE_SECONDS = 3600
+GC_BATCH_SIZE = 500
+
+# Só nomes gerados pelas rotas de upload são candidatos a órfãos; qualquer
+# outro arquivo colocado na pasta fica intocado
+PHOTO_FILENAME = re.compile(
+    r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.(?:png|jpg|jpeg|gif|webp)$'
+)  # str(uuid4()) + extensão permitida (ALLOWED_EXTENSIONS das rotas de fotos)
+FLIPBOOK_FILENAME = re.compile(r'^[0-9a-f]{32}(?:\.pdf|-capa\.jpg)$')  # PDF enviado e capa gerada
+
+
+def delete_files_after_commit(filenames, session=None, folder=None):
+    """Agendar a remoção de arquivos de upload para depois do commit da sessão.
+
+    A remoção vira uma tarefa da fila na mesma transação: com rollback, os
+    arquivos ficam. ``folder`` é uma subpasta de uploads (ex.: 'flipbooks').
+    """
+    filenames = list(filenames)
+    if filenames:
+        payload = {'filenames': filenames}
+        if folder:
+            payload['folder'] = folder
+        enqueue('uploads.delete_files', payload, session=session)
+
+
+@task('uploads.delete_files')
+def delete_files(filenames, folder=None):
+    # Nunca sair da pasta de uploads
+    directory = os.path.join(UPLOAD_FOLDER, os.path.basename(folder)) if folder else UPLOAD_FOLDER
+    for filename in filenames:
+        try:
+            os.remove(os.path.join(directory, os.path.basename(filename)))
+        except FileNotFoundError:
+            pass
+
+
+def _referenced_photos(filenames):
+    """Quais destes arquivos ainda têm linha em CompanyPhoto/PropertyPhoto"""
+    referenced = set()
+    for model in (CompanyPhoto, PropertyPhoto):
+        referenced.update(name for (name,) in db.session.query(model.filename).filter(
+            model.filename.in_(filenames)
+        ))
+    return referenced
+
+
+def _referenced_flipbook_files(filenames):
+    """Quais destes arquivos são o PDF ou a capa atual de algum flipbook"""
+    urls = {f'/uploads/flipbooks/{name}': name for name in filenames}
+    referenced = {name for (name,) in db.session.query(Flipbook.pdf_filename).filter(
+        Flipbook.pdf_filename.in_(filenames)
+    )}
+    referenced.update(urls[url] for (url,) in db.session.query(Flipbook.thumbnail_url).filter(
+        Flipbook.thumbnail_url.in_(list(urls))
+    ))
+    return referenced
+
+
+def _collect(folder, pattern, referenced_in, report, dry_run, cutoff, batch_size):
+    def flush(batch):
+        referenced = referenced_in([entry.name for entry in batch])
+        for entry in batch:
+            if entry.name in referenced:
+                continue
+            try:
+                stat = entry.stat()
+                if stat.st_mtime > cutoff:
+                    continue
+                if not dry_run:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            report['orphan_files'] += 1
+            report['reclaimed_bytes'] += stat.st_size
+
+    if not os.path.isdir(folder):
+        return
+    batch = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.is_file() or not pattern.match(entry.name):
+                continue
+            report['scanned_files'] += 1
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    if batch:
+        flush(batch)
+
+
+def collect_orphans(dry_run=False, min_age=GC_MIN_AGE_SECONDS, batch_size=GC_BATCH_SIZE):
+    """Reconciliar a pasta de uploads com as fotos e flipbooks do banco, em lotes.
+
+    As pastas são percorridas com os.scandir (sem carregar a listagem inteira)
+    e as linhas são lidas com yield_per. Só arquivos com nome no formato
+    gerado pelos uploads são considerados. Retorna um relatório com o espaço
+    liberado.
+    """
+    report = {
+        'scanned_files': 0,
+        'orphan_files': 0,
+        'reclaimed_bytes': 0,
+        'missing_files': 0,
+        'dry_run': dry_run
+    }
+    cutoff = time.time() - min_age
+    _collect(UPLOAD_FOLDER, PHOTO_FILENAME, _referenced_photos, report, dry_run, cutoff, batch_size)
+    _collect(FLIPBOOK_FOLDER, FLIPBOOK_FILENAME, _referenced_flipbook_files, report, dry_run, cutoff, batch_size)
+
+    # Linhas cujo arquivo sumiu (apenas reportadas)
+    for model in (CompanyPhoto, PropertyPhoto):
+        for (filename,) in db.session.query(model.filename).yield_per(batch_size):
+            if not os.path.exists(os.path.join(UPLOAD_FOLDER, filename)):
+                report['missing_files'] += 1
+    for (filename,) in db.session.query(Flipbook.pdf_filename).filter(
+        Flipbook.pdf_filename.isnot(None)
+    ).yield_per(batch_size):
+        if not os.path.exists(os.path.join(FLIPBOOK_FOLDER, filename)):
+            report['missing_files'] += 1
+
+    db.session.rollback()
+    logger.info('GC de uploads: %s', report)
+    return report
+
+
+@click.command('uploads-gc')
+@click.option('--dry-run', is_flag=True, help='Apenas reportar, sem remover arquivos')
+@click.option('--min-age', default=GC_MIN_AGE_SECONDS, show_default=True,
+              help='Idade mínima (segundos) para um arquivo ser considerado órfão')
+@with_appcontext
+def uploads_gc_command(dry_run, min_age):
+    """Remover arquivos órfãos da pasta de uploads (rodar periodicamente via cron)"""
+    report = collect_orphans(dry_run=dry_run, min_age=min_age)
+    click.echo(
+        f"{report['scanned_files']} arquivos verificados, "
+        f"{report['orphan_files']} órfãos ({report['reclaimed_bytes'] / 1024 / 1024:.1f} MB), "
+        f"{report['missing_files']} fotos/PDFs sem arquivo"
+    )
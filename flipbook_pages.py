@@ -0,0 +1,209 @@
+import logging
+import math
+import os
+import threading
+from collections import namedtuple
+
+from PIL import Image
+
+from src.utils.tasks import task
+
+try:
+    import pymupdf
+except ImportError:  # pragma: no cover - PyMuPDF é opcional
+    pymupdf = None
+
+logger = logging.getLogger('flipbooks')
+
+# PDFs enviados (servidos como estáticos) e capas geradas
+FLIPBOOK_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'uploads', 'flipbooks')
+
+# Páginas renderizadas: cache em disco, descartável
+FLIPBOOK_CACHE_DIR = os.environ.get('FLIPBOOK_CACHE_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'database', 'flipbook_pages'
+)
+FLIPBOOK_CACHE_MAX_BYTES = int(os.environ.get('FLIPBOOK_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Níveis de zoom (fator sobre 72 dpi)
+ZOOM_LEVELS = {
+    'thumb': 0.3,
+    'small': 0.75,
+    'medium': 1.25,
+    'large': 2.0,
+}
+DEFAULT_ZOOM = 'medium'
+THUMBNAIL_ZOOM = 'thumb'
+
+# Limite de pixels por página renderizada: PDFs com mediabox enorme têm o
+# zoom reduzido para caber (large em A4 dá ~1,9 MP)
+MAX_PAGE_PIXELS = int(os.environ.get('FLIPBOOK_MAX_PAGE_PIXELS', 8 * 1000 * 1000))
+
+# Primeiras páginas renderizadas logo após o upload
+PRERENDER_PAGES = 4
+JPEG_QUALITY = 80
+
+_render_locks = {}
+_render_locks_guard = threading.Lock()
+_page_counts = {}
+
+_cache_bytes = None
+_cache_lock = threading.Lock()
+
+
+# Referência desacoplada da sessão, para renderizar fora da requisição (fila)
+FlipbookRef = namedtuple('FlipbookRef', 'id pdf_filename')
+
+
+class FlipbookUnavailable(Exception):
+    """Flipbook sem PDF local ou renderização indisponível"""
+
+
+def pdf_path(flipbook):
+    if not flipbook.pdf_filename:
+        raise FlipbookUnavailable('Flipbook sem PDF enviado')
+    return os.path.join(FLIPBOOK_FOLDER, os.path.basename(flipbook.pdf_filename))
+
+
+def _open(path):
+    if pymupdf is None:
+        raise FlipbookUnavailable('Renderização de PDF indisponível (PyMuPDF não instalado)')
+    try:
+        return pymupdf.open(path)
+    except (RuntimeError, ValueError) as e:
+        raise FlipbookUnavailable('PDF inválido') from e
+
+
+def page_count(flipbook):
+    """Número de páginas do PDF (em memória por arquivo; o nome muda a cada upload)"""
+    path = pdf_path(flipbook)
+    if path not in _page_counts:
+        with _open(path) as document:
+            _page_counts[path] = document.page_count
+    return _page_counts[path]
+
+
+def _lock_for(flipbook_id):
+    # Um lock por flipbook: evita renderizar a mesma página duas vezes em paralelo
+    with _render_locks_guard:
+        return _render_locks.setdefault(flipbook_id, threading.Lock())
+
+
+def _render_to(path, page, zoom, target):
+    """Renderizar uma página (1-based) para JPEG via arquivo temporário"""
+    with _open(path) as document:
+        if page < 1 or page > document.page_count:
+            raise IndexError(page)
+        pdf_page = document[page - 1]
+        area = pdf_page.rect.width * pdf_page.rect.height
+        if area <= 0:
+            raise FlipbookUnavailable('Página sem área')
+        zoom = min(zoom, math.sqrt(MAX_PAGE_PIXELS / area))
+        pixmap = pdf_page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+        image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+    image.save(tmp, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+    os.replace(tmp, target)
+    return os.path.getsize(target)
+
+
+def _cache_size():
+    total = 0
+    for root, _dirs, files in os.walk(FLIPBOOK_CACHE_DIR):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def evict_cache(max_bytes=None):
+    """Remover as páginas menos usadas (mtime mais antigo) até caber no limite"""
+    global _cache_bytes
+    max_bytes = FLIPBOOK_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    entries = []
+    for root, _dirs, files in os.walk(FLIPBOOK_CACHE_DIR):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+
+    total = sum(size for _mtime, size, _path in entries)
+    removed = 0
+    # Margem de 10% para não despejar a cada página nova
+    target = max_bytes * 0.9 if total > max_bytes else total
+    for _mtime, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+
+    with _cache_lock:
+        _cache_bytes = total
+    return removed
+
+
+def _account(size):
+    global _cache_bytes
+    with _cache_lock:
+        if _cache_bytes is None:
+            _cache_bytes = _cache_size()
+        else:
+            _cache_bytes += size
+        over = _cache_bytes > FLIPBOOK_CACHE_MAX_BYTES
+    if over:
+        removed = evict_cache()
+        logger.info('Cache de páginas acima do limite: %d páginas removidas', removed)
+
+
+def render_page(flipbook, page, zoom=DEFAULT_ZOOM):
+    """Caminho do JPEG da página, renderizando na primeira vez.
+
+    O arquivo é chaveado pelo nome do PDF, então um novo upload nunca serve
+    páginas antigas. Cada acesso atualiza o mtime (ordem do LRU).
+    """
+    path = pdf_path(flipbook)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    directory = os.path.join(FLIPBOOK_CACHE_DIR, str(flipbook.id))
+    target = os.path.join(directory, f'{stem}-{page}-{zoom}.jpg')
+
+    if os.path.exists(target):
+        try:
+            os.utime(target)
+            return target
+        except FileNotFoundError:
+            pass  # despejado entre as duas chamadas
+
+    with _lock_for(flipbook.id):
+        if not os.path.exists(target):
+            os.makedirs(directory, exist_ok=True)
+            _account(_render_to(path, page, ZOOM_LEVELS[zoom], target))
+    return target
+
+
+def generate_thumbnail(flipbook):
+    """Gerar a capa (primeira página) fora do cache e preencher thumbnail_url"""
+    path = pdf_path(flipbook)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    filename = f'{stem}-capa.jpg'
+    _render_to(path, 1, ZOOM_LEVELS[THUMBNAIL_ZOOM], os.path.join(FLIPBOOK_FOLDER, filename))
+    flipbook.thumbnail_url = f'/uploads/flipbooks/{filename}'
+    return flipbook.thumbnail_url
+
+
+@task('flipbooks.prerender', priority=-5)
+def prerender_pages(flipbook_id, pdf_filename, pages=PRERENDER_PAGES, zoom=DEFAULT_ZOOM):
+    """Renderizar as primeiras páginas logo após o upload (na fila de tarefas)"""
+    flipbook = FlipbookRef(flipbook_id, pdf_filename)
+    if not os.path.exists(pdf_path(flipbook)):
+        return  # PDF já substituído por um upload mais novo
+    for page in range(1, min(pages, page_count(flipbook)) + 1):
+        render_page(flipbook, page, zoom)
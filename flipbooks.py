@@ -0,0 +1,83 @@
+from flask import Blueprint, request, jsonify, send_file
+from flask_cors import cross_origin
+
+from src.models.cms import Flipbook
+from src.utils.formats import list_response
+from src.utils.flipbook_pages import (
+    DEFAULT_ZOOM, ZOOM_LEVELS, FlipbookUnavailable, page_count, render_page
+)
+
+flipbooks_bp = Blueprint('flipbooks', __name__)
+
+# Páginas são imutáveis para um mesmo PDF (ver page_url)
+PAGE_MAX_AGE = 7 * 24 * 3600
+
+
+def _flipbook_dict(flipbook):
+    data = flipbook.to_dict()
+    data['pages'] = None
+    if flipbook.pdf_filename:
+        try:
+            data['pages'] = page_count(flipbook)
+        except FlipbookUnavailable:
+            pass
+    if data['pages']:
+        # v= muda a cada novo PDF, então as páginas podem ser cacheadas por muito tempo
+        version = flipbook.pdf_filename.rsplit('.', 1)[0]
+        data['page_url'] = f'/api/flipbooks/{flipbook.id}/pages/{{page}}?v={version}'
+        data['zoom_levels'] = list(ZOOM_LEVELS)
+    return data
+
+
+@flipbooks_bp.route('/flipbooks', methods=['GET'])
+@cross_origin()
+def get_flipbooks():
+    """Listar flipbooks ativos"""
+    try:
+        category = request.args.get('category')
+
+        query = Flipbook.query.filter(Flipbook.active == True)
+        if category:
+            query = query.filter(Flipbook.category == category)
+
+        flipbooks = query.order_by(Flipbook.featured.desc(), Flipbook.created_at.desc()).all()
+        return list_response('flipbooks', [flipbook.to_dict() for flipbook in flipbooks])
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@flipbooks_bp.route('/flipbooks/<int:flipbook_id>', methods=['GET'])
+@cross_origin()
+def get_flipbook(flipbook_id):
+    """Detalhes do flipbook, com número de páginas e URL das páginas renderizadas"""
+    try:
+        flipbook = Flipbook.query.filter(Flipbook.id == flipbook_id, Flipbook.active == True).first()
+        if flipbook is None:
+            return jsonify({'error': 'Flipbook não encontrado'}), 404
+        return jsonify({'flipbook': _flipbook_dict(flipbook)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@flipbooks_bp.route('/flipbooks/<int:flipbook_id>/pages/<int:page>', methods=['GET'])
+@cross_origin()
+def get_flipbook_page(flipbook_id, page):
+    """Imagem de uma página (?zoom=thumb|small|medium|large), gerada sob demanda"""
+    zoom = request.args.get('zoom', DEFAULT_ZOOM)
+    if zoom not in ZOOM_LEVELS:
+        return jsonify({'error': f'Zoom inválido: use {", ".join(ZOOM_LEVELS)}'}), 400
+
+    flipbook = Flipbook.query.filter(Flipbook.id == flipbook_id, Flipbook.active == True).first()
+    if flipbook is None:
+        return jsonify({'error': 'Flipbook não encontrado'}), 404
+    try:
+        path = render_page(flipbook, page, zoom)
+    except FlipbookUnavailable as e:
+        return jsonify({'error': str(e)}), 404
+    except IndexError:
+        return jsonify({'error': 'Página não encontrada'}), 404
+
+    response = send_file(path, mimetype='image/jpeg', conditional=True, max_age=PAGE_MAX_AGE)
+    response.cache_control.public = True
+    return response
@@ -0,0 +1,73 @@
+from datetime import date, datetime
+
+from flask import current_app, jsonify, request
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack é opcional
+    msgpack = None
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+COLUMNAR_MIMETYPE = 'application/vnd.euindico.columnar+json'
+JSON_MIMETYPE = 'application/json'
+
+
+def to_columns(rows):
+    """Converter uma lista de dicts em um dict com um array por campo"""
+    if not rows:
+        return {}
+    fields = list(rows[0])
+    return {field: [row.get(field) for row in rows] for field in fields}
+
+
+def _msgpack_default(o):
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    raise TypeError(f'Tipo não serializável: {type(o).__name__}')
+
+
+def negotiate_format():
+    """Formato da resposta: parâmetro format= tem prioridade sobre o Accept"""
+    fmt = request.args.get('format')
+    layout = request.args.get('layout', 'rows')
+
+    if fmt == 'columnar':
+        return 'json', 'columnar'
+    if fmt in ('json', 'msgpack'):
+        return fmt, layout
+
+    best = request.accept_mimetypes.best_match(
+        [JSON_MIMETYPE, COLUMNAR_MIMETYPE, MSGPACK_MIMETYPE, 'application/x-msgpack'],
+        default=JSON_MIMETYPE
+    )
+    if best == COLUMNAR_MIMETYPE:
+        return 'json', 'columnar'
+    if best in (MSGPACK_MIMETYPE, 'application/x-msgpack'):
+        return 'msgpack', layout
+    return 'json', layout
+
+
+def list_response(key, rows, **meta):
+    """Resposta de listagem em JSON (padrão), JSON colunar ou MessagePack"""
+    fmt, layout = negotiate_format()
+
+    payload = {key: to_columns(rows) if layout == 'columnar' else rows}
+    payload.update(meta)
+    if layout == 'columnar':
+        payload['layout'] = 'columnar'
+        payload['count'] = len(rows)
+
+    if fmt == 'msgpack':
+        if msgpack is None:
+            return jsonify({'error': 'Formato MessagePack não disponível'}), 406
+        response = current_app.response_class(
+            msgpack.packb(payload, default=_msgpack_default, use_bin_type=True),
+            mimetype=MSGPACK_MIMETYPE
+        )
+    else:
+        response = jsonify(payload)
+        if layout == 'columnar':
+            response.mimetype = COLUMNAR_MIMETYPE
+
+    response.vary.add('Accept')
+    return response
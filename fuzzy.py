@@ -0,0 +1,156 @@
+import json
+import logging
+import math
+
+from flask import current_app
+from sqlalchemy import event, text
+
+from src.models.cms import db, Company, Job, Property, SearchTrigram
+from src.utils.geo import normalize
+
+logger = logging.getLogger('search')
+
+# entidade -> (modelo, coluna pesquisada, condição para aparecer na busca)
+FUZZY_SOURCES = {
+    'company': (Company, 'name', Company.approved == True),
+    'job': (Job, 'title', Job.active == True),
+    'property': (Property, 'neighborhood', Property.active == True),
+}
+
+# Padrões (podem ser sobrescritos via app.config)
+FUZZY_THRESHOLD = 0.5  # fração dos trigramas da busca presentes no texto
+FUZZY_LIMIT = 10
+
+_available = {'postgresql': False}
+
+
+def trigrams(value):
+    """Trigramas no estilo do pg_trgm: palavras sem acento, minúsculas, com espaços nas pontas"""
+    grams = set()
+    for word in normalize(value).split():
+        padded = f'  {word} '
+        grams.update(padded[position:position + 3] for position in range(len(padded) - 2))
+    return sorted(grams)
+
+
+def _register_function(dbapi_connection, connection_record):
+    # Usada pelas triggers: json_each(search_trigrams(texto)) gera uma linha por trigrama
+    dbapi_connection.create_function(
+        'search_trigrams', 1, lambda value: json.dumps(trigrams(value)), deterministic=True
+    )
+
+
+def _sqlite_triggers(conn, entity):
+    model, column, _ = FUZZY_SOURCES[entity]
+    table = model.__table__.name
+
+    def insert(row):
+        return (
+            f"INSERT OR IGNORE INTO search_trigram (entity, trigram, item_id) "
+            f"SELECT '{entity}', value, {row}.id FROM json_each(search_trigrams({row}.{column}));"
+        )
+
+    remove = f"DELETE FROM search_trigram WHERE entity = '{entity}' AND item_id = OLD.id;"
+    conn.execute(text(f'CREATE TRIGGER {table}_trigram_insert AFTER INSERT ON {table} BEGIN {insert("NEW")} END'))
+    conn.execute(text(
+        f'CREATE TRIGGER {table}_trigram_update AFTER UPDATE OF {column} ON {table} BEGIN {remove} {insert("NEW")} END'
+    ))
+    conn.execute(text(f'CREATE TRIGGER {table}_trigram_delete AFTER DELETE ON {table} BEGIN {remove} END'))
+    conn.execute(text(
+        f"INSERT OR IGNORE INTO search_trigram (entity, trigram, item_id) "
+        f"SELECT '{entity}', trigram.value, {table}.id FROM {table}, json_each(search_trigrams({table}.{column})) AS trigram"
+    ))
+
+
+def init_fuzzy_index(db):
+    """Índice de trigramas: tabela mantida por triggers no SQLite, GIN pg_trgm no PostgreSQL.
+
+    No SQLite as triggers chamam search_trigrams(), registrada em cada conexão
+    do engine; escritas nessas tabelas por outras ferramentas (ex.: sqlite3 na
+    linha de comando) precisam da mesma função.
+    """
+    engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        if not event.contains(engine, 'connect', _register_function):
+            event.listen(engine, 'connect', _register_function)
+            engine.dispose()  # conexões já abertas não têm a função
+        with engine.begin() as conn:
+            for entity, (model, _, _) in FUZZY_SOURCES.items():
+                exists = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"
+                ), {'name': f'{model.__table__.name}_trigram_insert'}).first()
+                if not exists:
+                    _sqlite_triggers(conn, entity)
+    elif engine.dialect.name == 'postgresql':
+        try:
+            with engine.begin() as conn:
+                conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+                conn.execute(text('CREATE EXTENSION IF NOT EXISTS unaccent'))
+                # unaccent() não é IMMUTABLE: o wrapper permite usá-la em índices
+                conn.execute(text(
+                    "CREATE OR REPLACE FUNCTION search_unaccent(text) RETURNS text AS "
+                    "$$ SELECT lower(public.unaccent('public.unaccent', $1)) $$ "
+                    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT"
+                ))
+                for model, column, _ in FUZZY_SOURCES.values():
+                    table = model.__table__.name
+                    conn.execute(text(
+                        f'CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm ON {table} '
+                        f'USING gin (search_unaccent({column}) gin_trgm_ops)'
+                    ))
+            _available['postgresql'] = True
+        except Exception:
+            logger.exception('pg_trgm/unaccent indisponível: busca aproximada desativada')
+
+
+class FuzzySearchUnavailable(Exception):
+    """Banco sem suporte a trigramas (vira resposta 503)"""
+
+
+def _search_sqlite(entity, query, limit, threshold):
+    model, column, visible = FUZZY_SOURCES[entity]
+    grams = trigrams(query)
+    if not grams:
+        return []
+    # Pela chave primária (entity, trigram, item_id): só as listas dos trigramas da busca
+    matches = db.select(
+        SearchTrigram.item_id, db.func.count().label('shared')
+    ).where(
+        SearchTrigram.entity == entity,
+        SearchTrigram.trigram.in_(grams)
+    ).group_by(SearchTrigram.item_id).having(
+        db.func.count() >= math.ceil(threshold * len(grams))
+    ).subquery()
+
+    rows = db.session.query(model, matches.c.shared).join(
+        matches, matches.c.item_id == model.id
+    ).filter(visible).order_by(
+        matches.c.shared.desc(), db.func.length(getattr(model, column)), model.id
+    ).limit(limit).all()
+    return [(row, shared / len(grams)) for row, shared in rows]
+
+
+def _search_postgresql(entity, query, limit, threshold):
+    if not _available['postgresql']:
+        raise FuzzySearchUnavailable()
+    model, column, visible = FUZZY_SOURCES[entity]
+    searched = db.func.search_unaccent(getattr(model, column))
+    term = db.func.search_unaccent(query)
+    db.session.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+                       {'threshold': str(threshold)})
+    # <% (word similarity) usa o índice GIN; o ranking usa a mesma medida
+    score = db.func.word_similarity(term, searched)
+    rows = db.session.query(model, score).filter(
+        term.op('<%')(searched),
+        visible
+    ).order_by(score.desc(), model.id).limit(limit).all()
+    return rows
+
+
+def fuzzy_search(entity, query, limit=None):
+    """[(entidade, similaridade)] ordenados da mais parecida para a menos"""
+    limit = limit or FUZZY_LIMIT
+    threshold = current_app.config.get('FUZZY_THRESHOLD', FUZZY_THRESHOLD)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return _search_postgresql(entity, query, limit, threshold)
+    return _search_sqlite(entity, query, limit, threshold)
@@ -0,0 +1,264 @@
+import heapq
+import math
+import unicodedata
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import text
+
+from src.models.cms import db, Company, Property
+from src.utils.pagination import PaginationError, parse_limit
+
+# Centro aproximado de cada bairro/distrito de Cabreúva (lat, lng). Usado
+# para geocodificar endereços em texto livre sem serviço externo; pontos
+# exatos podem ser informados diretamente em latitude/longitude.
+GAZETTEER = {
+    'Centro': (-23.3076, -47.1331),
+    'Vila Nova': (-23.3040, -47.1290),
+    'Jardim Alice': (-23.3105, -47.1370),
+    'Jardim Vitória': (-23.3010, -47.1380),
+    'Pinhal': (-23.2950, -47.1140),
+    'Bananal': (-23.2790, -47.0960),
+    'Vale Verde': (-23.2650, -47.0710),
+    'Pica-Pau': (-23.2550, -47.0600),
+    'Vilarejo': (-23.2330, -47.0520),
+    'Jacaré': (-23.2270, -47.0430),
+    'Jundiuvira': (-23.2750, -47.1550),
+    'Caí': (-23.3250, -47.1550),
+    'Guaxatuba': (-23.3350, -47.1700),
+    'Cururu': (-23.3180, -47.0950),
+    'Pirapora': (-23.3400, -47.1200),
+    'São Francisco': (-23.3130, -47.1250),
+    'Bonfim': (-23.2450, -47.0850),
+    'Piraí': (-23.2900, -47.1750),
+    'Campininha': (-23.2850, -47.0800),
+    'Itaguá': (-23.2600, -47.1200),
+    'Barrinha': (-23.3300, -47.1000),
+}
+
+# Tabelas com coordenadas e índice espacial
+SPATIAL_MODELS = (Company, Property)
+
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_RADIUS_KM = 5
+MAX_RADIUS_KM = 50
+
+
+def normalize(value):
+    """Minúsculas sem acentos e sem pontuação, para comparar nomes de bairro"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(''.join(char if char.isalnum() else ' ' for char in value.lower()).split())
+
+
+_GAZETTEER_INDEX = {normalize(name): coords for name, coords in GAZETTEER.items()}
+# Nomes mais longos primeiro: "vila nova" antes de um eventual "vila"
+_GAZETTEER_BY_LENGTH = sorted(_GAZETTEER_INDEX, key=len, reverse=True)
+
+
+def geocode(neighborhood=None, address=None):
+    """Coordenadas do bairro (exato) ou do primeiro bairro citado no endereço"""
+    if neighborhood:
+        coords = _GAZETTEER_INDEX.get(normalize(neighborhood))
+        if coords:
+            return coords
+    if address:
+        padded = f' {normalize(address)} '
+        for name in _GAZETTEER_BY_LENGTH:
+            if f' {name} ' in padded:
+                return _GAZETTEER_INDEX[name]
+    return None
+
+
+def apply_geocode(obj, overwrite=False):
+    """Preencher latitude/longitude pelo gazetteer (retorna True se preencheu)"""
+    if not overwrite and obj.latitude is not None and obj.longitude is not None:
+        return False
+    coords = geocode(getattr(obj, 'neighborhood', None), obj.address)
+    if coords is None:
+        return False
+    obj.latitude, obj.longitude = coords
+    return True
+
+
+def geocode_values(values, model, row_id):
+    """Completar um PATCH que muda o endereço/bairro sem informar coordenadas.
+
+    Campos de localização não enviados vêm da linha atual. Sem bairro
+    conhecido, as coordenadas são apagadas: as antigas apontariam para o
+    endereço anterior.
+    """
+    if not ('address' in values or 'neighborhood' in values) or 'latitude' in values or 'longitude' in values:
+        return values
+
+    names = ['neighborhood', 'address'] if hasattr(model, 'neighborhood') else ['address']
+    location = {name: values.get(name) for name in names}
+    missing = [name for name in names if name not in values]
+    if missing:
+        row = db.session.query(*[getattr(model, name) for name in missing]).filter(model.id == row_id).first()
+        if row is not None:
+            location.update(zip(missing, row))
+
+    coords = geocode(location.get('neighborhood'), location['address'])
+    values['latitude'], values['longitude'] = coords or (None, None)
+    return values
+
+
+def init_spatial_index(db):
+    """Criar o índice espacial: R*Tree mantida por triggers no SQLite, GiST no PostgreSQL.
+
+    Triggers (e não eventos do ORM) porque PATCH e operações em massa fazem
+    UPDATE direto na tabela.
+    """
+    engine = db.engine
+    with engine.begin() as conn:
+        for model in SPATIAL_MODELS:
+            table = model.__table__.name
+            if engine.dialect.name == 'sqlite':
+                rtree = f'{table}_geo'
+                exists = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+                ), {'name': rtree}).first()
+                if not exists:
+                    conn.execute(text(f'CREATE VIRTUAL TABLE {rtree} USING rtree(id, min_lat, max_lat, min_lng, max_lng)'))
+                    conn.execute(text(
+                        f'INSERT INTO {rtree} SELECT id, latitude, latitude, longitude, longitude FROM {table} '
+                        f'WHERE latitude IS NOT NULL AND longitude IS NOT NULL'
+                    ))
+                conn.execute(text(
+                    f'CREATE TRIGGER IF NOT EXISTS {table}_geo_insert AFTER INSERT ON {table} '
+                    f'WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL BEGIN '
+                    f'INSERT OR REPLACE INTO {rtree} VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude); END'
+                ))
+                conn.execute(text(
+                    f'CREATE TRIGGER IF NOT EXISTS {table}_geo_update AFTER UPDATE OF latitude, longitude ON {table} BEGIN '
+                    f'DELETE FROM {rtree} WHERE id = OLD.id; '
+                    f'INSERT INTO {rtree} SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude '
+                    f'WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL; END'
+                ))
+                conn.execute(text(
+                    f'CREATE TRIGGER IF NOT EXISTS {table}_geo_delete AFTER DELETE ON {table} BEGIN '
+                    f'DELETE FROM {rtree} WHERE id = OLD.id; END'
+                ))
+            elif engine.dialect.name == 'postgresql':
+                conn.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS ix_{table}_geo ON {table} USING gist (point(longitude, latitude)) '
+                    f'WHERE latitude IS NOT NULL AND longitude IS NOT NULL'
+                ))
+
+
+def within_box(model, min_lat, min_lng, max_lat, max_lng):
+    """Condição "dentro do retângulo" que usa o índice espacial do banco"""
+    exact = db.and_(
+        model.latitude.between(min_lat, max_lat),
+        model.longitude.between(min_lng, max_lng)
+    )
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        rtree = db.table(f'{model.__table__.name}_geo', db.column('id'), db.column('min_lat'),
+                         db.column('max_lat'), db.column('min_lng'), db.column('max_lng'))
+        candidates = db.select(rtree.c.id).where(
+            rtree.c.max_lat >= min_lat, rtree.c.min_lat <= max_lat,
+            rtree.c.max_lng >= min_lng, rtree.c.min_lng <= max_lng
+        )
+        # A R*Tree guarda float32 arredondado para fora: conferir o valor exato
+        return db.and_(model.id.in_(candidates), exact)
+    if dialect == 'postgresql':
+        box = db.func.box(db.func.point(min_lng, min_lat), db.func.point(max_lng, max_lat))
+        return db.and_(db.func.point(model.longitude, model.latitude).op('<@')(box), exact)
+    return exact
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Distância (haversine) em km"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _floats(value, count, name):
+    try:
+        numbers = [float(part) for part in value.split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(math.isfinite(number) for number in numbers):
+        raise PaginationError(f'Valor inválido em "{name}"')
+    return numbers
+
+
+def parse_bbox(args):
+    """bbox=min_lng,min_lat,max_lng,max_lat (ou None se ausente)"""
+    if not args.get('bbox'):
+        return None
+    bbox = _floats(args['bbox'], 4, 'bbox')
+    min_lng, min_lat, max_lng, max_lat = bbox
+    if not (-180 <= min_lng <= max_lng <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise PaginationError('Valor inválido em "bbox"')
+    return bbox
+
+
+def parse_geo_args(args):
+    """near=lat,lng [&radius_km=] e/ou bbox=min_lng,min_lat,max_lng,max_lat"""
+    near = _floats(args['near'], 2, 'near') if args.get('near') else None
+    bbox = parse_bbox(args)
+    radius = args.get('radius_km', DEFAULT_RADIUS_KM, type=float)
+    if radius is None or not 0 < radius <= MAX_RADIUS_KM:
+        raise PaginationError(f'"radius_km" deve estar entre 0 e {MAX_RADIUS_KM}')
+    return near, radius, bbox
+
+
+def geo_search(query, model, args):
+    """Resultados dentro do raio/retângulo, do mais próximo para o mais distante.
+
+    O raio vira um retângulo para o índice espacial; a distância exata só é
+    calculada para os candidatos dentro dele.
+    """
+    near, radius, bbox = parse_geo_args(args)
+    limit = parse_limit(args.get('limit', type=int))
+
+    if bbox:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        query = query.filter(within_box(model, min_lat, min_lng, max_lat, max_lng))
+    if near:
+        lat, lng = near
+        delta_lat = math.degrees(radius / EARTH_RADIUS_KM)
+        delta_lng = delta_lat / max(math.cos(math.radians(lat)), 0.01)
+        query = query.filter(within_box(model, lat - delta_lat, lng - delta_lng, lat + delta_lat, lng + delta_lng))
+
+        # Distâncias só com (id, lat, lng); entidades completas apenas para o top N
+        ranked = []
+        for row_id, row_lat, row_lng in query.with_entities(model.id, model.latitude, model.longitude):
+            distance = distance_km(lat, lng, row_lat, row_lng)
+            if distance <= radius:
+                ranked.append((distance, row_id))
+        ranked = heapq.nsmallest(limit, ranked)
+        rows = {row.id: row for row in model.query.filter(model.id.in_([row_id for _, row_id in ranked]))}
+        results = [(distance, rows[row_id]) for distance, row_id in ranked if row_id in rows]
+    else:
+        results = [(None, row) for row in query.limit(limit)]
+
+    items = []
+    for distance, row in results:
+        item = row.to_dict()
+        item['distance_km'] = round(distance, 3) if distance is not None else None
+        items.append(item)
+    return items
+
+
+@click.command('geocode')
+@click.option('--overwrite', is_flag=True, help='Recalcular também as linhas que já têm coordenadas')
+@with_appcontext
+def geocode_command(overwrite):
+    """Geocodificar empresas e imóveis em lote pelo gazetteer de bairros"""
+    for model in SPATIAL_MODELS:
+        query = model.query
+        if not overwrite:
+            query = query.filter(db.or_(model.latitude.is_(None), model.longitude.is_(None)))
+        ids = [row_id for (row_id,) in query.with_entities(model.id)]
+
+        found = 0
+        for start in range(0, len(ids), 500):
+            for row in model.query.filter(model.id.in_(ids[start:start + 500])):
+                found += apply_geocode(row, overwrite=overwrite)
+            db.session.commit()
+        click.echo(f'{model.__name__}: {found} de {len(ids)} geocodificados')
@@ -0,0 +1,19 @@
+import os
+
+from prometheus_client import multiprocess
+
+# Streams SSE (/api/events/...) ficam abertos por minutos: com workers sync
+# cada conexão prenderia um processo inteiro. O worker gevent atende milhares
+# de conexões ociosas por processo; sem gevent, cai para threads.
+try:
+    import gevent  # noqa: F401
+    worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+except ImportError:
+    worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+    threads = int(os.environ.get('GUNICORN_THREADS', 32))
+
+
+def child_exit(server, worker):
+    """Descartar as métricas 'live' de workers que saíram"""
+    multiprocess.mark_process_dead(worker.pid)
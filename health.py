@@ -0,0 +1,154 @@
+from flask import Blueprint, jsonify, current_app
+from flask_cors import cross_origin
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+import math
+import os
+import shutil
+import threading
+import time
+
+from src.models.cms import db
+from src.routes.companies import UPLOAD_FOLDER
+
+health_bp = Blueprint('health', __name__)
+
+# Padrões (podem ser sobrescritos via app.config)
+READINESS_CACHE_SECONDS = 2.0
+HEALTH_MIN_FREE_DISK_MB = 500
+HEALTH_MAX_POOL_USAGE = 0.9
+HEALTH_DB_TIMEOUT_SECONDS = 2.0
+DEFAULT_MAX_OVERFLOW = 10  # padrão do create_engine para QueuePool
+
+# Verificações adicionais registradas por outros módulos (ex.: fila de imagens)
+_extra_checks = {}
+
+_cache = {'expires': 0.0, 'result': None, 'refreshing': False}
+_cache_lock = threading.Lock()
+_first_result = threading.Event()
+_probe = {'url': None, 'engine': None}
+
+
+def register_readiness_check(name, check):
+    """Registrar uma verificação extra: check() -> (ok, detalhes)"""
+    _extra_checks[name] = check
+
+
+def _timed(check):
+    start = time.perf_counter()
+    try:
+        ok, details = check()
+    except Exception as e:
+        ok, details = False, {'error': str(e)}
+    details['ok'] = ok
+    details['latency_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return details
+
+
+def _probe_engine(timeout):
+    # Conexão própria, fora do pool: pool esgotado não trava a verificação
+    # (a saturação do pool é reportada por _check_pool)
+    url = db.engine.url
+    if _probe['url'] != url:
+        if url.get_backend_name() == 'sqlite':
+            connect_args = {'timeout': timeout}
+        elif url.get_backend_name() == 'postgresql':
+            connect_args = {
+                'connect_timeout': max(int(math.ceil(timeout)), 1),
+                'options': f'-c statement_timeout={int(timeout * 1000)}'
+            }
+        else:
+            connect_args = {}
+        _probe['engine'] = create_engine(url, poolclass=NullPool, connect_args=connect_args)
+        _probe['url'] = url
+    return _probe['engine']
+
+
+def _check_database():
+    timeout = current_app.config.get('HEALTH_DB_TIMEOUT_SECONDS', HEALTH_DB_TIMEOUT_SECONDS)
+    with _probe_engine(timeout).connect() as conn:
+        conn.execute(text('SELECT 1'))
+    return True, {}
+
+
+def _check_pool():
+    pool = db.engine.pool
+    if not hasattr(pool, 'checkedout') or not hasattr(pool, 'size'):
+        return True, {'pool': type(pool).__name__}
+
+    engine_options = current_app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    capacity = pool.size() + max(engine_options.get('max_overflow', DEFAULT_MAX_OVERFLOW), 0)
+    checked_out = pool.checkedout()
+    usage = checked_out / capacity if capacity > 0 else 0.0
+    max_usage = current_app.config.get('HEALTH_MAX_POOL_USAGE', HEALTH_MAX_POOL_USAGE)
+    return usage < max_usage, {
+        'checked_out': checked_out,
+        'capacity': capacity,
+        'usage': round(usage, 3)
+    }
+
+
+def _check_disk():
+    path = UPLOAD_FOLDER if os.path.exists(UPLOAD_FOLDER) else os.path.dirname(UPLOAD_FOLDER)
+    usage = shutil.disk_usage(path)
+    free_mb = usage.free // (1024 * 1024)
+    min_free_mb = current_app.config.get('HEALTH_MIN_FREE_DISK_MB', HEALTH_MIN_FREE_DISK_MB)
+    return free_mb >= min_free_mb, {'free_mb': free_mb, 'min_free_mb': min_free_mb}
+
+
+def _run_checks():
+    checks = {
+        'database': _timed(_check_database),
+        'db_pool': _timed(_check_pool),
+        'upload_disk': _timed(_check_disk)
+    }
+    for name, check in _extra_checks.items():
+        checks[name] = _timed(check)
+
+    return {
+        'status': 'ok' if all(check['ok'] for check in checks.values()) else 'unavailable',
+        'checks': checks
+    }
+
+
+@health_bp.route('/health/live', methods=['GET'])
+@cross_origin()
+def liveness():
+    """Liveness: o processo está respondendo (não toca dependências)"""
+    return jsonify({'status': 'ok'})
+
+
+@health_bp.route('/health/ready', methods=['GET'])
+@cross_origin()
+def readiness():
+    """Readiness: banco, pool, disco de uploads e filas, com cache curto"""
+    ttl = current_app.config.get('READINESS_CACHE_SECONDS', READINESS_CACHE_SECONDS)
+
+    # Só uma requisição por vez refaz as verificações (fora do lock); enquanto
+    # isso as demais respondem com o último resultado, mesmo vencido
+    with _cache_lock:
+        result = _cache['result']
+        cached = result is not None and time.monotonic() < _cache['expires']
+        refresh = not cached and not _cache['refreshing']
+        if refresh:
+            _cache['refreshing'] = True
+
+    if refresh:
+        try:
+            result = _run_checks()
+            with _cache_lock:
+                _cache['result'] = result
+                _cache['expires'] = time.monotonic() + ttl
+            _first_result.set()
+        finally:
+            with _cache_lock:
+                _cache['refreshing'] = False
+    elif result is None:
+        # Primeira verificação do processo ainda em andamento em outra requisição
+        _first_result.wait(current_app.config.get('HEALTH_DB_TIMEOUT_SECONDS', HEALTH_DB_TIMEOUT_SECONDS))
+        result = _cache['result']
+        if result is None:
+            return jsonify({'status': 'unavailable', 'checks': {}, 'cached': False}), 503
+
+    result = dict(result, cached=not refresh)
+    return jsonify(result), 200 if result['status'] == 'ok' else 503
@@ -0,0 +1,110 @@
+from flask import Blueprint, jsonify, current_app
+from flask_cors import cross_origin
+from concurrent.futures import ThreadPoolExecutor
+
+from src.models.cms import db, Company, News, Job, Property, SiteSettings
+from src.routes.admin import get_settings_dict
+from src.utils.cache import TTLCache, on_model_commit
+
+home_bp = Blueprint('home', __name__)
+
+home_cache = TTLCache('home')
+
+# Seções sem dependência entre si buscadas em paralelo (cada uma com sua sessão)
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='home')
+
+
+def _featured_news():
+    return [article.to_dict() for article in News.query.filter_by(
+        featured=True,
+        published=True
+    ).order_by(News.created_at.desc()).limit(5)]
+
+
+def _urgent_news():
+    return [article.to_dict() for article in News.query.filter_by(
+        urgent=True,
+        published=True
+    ).order_by(News.created_at.desc()).limit(3)]
+
+
+def _featured_companies():
+    return [company.to_dict() for company in Company.query.filter_by(
+        approved=True,
+        featured=True
+    ).order_by(Company.created_at.desc()).limit(8)]
+
+
+def _latest_jobs():
+    return [job.to_dict() for job in Job.query.filter_by(
+        active=True
+    ).order_by(Job.created_at.desc()).limit(6)]
+
+
+def _latest_properties():
+    return [prop.to_dict() for prop in Property.query.filter_by(
+        active=True
+    ).order_by(Property.featured.desc(), Property.created_at.desc()).limit(6)]
+
+
+# seção -> (função, TTL em segundos, modelos que a invalidam)
+SECTIONS = {
+    'featured_news': (_featured_news, 60, (News,)),
+    'urgent_news': (_urgent_news, 15, (News,)),
+    'featured_companies': (_featured_companies, 120, (Company,)),
+    'latest_jobs': (_latest_jobs, 60, (Job,)),
+    'latest_properties': (_latest_properties, 60, (Property,)),
+    'settings': (get_settings_dict, 300, (SiteSettings,)),
+}
+
+
+def _invalidate_sections(model):
+    home_cache.invalidate(*[
+        name for name, (_, _, models) in SECTIONS.items() if model in models
+    ])
+
+
+for _model in {model for _, _, models in SECTIONS.values() for model in models}:
+    on_model_commit(_model, _invalidate_sections)
+
+
+def _load_section(app, name):
+    loader, ttl, _ = SECTIONS[name]
+    with app.app_context():
+        try:
+            value = loader()
+        finally:
+            db.session.remove()
+    home_cache.set(name, value, ttl)
+    return value
+
+
+@home_bp.route('/home', methods=['GET'])
+@cross_origin()
+def get_home():
+    """Todas as seções da página inicial em uma única requisição"""
+    try:
+        result = {}
+        missing = []
+        for name in SECTIONS:
+            value = home_cache.get(name)
+            if value is None:
+                missing.append(name)
+            else:
+                result[name] = value
+
+        if len(missing) == 1:
+            result[missing[0]] = _load_section(current_app._get_current_object(), missing[0])
+        elif missing:
+            app = current_app._get_current_object()
+            futures = {name: _executor.submit(_load_section, app, name) for name in missing}
+            for name, future in futures.items():
+                result[name] = future.result()
+
+        response = jsonify(result)
+        response.cache_control.public = True
+        response.cache_control.max_age = min(ttl for _, ttl, _ in SECTIONS.values())
+        return response
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,67 @@
+import os
+import tempfile
+
+from flask import Request
+from PIL import Image, UnidentifiedImageError
+
+# Tamanho máximo das fotos salvas (mantendo proporção)
+PHOTO_MAX_SIZE = (1200, 800)
+
+# Acima disso a imagem é recusada antes de decodificar (proteção contra
+# "decompression bombs"); 50 MP cobre qualquer câmera de celular atual
+MAX_UPLOAD_PIXELS = 50_000_000
+Image.MAX_IMAGE_PIXELS = MAX_UPLOAD_PIXELS
+
+# Partes de upload acima disso vão para um arquivo temporário em disco
+UPLOAD_SPOOL_MAX_MEMORY = 256 * 1024
+UPLOAD_TMP_DIR = os.environ.get('UPLOAD_TMP_DIR') or None
+
+
+class ImageRejected(ValueError):
+    """Imagem inválida ou grande demais (vira resposta 400)"""
+
+
+class UploadRequest(Request):
+    """Request que grava os arquivos enviados em disco em vez de mantê-los na memória"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MEMORY, dir=UPLOAD_TMP_DIR)
+
+
+def fitted_size(size, max_size):
+    """Tamanho final de um thumbnail que cabe em max_size (sem ampliar)"""
+    width, height = size
+    scale = min(max_size[0] / width, max_size[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def save_photo(stream, filepath, max_size=PHOTO_MAX_SIZE, quality=85):
+    """Redimensionar e salvar como JPEG com memória limitada.
+
+    Para JPEG usa o modo draft do decodificador (escala 1/2, 1/4 ou 1/8 direto
+    no DCT), então uma foto de 24 MP nunca é expandida por inteiro na memória.
+    """
+    try:
+        image = Image.open(stream)
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise ImageRejected('Arquivo de imagem inválido') from e
+
+    # Image.open só lê o cabeçalho: checar antes de decodificar os pixels
+    if image.width * image.height > MAX_UPLOAD_PIXELS:
+        raise ImageRejected('Imagem muito grande (máximo de %d megapixels)' % (MAX_UPLOAD_PIXELS // 1_000_000))
+
+    target = fitted_size(image.size, max_size)
+    if image.format == 'JPEG':
+        image.draft('RGB', target)
+
+    try:
+        image.thumbnail(target, Image.Resampling.LANCZOS)
+    except (OSError, SyntaxError) as e:
+        raise ImageRejected('Arquivo de imagem corrompido') from e
+
+    # Salvar como JPEG para otimizar tamanho
+    if image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+
+    image.save(filepath, 'JPEG', quality=quality, optimize=True)
+    return image.size
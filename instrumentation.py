@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.json.provider import JSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('perf')
+
+# Fração das requisições instrumentadas (1.0 = todas, 0.0 = desligado)
+DEFAULT_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', '0.1'))
+
+# Chaves de conn.info com a pilha de inícios por instrução de quem mede
+# consultas (este módulo, slow_queries); o handle_error abaixo limpa todas
+STATEMENT_START_KEYS = {'_perf_start'}
+
+
+def _sampled():
+    return has_request_context() and g.get('_perf') is not None
+
+
+def _add(name, duration):
+    perf = g._perf
+    perf[name] = perf.get(name, 0.0) + duration
+
+
+@contextmanager
+def perf_timer(name):
+    """Medir um trecho da requisição (ex.: serialização ORM -> dict)"""
+    if not _sampled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add(name, time.perf_counter() - start)
+
+
+class TimedJSONProvider(JSONProvider):
+    """Envolve o provider JSON do app e contabiliza o tempo de codificação"""
+
+    def __init__(self, app, provider):
+        super().__init__(app)
+        self._provider = provider
+
+    def dumps(self, obj, **kwargs):
+        if not _sampled():
+            return self._provider.dumps(obj, **kwargs)
+        start = time.perf_counter()
+        try:
+            return self._provider.dumps(obj, **kwargs)
+        finally:
+            _add('json', time.perf_counter() - start)
+
+    def loads(self, s, **kwargs):
+        return self._provider.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if not _sampled():
+            return self._provider.response(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return self._provider.response(*args, **kwargs)
+        finally:
+            _add('json', time.perf_counter() - start)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _sampled():
+        conn.info.setdefault('_perf_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_perf_start')
+    if not starts or not _sampled():
+        return
+    _add('db', time.perf_counter() - starts.pop())
+    g._perf_queries += 1
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    # Instrução que falhou não passa pelo after_cursor_execute: descartar o início dela em cada pilha
+    if context.connection is None or context.execution_context is None:
+        return
+    for key in STATEMENT_START_KEYS:
+        starts = context.connection.info.get(key)
+        if starts:
+            starts.pop()
+
+
+def _server_timing(perf, queries, total):
+    parts = ['db;dur=%.2f;desc="%d queries"' % (perf.get('db', 0.0) * 1000, queries)]
+    for name in sorted(perf):
+        if name != 'db':
+            parts.append('%s;dur=%.2f' % (name, perf[name] * 1000))
+    parts.append('total;dur=%.2f' % (total * 1000))
+    return ', '.join(parts)
+
+
+def init_instrumentation(app):
+    """Registrar a instrumentação de desempenho por requisição"""
+    app.config.setdefault('PERF_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+    app.json = TimedJSONProvider(app, app.json)
+
+    @app.before_request
+    def _start_perf():
+        if random.random() < app.config['PERF_SAMPLE_RATE']:
+            g._perf = {}
+            g._perf_queries = 0
+            g._perf_start = time.perf_counter()
+
+    @app.after_request
+    def _finish_perf(response):
+        perf = g.get('_perf')
+        if perf is None:
+            return response
+
+        total = time.perf_counter() - g._perf_start
+        response.headers['Server-Timing'] = _server_timing(perf, g._perf_queries, total)
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'sql_queries': g._perf_queries,
+            'total_ms': round(total * 1000, 2),
+        }
+        for name, duration in perf.items():
+            record['%s_ms' % name] = round(duration * 1000, 2)
+        logger.info(json.dumps(record))
+
+        return response
@@ -3,6 +3,10 @@ from flask_cors import cross_origin
 
 from src.models.cms import db, Job
 from src.routes.auth import require_admin
+from src.utils.patching import RowNotFound, VersionConflict, VersionRequired, expected_version, patch_row
+from src.utils.formats import list_response
+from src.utils.pagination import PaginationError
+from src.utils.sync import sync_response
 
 jobs_bp = Blueprint('jobs', __name__)
 
@@ -18,6 +22,15 @@ def get_jobs():
         contract_type = request.args.get('contract_type')
         active_only = request.args.get('active_only', 'true').lower() == 'true'
         search = request.args.get('search')
+        changed_since = request.args.get('changed_since')
+        
+        # Sincronização incremental: só o que mudou desde o token ('0' = tudo)
+        if changed_since:
+            return sync_response(
+                'jobs', Job, changed_since,
+                lambda job: job.active or not active_only,
+                request.args.get('limit', type=int)
+            )
         
         query = Job.query
         
@@ -50,14 +63,17 @@ def get_jobs():
             error_out=False
         )
         
-        return jsonify({
-            'jobs': [job.to_dict() for job in jobs.items],
-            'total': jobs.total,
-            'pages': jobs.pages,
-            'current_page': page,
-            'per_page': per_page
-        })
+        return list_response(
+            'jobs',
+            [job.to_dict() for job in jobs.items],
+            total=jobs.total,
+            pages=jobs.pages,
+            current_page=page,
+            per_page=per_page
+        )
         
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -104,28 +120,46 @@ def create_job():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@jobs_bp.route('/jobs/<int:job_id>', methods=['PUT'])
+@jobs_bp.route('/jobs/<int:job_id>', methods=['PUT', 'PATCH'])
 @cross_origin()
 @require_admin
 def update_job(job_id):
-    """Atualizar vaga (apenas admin)"""
+    """Atualizar vaga (apenas admin; UPDATE único com controle de versão)"""
     try:
-        job = Job.query.get_or_404(job_id)
-        data = request.json
+        data = request.json or {}
+        values = {
+            field: data[field]
+            for field in ['title', 'company_name', 'description', 'location', 'salary', 'contract_type', 'category', 'contact_email', 'contact_phone', 'active']
+            if field in data
+        }
         
-        # Atualizar campos
-        for field in ['title', 'company_name', 'description', 'location', 'salary', 'contract_type', 'category', 'contact_email', 'contact_phone', 'active']:
-            if field in data:
-                setattr(job, field, data[field])
+        if not values:
+            return jsonify({'error': 'Nenhum campo para atualizar'}), 400
         
+        job = patch_row(Job, job_id, values, expected_version(data))
         db.session.commit()
         
+        # Mesmo formato do to_dict() de antes
+        job = db.session.get(Job, job_id)
+        
         return jsonify({
             'success': True,
             'job': job.to_dict(),
             'message': 'Vaga atualizada com sucesso'
         })
         
+    except RowNotFound:
+        db.session.rollback()
+        return jsonify({'error': 'Vaga não encontrada'}), 404
+    except VersionRequired:
+        db.session.rollback()
+        return jsonify({'error': 'Informe a versão atual ("version" ou If-Match) para editar via PATCH'}), 428
+    except VersionConflict as e:
+        db.session.rollback()
+        return jsonify({
+            'error': 'A vaga foi alterada por outra pessoa. Recarregue e tente novamente.',
+            'current_version': e.current_version
+        }), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -6,14 +6,38 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from flask import Flask, send_from_directory, session
 from flask_cors import CORS
 from src.models.cms import db
+from src.utils.schema import sync_schema
+from src.utils.geo import geocode_command, init_spatial_index
+from src.utils.clusters import init_cluster_index, map_rebuild_command
+from src.utils.fuzzy import init_fuzzy_index
+from src.utils.related import related_rebuild_command
+from src.utils.suggest import suggest_rebuild_command
+from src.utils.file_cleanup import uploads_gc_command
+from src.utils.images import UploadRequest
 from src.routes.auth import auth_bp
 from src.routes.companies import companies_bp
 from src.routes.admin import admin_bp
 from src.routes.news import news_bp
 from src.routes.jobs import jobs_bp
 from src.routes.properties import properties_bp
+from src.routes.health import health_bp, register_readiness_check
+from src.routes.home import home_bp
+from src.routes.batch import batch_bp
+from src.routes.uploads import uploads_bp, expire_uploads_command
+from src.routes.flipbooks import flipbooks_bp
+from src.routes.realtime import realtime_bp
+from src.routes.maps import maps_bp
+from src.routes.search import search_bp
+from src.utils.serializers import init_json_provider
+from src.utils.compression import init_compression
+from src.utils.instrumentation import init_instrumentation
+from src.utils.metrics import init_metrics
+from src.utils.slow_queries import init_slow_query_log
+from src.utils.sync import sync_purge_command
+from src.utils.tasks import tasks_cli, readiness_check as tasks_readiness_check
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+app.request_class = UploadRequest  # uploads gravados em disco, não na memória
 app.config['SECRET_KEY'] = 'euindicocabreuva#2024$CMS!@#'
 app.config['SESSION_COOKIE_SECURE'] = False  # Para desenvolvimento
 app.config['SESSION_COOKIE_HTTPONLY'] = True
@@ -29,6 +53,24 @@ app.register_blueprint(admin_bp, url_prefix='/api/admin')
 app.register_blueprint(news_bp, url_prefix='/api')
 app.register_blueprint(jobs_bp, url_prefix='/api')
 app.register_blueprint(properties_bp, url_prefix='/api')
+app.register_blueprint(health_bp, url_prefix='/api')
+app.register_blueprint(home_bp, url_prefix='/api')
+app.register_blueprint(batch_bp, url_prefix='/api')
+app.register_blueprint(uploads_bp, url_prefix='/api')
+app.register_blueprint(flipbooks_bp, url_prefix='/api')
+app.register_blueprint(realtime_bp, url_prefix='/api')
+app.register_blueprint(maps_bp, url_prefix='/api')
+app.register_blueprint(search_bp, url_prefix='/api')
+
+# Comandos de manutenção (ex.: flask --app src.main uploads-gc)
+app.cli.add_command(uploads_gc_command)
+app.cli.add_command(expire_uploads_command)
+app.cli.add_command(sync_purge_command)
+app.cli.add_command(geocode_command)
+app.cli.add_command(map_rebuild_command)
+app.cli.add_command(related_rebuild_command)
+app.cli.add_command(suggest_rebuild_command)
+app.cli.add_command(tasks_cli)  # flask tasks worker|stats|list|retry|purge
 
 # Configurar banco de dados
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
@@ -37,9 +79,31 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
 db.init_app(app)
 
+# Serialização JSON rápida (orjson, com datetimes nativos)
+init_json_provider(app)
+
+# Compressão das respostas (zstd/br/gzip); registrada antes para rodar por último
+init_compression(app)
+
+# Instrumentação de desempenho (Server-Timing + logs estruturados, com amostragem)
+init_instrumentation(app)
+
+# Métricas Prometheus em /metrics
+init_metrics(app)
+
+# Registro de consultas lentas (SLOW_QUERY_THRESHOLD_MS / SLOW_QUERY_EXPLAIN_FIRST_N)
+init_slow_query_log(app)
+
+# Situação da fila de tarefas em /api/health/ready (informativo)
+register_readiness_check('tasks', tasks_readiness_check)
+
 # Criar tabelas
 with app.app_context():
     db.create_all()
+    sync_schema(db)
+    init_spatial_index(db)
+    init_cluster_index(db)
+    init_fuzzy_index(db)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
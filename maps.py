@@ -0,0 +1,45 @@
+from flask import Blueprint, request, jsonify
+from flask_cors import cross_origin
+
+from src.utils.clusters import CLUSTER_SOURCES, MAX_ZOOM, cell_size, get_clusters
+from src.utils.formats import list_response
+from src.utils.geo import parse_bbox
+from src.utils.pagination import PaginationError
+
+maps_bp = Blueprint('maps', __name__)
+
+MAP_KINDS = tuple(kind for kind, _ in CLUSTER_SOURCES.values())
+
+
+@maps_bp.route('/map/clusters', methods=['GET'])
+@cross_origin()
+def get_map_clusters():
+    """Pins do mapa agrupados por célula (?bbox=min_lng,min_lat,max_lng,max_lat&zoom=&types=)"""
+    try:
+        bbox = parse_bbox(request.args)
+        if bbox is None:
+            return jsonify({'error': 'Parâmetro "bbox" é obrigatório'}), 400
+
+        zoom = request.args.get('zoom', type=int)
+        if zoom is None or zoom < 0:
+            return jsonify({'error': 'Parâmetro "zoom" inválido'}), 400
+
+        kinds = request.args.get('types')
+        kinds = [kind.strip() for kind in kinds.split(',') if kind.strip()] if kinds else list(MAP_KINDS)
+        if not kinds or any(kind not in MAP_KINDS for kind in kinds):
+            return jsonify({'error': f'Tipos válidos: {", ".join(MAP_KINDS)}'}), 400
+
+        effective_zoom, clusters = get_clusters(bbox, zoom, kinds)
+        return list_response(
+            'clusters',
+            clusters,
+            zoom=effective_zoom,
+            max_zoom=MAX_ZOOM,
+            cell_size=cell_size(effective_zoom),
+            total=sum(cluster['count'] for cluster in clusters)
+        )
+
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,109 @@
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess, REGISTRY
+)
+
+from src.models.cms import db
+
+# Com o gunicorn, defina PROMETHEUS_MULTIPROC_DIR (diretório vazio e gravável)
+# antes de iniciar os workers: cada processo grava suas métricas ali e o
+# /metrics agrega todos eles (ver gunicorn.conf.py).
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+# Buckets pensados para as listagens (a maioria abaixo de 1s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Latência das requisições HTTP',
+    ['blueprint', 'route', 'method'],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_COUNT = Counter(
+    'http_requests_total',
+    'Requisições HTTP por status',
+    ['blueprint', 'route', 'method', 'status']
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out',
+    'Conexões do pool em uso',
+    multiprocess_mode='livesum'
+)
+DB_POOL_OVERFLOW = Gauge(
+    'db_pool_overflow',
+    'Conexões abertas além do tamanho do pool',
+    multiprocess_mode='livesum'
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total',
+    'Consultas a caches internos (hit/miss)',
+    ['cache', 'result']
+)
+UPLOAD_DURATION = Histogram(
+    'upload_processing_seconds',
+    'Tempo de processamento de uploads',
+    ['kind'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+
+def record_cache_lookup(cache, hit):
+    """Registrar um acerto/erro de cache (a taxa é calculada no Prometheus)"""
+    CACHE_LOOKUPS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def observe_upload(kind):
+    """Context manager que mede o processamento de um upload"""
+    return UPLOAD_DURATION.labels(kind=kind).time()
+
+
+def _update_pool_gauges():
+    pool = db.engine.pool
+    if hasattr(pool, 'checkedout'):
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+    if hasattr(pool, 'overflow'):
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def metrics_view():
+    """Endpoint de métricas no formato do Prometheus"""
+    _update_pool_gauges()
+
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    """Registrar coleta de métricas e o endpoint /metrics"""
+
+    @app.before_request
+    def _start_metrics():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_metrics(response):
+        start = g.get('_metrics_start')
+        if start is None or request.endpoint == 'metrics':
+            return response
+
+        # Usar o template da rota (ex.: /api/companies/<int:company_id>)
+        # para manter a cardinalidade dos rótulos sob controle
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        blueprint = request.blueprint or 'app'
+
+        REQUEST_LATENCY.labels(blueprint, route, request.method).observe(time.perf_counter() - start)
+        REQUEST_COUNT.labels(blueprint, route, request.method, str(response.status_code)).inc()
+        _update_pool_gauges()
+
+        return response
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
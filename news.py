@@ -1,11 +1,92 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_cors import cross_origin
+from collections import Counter
+import atexit
+import logging
+import threading
+import time
 
 from src.models.cms import db, News
 from src.routes.auth import require_admin
+from src.utils.patching import RowNotFound, VersionConflict, VersionRequired, expected_version, patch_row
+from src.utils.formats import list_response
+from src.utils.tasks import enqueue, task
+from src.utils.events import publish_event
+from src.utils.related import related_items
+from src.utils.suggest import schedule_refresh
 
 news_bp = Blueprint('news', __name__)
 
+logger = logging.getLogger('tasks')
+
+# Padrão (pode ser sobrescrito via app.config): visualizações somadas no
+# processo e gravadas no máximo uma vez por intervalo (uma tarefa por notícia)
+NEWS_VIEWS_FLUSH_INTERVAL = 10.0
+
+_views = {'pending': Counter(), 'thread': None, 'app': None}
+_views_lock = threading.Lock()
+
+
+def count_view(news_id):
+    """Contar uma visualização sem escrever no banco a cada acesso.
+
+    Só soma em memória; uma thread do processo enfileira news.add_views
+    (count=n) a cada NEWS_VIEWS_FLUSH_INTERVAL e na saída do processo, com
+    sessão própria (a transação da requisição não é tocada). Contagens de
+    um processo morto sem sair normalmente se perdem (o total é aproximado).
+    """
+    with _views_lock:
+        _views['pending'][news_id] += 1
+        if _views['thread'] is None or not _views['thread'].is_alive():
+            _views['app'] = current_app._get_current_object()
+            _views['thread'] = threading.Thread(target=_flush_loop, name='news-views', daemon=True)
+            _views['thread'].start()
+
+
+def flush_views():
+    """Enfileirar as visualizações acumuladas (uma tarefa por notícia)"""
+    with _views_lock:
+        pending, _views['pending'] = _views['pending'], Counter()
+        app = _views['app']
+    if not pending or app is None:
+        return
+
+    with app.app_context():
+        try:
+            for news_id, count in pending.items():
+                enqueue('news.add_views', {'news_id': news_id, 'count': count})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with _views_lock:
+                _views['pending'].update(pending)  # tenta de novo no próximo intervalo
+            logger.exception('Falha ao enfileirar visualizações')
+
+
+def _flush_loop():
+    while True:
+        time.sleep(_views['app'].config.get('NEWS_VIEWS_FLUSH_INTERVAL', NEWS_VIEWS_FLUSH_INTERVAL))
+        flush_views()
+
+
+atexit.register(flush_views)  # saída normal do processo (ex.: reinício do gunicorn)
+
+@task('news.add_views', priority=-10)
+def add_views(news_id, count=1):
+    """Somar visualizações sem tocar em updated_at/version (não invalida caches).
+
+    O peso das manchetes no índice de sugestões usa as visualizações: o
+    UPDATE direto não passa pelo flush, então a atualização é agendada aqui
+    (sem registrar News em changed_models, que invalidaria os caches).
+    """
+    db.session.execute(
+        db.update(News).where(News.id == news_id).values(
+            views=News.views + count,
+            updated_at=News.updated_at  # evita o onupdate
+        )
+    )
+    schedule_refresh()
+
 @news_bp.route('/news', methods=['GET'])
 @cross_origin()
 def get_news():
@@ -41,13 +122,14 @@ def get_news():
             error_out=False
         )
         
-        return jsonify({
-            'news': [article.to_dict() for article in news.items],
-            'total': news.total,
-            'pages': news.pages,
-            'current_page': page,
-            'per_page': per_page
-        })
+        return list_response(
+            'news',
+            [article.to_dict() for article in news.items],
+            total=news.total,
+            pages=news.pages,
+            current_page=page,
+            per_page=per_page
+        )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -59,14 +141,23 @@ def get_news_article(news_id):
     try:
         article = News.query.get_or_404(news_id)
         
-        # Incrementar visualizações
-        article.views += 1
-        db.session.commit()
+        # Visualizações acumuladas e gravadas em lote pela fila
+        count_view(article.id)
         
         return jsonify({'news': article.to_dict()})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@news_bp.route('/news/<int:news_id>/related', methods=['GET'])
+@cross_origin()
+def get_related_news(news_id):
+    """Notícias relacionadas (similaridade de texto pré-calculada)"""
+    try:
+        items = related_items('news', news_id, request.args.get('limit', 5, type=int))
+        return list_response('news', items)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @news_bp.route('/news', methods=['POST'])
 @cross_origin()
 @require_admin
@@ -87,6 +178,14 @@ def create_news():
         )
         
         db.session.add(article)
+        
+        # Avisar os clientes conectados (SSE) no mesmo commit
+        if article.urgent and article.published:
+            db.session.flush()
+            publish_event('news', 'urgent_news', article.to_dict())
+        
+        db.session.flush()
+        enqueue('related.update', {'entity': 'news', 'item_id': article.id})
         db.session.commit()
         
         return jsonify({
@@ -99,28 +198,54 @@ def create_news():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@news_bp.route('/news/<int:news_id>', methods=['PUT'])
+@news_bp.route('/news/<int:news_id>', methods=['PUT', 'PATCH'])
 @cross_origin()
 @require_admin
 def update_news(news_id):
-    """Atualizar notícia (apenas admin)"""
+    """Atualizar notícia (apenas admin; UPDATE único com controle de versão)"""
     try:
-        article = News.query.get_or_404(news_id)
-        data = request.json
+        data = request.json or {}
+        values = {
+            field: data[field]
+            for field in ['title', 'content', 'category', 'author', 'featured', 'urgent', 'published', 'image_url']
+            if field in data
+        }
+        
+        if not values:
+            return jsonify({'error': 'Nenhum campo para atualizar'}), 400
+        
+        article = patch_row(News, news_id, values, expected_version(data))
         
-        # Atualizar campos
-        for field in ['title', 'content', 'category', 'author', 'featured', 'urgent', 'published', 'image_url']:
-            if field in data:
-                setattr(article, field, data[field])
+        # Notícia passou a ser urgente e publicada: avisar os clientes (SSE)
+        if ('urgent' in values or 'published' in values) and article['urgent'] and article['published']:
+            publish_event('news', 'urgent_news', db.session.get(News, news_id, populate_existing=True).to_dict())
+        
+        if values.keys() & {'title', 'category', 'content'}:
+            enqueue('related.update', {'entity': 'news', 'item_id': news_id})
         
         db.session.commit()
         
+        # Mesmo formato do to_dict() de antes
+        article = db.session.get(News, news_id)
+        
         return jsonify({
             'success': True,
             'news': article.to_dict(),
             'message': 'Notícia atualizada com sucesso'
         })
         
+    except RowNotFound:
+        db.session.rollback()
+        return jsonify({'error': 'Notícia não encontrada'}), 404
+    except VersionRequired:
+        db.session.rollback()
+        return jsonify({'error': 'Informe a versão atual ("version" ou If-Match) para editar via PATCH'}), 428
+    except VersionConflict as e:
+        db.session.rollback()
+        return jsonify({
+            'error': 'A notícia foi alterada por outra pessoa. Recarregue e tente novamente.',
+            'current_version': e.current_version
+        }), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -133,6 +258,7 @@ def delete_news(news_id):
     try:
         article = News.query.get_or_404(news_id)
         db.session.delete(article)
+        enqueue('related.remove', {'entity': 'news', 'item_ids': [news_id]})
         db.session.commit()
         
         return jsonify({
@@ -0,0 +1,96 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+# Padrões para as filas administrativas
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class PaginationError(ValueError):
+    """Parâmetro de paginação/filtro inválido (vira resposta 400)"""
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError('Cursor inválido')
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise PaginationError('Cursor inválido')
+    decoded = []
+    for column, value in zip(columns, values):
+        if value is not None and column.type.python_type is datetime:
+            value = datetime.fromisoformat(value)
+        decoded.append(value)
+    return decoded
+
+
+def parse_date(value, name):
+    """Converter um parâmetro de data (ISO 8601) ou falhar com 400"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f'Data inválida em "{name}": use AAAA-MM-DD')
+
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_LIMIT
+    if value < 1:
+        raise PaginationError('"limit" deve ser maior que zero')
+    return min(value, MAX_LIMIT)
+
+
+def parse_sort(value, allowed, default):
+    """'-campo' = decrescente; apenas campos da lista permitida"""
+    value = value or default
+    descending = value.startswith('-')
+    field = value.lstrip('-')
+    if field not in allowed:
+        raise PaginationError(f'Ordenação inválida: use {", ".join(sorted(allowed))}')
+    return allowed[field], descending
+
+
+def keyset_paginate(query, sort_column, id_column, descending, cursor, limit):
+    """Paginação por cursor em (sort_column, id) — usa o índice, sem OFFSET"""
+    columns = (sort_column, id_column)
+
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, columns)
+        if descending:
+            query = query.filter(or_(
+                sort_column < last_value,
+                and_(sort_column == last_value, id_column < last_id)
+            ))
+        else:
+            query = query.filter(or_(
+                sort_column > last_value,
+                and_(sort_column == last_value, id_column > last_id)
+            ))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        # Linhas podem ser entidades ou tuplas (entidade, colunas extras)
+        entity = last[0] if isinstance(last, tuple) or hasattr(last, '_fields') else last
+        next_cursor = encode_cursor([getattr(entity, sort_column.key), getattr(entity, id_column.key)])
+
+    return rows, next_cursor
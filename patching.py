@@ -0,0 +1,79 @@
+from flask import request
+from sqlalchemy import select, update
+
+from src.models.cms import db
+
+
+class RowNotFound(Exception):
+    """A linha a ser atualizada não existe"""
+
+
+class VersionConflict(Exception):
+    """A versão enviada pelo cliente não é a versão atual (controle otimista)"""
+
+    def __init__(self, current_version):
+        super().__init__('Versão desatualizada')
+        self.current_version = current_version
+
+
+class VersionRequired(Exception):
+    """PATCH sem versão válida (campo "version" ou cabeçalho If-Match)"""
+
+
+def expected_version(data):
+    """Versão esperada: campo "version" do corpo ou cabeçalho If-Match.
+
+    Obrigatória no PATCH (senão VersionRequired). No PUT é opcional: sem
+    versão a escrita é incondicional (vence a última), como antes do
+    controle de versão, para não quebrar clientes antigos.
+    """
+    version = data.get('version') if isinstance(data, dict) else None
+    if version is None and request.if_match:
+        etags = list(request.if_match.as_set())
+        version = etags[0] if len(etags) == 1 else None
+    try:
+        return int(version)
+    except (TypeError, ValueError):
+        if request.method == 'PATCH':
+            raise VersionRequired()
+        return None
+
+
+def patch_row(model, row_id, values, version=None):
+    """UPDATE ... RETURNING em uma única ida ao banco.
+
+    Incrementa a coluna ``version`` (quando o modelo tem uma) e, se ``version``
+    for informado, só atualiza se a versão atual for igual. Retorna um dict
+    com as colunas da linha já atualizada; não faz commit.
+    """
+    table = model.__table__
+    stmt = update(model).where(model.id == row_id)
+    values = dict(values)
+
+    if 'version' in table.c:
+        values['version'] = model.version + 1
+        if version is not None:
+            stmt = stmt.where(model.version == version)
+
+    stmt = stmt.values(**values).execution_options(synchronize_session=False)
+
+    if db.engine.dialect.update_returning:
+        row = db.session.execute(stmt.returning(*table.c)).first()
+    else:
+        result = db.session.execute(stmt)
+        row = None
+        if result.rowcount:
+            row = db.session.execute(select(*table.c).where(model.id == row_id)).first()
+
+    if row is None:
+        # Só no caso de falha: descobrir se a linha não existe ou mudou de versão
+        current = db.session.execute(
+            select(table.c.version if 'version' in table.c else model.id).where(model.id == row_id)
+        ).first()
+        if current is None:
+            raise RowNotFound()
+        raise VersionConflict(current[0])
+
+    # UPDATE direto não passa pelo flush: registrar para invalidar caches no commit
+    db.session.info.setdefault('changed_models', set()).add(model)
+    return dict(row._mapping)
@@ -2,10 +2,19 @@ from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 import os
 import uuid
-from PIL import Image
 
 from src.models.cms import db, Property, PropertyPhoto
 from src.routes.auth import require_admin
+from src.utils.patching import RowNotFound, VersionConflict, VersionRequired, expected_version, patch_row
+from src.utils.formats import list_response
+from src.utils.pagination import PaginationError
+from src.utils.geo import apply_geocode, geo_search, geocode_values
+from src.utils.sync import sync_response, touch
+from src.utils.similar import RecommendationsUnavailable, similar_properties_for
+from src.utils.instrumentation import perf_timer
+from src.utils.metrics import observe_upload
+from src.utils.file_cleanup import delete_files_after_commit
+from src.utils.images import ImageRejected, save_photo
 
 properties_bp = Blueprint('properties', __name__)
 
@@ -20,6 +29,29 @@ def create_upload_folder():
     if not os.path.exists(UPLOAD_FOLDER):
         os.makedirs(UPLOAD_FOLDER)
 
+def store_property_photo(property_obj, stream, original_name):
+    """Redimensionar, salvar e registrar uma foto do imóvel (sem commit)"""
+    create_upload_folder()
+    
+    # Gerar nome único para o arquivo
+    filename = str(uuid.uuid4()) + '.' + original_name.rsplit('.', 1)[1].lower()
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    
+    with observe_upload('property_photo'):
+        # Redimensionar mantendo proporção (máximo 1200x800) e salvar como JPEG
+        save_photo(stream, filepath)
+    
+    # Criar registro no banco
+    photo = PropertyPhoto(
+        property_id=property_obj.id,
+        filename=filename,
+        original_name=original_name,
+        is_main=len(property_obj.photos) == 0  # Primeira foto é a principal
+    )
+    db.session.add(photo)
+    touch(property_obj)  # fotos fazem parte da linha sincronizada
+    return photo
+
 @properties_bp.route('/properties', methods=['GET'])
 @cross_origin()
 def get_properties():
@@ -34,6 +66,15 @@ def get_properties():
         max_price = request.args.get('max_price', type=float)
         active_only = request.args.get('active_only', 'true').lower() == 'true'
         search = request.args.get('search')
+        changed_since = request.args.get('changed_since')
+        
+        # Sincronização incremental: só o que mudou desde o token ('0' = tudo)
+        if changed_since:
+            return sync_response(
+                'properties', Property, changed_since,
+                lambda property_obj: property_obj.active or not active_only,
+                request.args.get('limit', type=int)
+            )
         
         query = Property.query
         
@@ -64,6 +105,11 @@ def get_properties():
                 )
             )
         
+        # Busca por proximidade/área (índice espacial), ordenada por distância
+        if request.args.get('near') or request.args.get('bbox'):
+            items = geo_search(query, Property, request.args)
+            return list_response('properties', items, total=len(items))
+        
         query = query.order_by(Property.featured.desc(), Property.created_at.desc())
         
         properties = query.paginate(
@@ -72,14 +118,20 @@ def get_properties():
             error_out=False
         )
         
-        return jsonify({
-            'properties': [prop.to_dict() for prop in properties.items],
-            'total': properties.total,
-            'pages': properties.pages,
-            'current_page': page,
-            'per_page': per_page
-        })
+        with perf_timer('serialize'):
+            items = [prop.to_dict() for prop in properties.items]
         
+        return list_response(
+            'properties',
+            items,
+            total=properties.total,
+            pages=properties.pages,
+            current_page=page,
+            per_page=per_page
+        )
+        
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -93,6 +145,19 @@ def get_property(property_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@properties_bp.route('/properties/<int:property_id>/similar', methods=['GET'])
+@cross_origin()
+def get_similar_properties(property_id):
+    """Imóveis parecidos (preço, área, quartos, banheiros, tipo, finalidade e bairro)"""
+    property_obj = Property.query.get_or_404(property_id)
+    try:
+        items = similar_properties_for(property_obj, request.args.get('limit', type=int))
+        return list_response('properties', items)
+    except RecommendationsUnavailable:
+        return jsonify({'error': 'Recomendações indisponíveis (numpy não instalado)'}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @properties_bp.route('/properties', methods=['POST'])
 @cross_origin()
 def create_property():
@@ -114,8 +179,11 @@ def create_property():
             contact_name=data.get('contact_name'),
             contact_email=data.get('contact_email'),
             contact_phone=data.get('contact_phone'),
+            latitude=data.get('latitude'),
+            longitude=data.get('longitude'),
             active=True
         )
+        apply_geocode(property_obj)
         
         db.session.add(property_obj)
         db.session.commit()
@@ -130,28 +198,47 @@ def create_property():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@properties_bp.route('/properties/<int:property_id>', methods=['PUT'])
+@properties_bp.route('/properties/<int:property_id>', methods=['PUT', 'PATCH'])
 @cross_origin()
 @require_admin
 def update_property(property_id):
-    """Atualizar imóvel (apenas admin)"""
+    """Atualizar imóvel (apenas admin; UPDATE único com controle de versão)"""
     try:
-        property_obj = Property.query.get_or_404(property_id)
-        data = request.json
-        
-        # Atualizar campos
-        for field in ['title', 'description', 'property_type', 'purpose', 'price', 'address', 'neighborhood', 'bedrooms', 'bathrooms', 'area', 'contact_name', 'contact_email', 'contact_phone', 'active', 'featured']:
-            if field in data:
-                setattr(property_obj, field, data[field])
-        
+        data = request.json or {}
+        values = {
+            field: data[field]
+            for field in ['title', 'description', 'property_type', 'purpose', 'price', 'address', 'neighborhood', 'bedrooms', 'bathrooms', 'area', 'contact_name', 'contact_email', 'contact_phone', 'active', 'featured', 'latitude', 'longitude']
+            if field in data
+        }
+        
+        if not values:
+            return jsonify({'error': 'Nenhum campo para atualizar'}), 400
+        
+        geocode_values(values, Property, property_id)
+        property_obj = patch_row(Property, property_id, values, expected_version(data))
         db.session.commit()
         
+        # Mesmo formato do to_dict() de antes (fotos e demais campos públicos)
+        property_obj = db.session.get(Property, property_id)
+        
         return jsonify({
             'success': True,
             'property': property_obj.to_dict(),
             'message': 'Imóvel atualizado com sucesso'
         })
         
+    except RowNotFound:
+        db.session.rollback()
+        return jsonify({'error': 'Imóvel não encontrado'}), 404
+    except VersionRequired:
+        db.session.rollback()
+        return jsonify({'error': 'Informe a versão atual ("version" ou If-Match) para editar via PATCH'}), 428
+    except VersionConflict as e:
+        db.session.rollback()
+        return jsonify({
+            'error': 'O imóvel foi alterado por outra pessoa. Recarregue e tente novamente.',
+            'current_version': e.current_version
+        }), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -164,11 +251,8 @@ def delete_property(property_id):
     try:
         property_obj = Property.query.get_or_404(property_id)
         
-        # Deletar fotos associadas
-        for photo in property_obj.photos:
-            photo_path = os.path.join(UPLOAD_FOLDER, photo.filename)
-            if os.path.exists(photo_path):
-                os.remove(photo_path)
+        # Arquivos das fotos são removidos só depois do commit
+        delete_files_after_commit([photo.filename for photo in property_obj.photos])
         
         db.session.delete(property_obj)
         db.session.commit()
@@ -198,33 +282,7 @@ def upload_property_photo(property_id):
             return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
         
         if file and allowed_file(file.filename):
-            create_upload_folder()
-            
-            # Gerar nome único para o arquivo
-            filename = str(uuid.uuid4()) + '.' + file.filename.rsplit('.', 1)[1].lower()
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            
-            # Salvar e redimensionar a imagem
-            image = Image.open(file.stream)
-            
-            # Redimensionar mantendo proporção (máximo 1200x800)
-            image.thumbnail((1200, 800), Image.Resampling.LANCZOS)
-            
-            # Salvar como JPEG para otimizar tamanho
-            if image.mode in ("RGBA", "P"):
-                image = image.convert("RGB")
-            
-            image.save(filepath, "JPEG", quality=85, optimize=True)
-            
-            # Criar registro no banco
-            photo = PropertyPhoto(
-                property_id=property_id,
-                filename=filename,
-                original_name=file.filename,
-                is_main=len(property_obj.photos) == 0  # Primeira foto é a principal
-            )
-            
-            db.session.add(photo)
+            photo = store_property_photo(property_obj, file.stream, file.filename)
             db.session.commit()
             
             return jsonify({
@@ -235,6 +293,9 @@ def upload_property_photo(property_id):
         
         return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
         
+    except ImageRejected as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -249,12 +310,11 @@ def delete_property_photo(property_id, photo_id):
             property_id=property_id
         ).first_or_404()
         
-        # Deletar arquivo físico
-        photo_path = os.path.join(UPLOAD_FOLDER, photo.filename)
-        if os.path.exists(photo_path):
-            os.remove(photo_path)
+        # Arquivo físico é removido só depois do commit
+        delete_files_after_commit([photo.filename])
         
         db.session.delete(photo)
+        touch(photo.property)
         db.session.commit()
         
         return jsonify({
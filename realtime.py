@@ -0,0 +1,23 @@
+from flask import Blueprint, request
+from flask_cors import cross_origin
+
+from src.routes.auth import require_admin
+from src.routes.batch import not_batchable
+from src.utils.events import event_stream
+
+realtime_bp = Blueprint('realtime', __name__)
+
+@realtime_bp.route('/events/news', methods=['GET'])
+@not_batchable
+@cross_origin()
+def news_events():
+    """Stream SSE de notícias urgentes publicadas (substitui o polling de /news/urgent)"""
+    return event_stream('news', request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+
+@realtime_bp.route('/admin/events', methods=['GET'])
+@not_batchable
+@cross_origin()
+@require_admin
+def moderation_events():
+    """Stream SSE de novos itens para moderação (apenas admin)"""
+    return event_stream('moderation', request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
@@ -0,0 +1,213 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+
+import click
+from flask.cli import with_appcontext
+
+from src.models.cms import db, Company, News, RelatedItem, RelatedTerm
+from src.utils.geo import normalize
+from src.utils.tasks import task
+
+# entidade -> (modelo, texto indexado, condição para aparecer como relacionado)
+RELATED_SOURCES = {
+    'company': (Company, lambda company: f'{company.name} {company.category} {company.description or ""}',
+                Company.approved == True),
+    'news': (News, lambda article: f'{article.title} {article.category} {article.content or ""}',
+             News.published == True)
+}
+
+RELATED_TOP_N = 10  # vizinhos guardados por item (a rota filtra os não visíveis)
+RELATED_MAX_TERMS = 64  # termos de maior peso mantidos por documento
+RELATED_MAX_DF_RATIO = 0.5  # termos em mais da metade dos documentos não geram candidatos...
+RELATED_MIN_DF_LIMIT = 50  # ...a partir desse número de documentos
+RELATED_REVERSE_UPDATES = 200  # vizinhos cuja lista é revista quando um item muda
+
+STOPWORDS = frozenset('''
+    a ao aos as com como da das de del do dos e em entre essa esse esta este isso ja mais mas muito na nas
+    nao no nos o os ou para pela pelas pelo pelos por que se sem ser seu sua seus suas sao tem um uma uns
+    umas voce voces foi sera ate tambem sobre apos ainda cada onde quando todos todas the and for
+'''.split())
+
+
+def tokenize(text):
+    """Termos normalizados (sem acento, minúsculas), sem stopwords e números"""
+    return [
+        token for token in normalize(text).split()
+        if 3 <= len(token) <= 60 and not token.isdigit() and token not in STOPWORDS
+    ]
+
+
+def _idf(df, documents):
+    return math.log((1 + documents) / (1 + df)) + 1
+
+
+def _df_limit(documents):
+    # Postings longos custam caro e pesam pouco no cosseno (idf baixo)
+    return max(RELATED_MAX_DF_RATIO * documents, RELATED_MIN_DF_LIMIT)
+
+
+def _vector(counts, df, documents):
+    """Pesos TF-IDF (tf sublinear) dos termos principais, normalizados"""
+    weights = {term: (1 + math.log(count)) * _idf(df.get(term, 0), documents) for term, count in counts.items()}
+    weights = dict(heapq.nlargest(RELATED_MAX_TERMS, weights.items(), key=lambda item: item[1]))
+    norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+    return {term: weight / norm for term, weight in weights.items()}
+
+
+def rebuild_related(entity):
+    """Reconstrução completa (offline): vetores, índice invertido e top N de todos"""
+    model, text_of, _ = RELATED_SOURCES[entity]
+    counts = {item.id: Counter(tokenize(text_of(item))) for item in model.query}
+    df = Counter(term for terms in counts.values() for term in terms)
+    documents = len(counts)
+    vectors = {item_id: _vector(terms, df, documents) for item_id, terms in counts.items()}
+
+    postings = defaultdict(list)
+    for item_id, vector in vectors.items():
+        for term, weight in vector.items():
+            postings[term].append((item_id, weight))
+    frequent = {term for term, items in postings.items() if len(items) > _df_limit(documents)}
+
+    RelatedTerm.query.filter(RelatedTerm.entity == entity).delete(synchronize_session=False)
+    RelatedItem.query.filter(RelatedItem.entity == entity).delete(synchronize_session=False)
+    terms = [
+        {'entity': entity, 'term': term, 'item_id': item_id, 'weight': weight}
+        for item_id, vector in vectors.items() for term, weight in vector.items()
+    ]
+    if terms:
+        db.session.execute(db.insert(RelatedTerm), terms)
+
+    neighbours = []
+    for item_id, vector in vectors.items():
+        scores = defaultdict(float)
+        for term, weight in vector.items():
+            if term not in frequent:
+                for other_id, other_weight in postings[term]:
+                    scores[other_id] += weight * other_weight
+        scores.pop(item_id, None)
+        for related_id, score in heapq.nlargest(RELATED_TOP_N, scores.items(), key=lambda item: item[1]):
+            neighbours.append({'entity': entity, 'item_id': item_id, 'related_id': related_id, 'score': score})
+    if neighbours:
+        db.session.execute(db.insert(RelatedItem), neighbours)
+    return documents
+
+
+def _remove(entity, item_ids):
+    RelatedTerm.query.filter(RelatedTerm.entity == entity, RelatedTerm.item_id.in_(item_ids)).delete(synchronize_session=False)
+    RelatedItem.query.filter(
+        RelatedItem.entity == entity,
+        db.or_(RelatedItem.item_id.in_(item_ids), RelatedItem.related_id.in_(item_ids))
+    ).delete(synchronize_session=False)
+
+
+@task('related.remove', priority=-5)
+def remove_related(entity, item_ids):
+    """Tirar itens excluídos do índice e das listas de vizinhos"""
+    _remove(entity, item_ids)
+
+
+@task('related.update', priority=-5)
+def update_related(entity, item_id):
+    """Atualização incremental de um item criado/editado.
+
+    Recalcula o vetor do item com o df atual do índice, refaz a lista dele
+    e insere/retira o item das listas dos vizinhos mais próximos. Os vetores
+    dos demais itens não mudam (df de quando foram indexados) até a próxima
+    reconstrução completa (`flask related-rebuild`).
+    """
+    model, text_of, _ = RELATED_SOURCES[entity]
+    item = db.session.get(model, item_id)
+    if item is None:
+        _remove(entity, [item_id])
+        return
+
+    counts = Counter(tokenize(text_of(item)))
+    documents = db.session.query(db.func.count(model.id)).scalar()
+    df = dict(db.session.query(RelatedTerm.term, db.func.count()).filter(
+        RelatedTerm.entity == entity,
+        RelatedTerm.term.in_(list(counts)),
+        RelatedTerm.item_id != item_id
+    ).group_by(RelatedTerm.term).all()) if counts else {}
+    df = {term: df.get(term, 0) + 1 for term in counts}
+    vector = _vector(counts, df, documents)
+
+    # Candidatos: itens que compartilham algum termo não muito frequente
+    scores = defaultdict(float)
+    shared = [term for term in vector if df[term] <= _df_limit(documents)]
+    if shared:
+        for term, other_id, other_weight in db.session.query(
+            RelatedTerm.term, RelatedTerm.item_id, RelatedTerm.weight
+        ).filter(
+            RelatedTerm.entity == entity,
+            RelatedTerm.term.in_(shared),
+            RelatedTerm.item_id != item_id
+        ):
+            scores[other_id] += vector[term] * other_weight
+    neighbours = heapq.nlargest(max(RELATED_TOP_N, RELATED_REVERSE_UPDATES), scores.items(), key=lambda item: item[1])
+
+    # Vetor e lista do próprio item
+    _remove(entity, [item_id])
+    if vector:
+        db.session.execute(db.insert(RelatedTerm), [
+            {'entity': entity, 'term': term, 'item_id': item_id, 'weight': weight} for term, weight in vector.items()
+        ])
+    if neighbours:
+        db.session.execute(db.insert(RelatedItem), [
+            {'entity': entity, 'item_id': item_id, 'related_id': related_id, 'score': score}
+            for related_id, score in neighbours[:RELATED_TOP_N]
+        ])
+
+    # Listas dos vizinhos: entrar se superar o último colocado (ou se houver vaga)
+    if not neighbours:
+        return
+    current = defaultdict(list)
+    for row in RelatedItem.query.filter(
+        RelatedItem.entity == entity,
+        RelatedItem.item_id.in_([related_id for related_id, _ in neighbours])
+    ):
+        current[row.item_id].append(row)
+    added = []
+    for related_id, score in neighbours:
+        entries = current[related_id]
+        if len(entries) < RELATED_TOP_N:
+            added.append({'entity': entity, 'item_id': related_id, 'related_id': item_id, 'score': score})
+            continue
+        weakest = min(entries, key=lambda row: row.score)
+        if score > weakest.score:
+            db.session.delete(weakest)
+            added.append({'entity': entity, 'item_id': related_id, 'related_id': item_id, 'score': score})
+    db.session.flush()
+    if added:
+        db.session.execute(db.insert(RelatedItem), added)
+
+
+def related_items(entity, item_id, limit=5):
+    """Itens relacionados visíveis, em uma consulta pelo índice (entity, item_id, score)"""
+    model, _, visible = RELATED_SOURCES[entity]
+    # ?limit= vem direto da URL: negativo seria "sem limite" no SQLite e erro no PostgreSQL
+    limit = max(1, min(limit, RELATED_TOP_N))
+    rows = db.session.query(model, RelatedItem.score).join(
+        RelatedItem, db.and_(RelatedItem.entity == entity, RelatedItem.related_id == model.id)
+    ).filter(
+        RelatedItem.item_id == item_id,
+        visible
+    ).order_by(RelatedItem.score.desc()).limit(limit).all()
+
+    items = []
+    for row, score in rows:
+        item = row.to_dict()
+        item['related_score'] = round(score, 4)
+        items.append(item)
+    return items
+
+
+@click.command('related-rebuild')
+@click.option('--entity', type=click.Choice(sorted(RELATED_SOURCES)), default=None, help='Apenas uma entidade')
+@with_appcontext
+def related_rebuild_command(entity):
+    """Reconstruir o índice de itens relacionados (rodar após a implantação e periodicamente)"""
+    for name in [entity] if entity else sorted(RELATED_SOURCES):
+        documents = rebuild_related(name)
+        db.session.commit()
+        click.echo(f'{name}: {documents} documento(s) indexado(s)')
@@ -0,0 +1,27 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+
+def sync_schema(db):
+    """Completar o schema de bancos já existentes (o create_all só cria tabelas novas).
+
+    Adiciona colunas novas dos modelos (que precisam ser nullable ou ter
+    server_default) e cria os índices declarados que ainda não existem.
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}'))
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,58 @@
+from flask import Blueprint, request, jsonify
+from flask_cors import cross_origin
+
+from src.utils.fuzzy import FUZZY_LIMIT, FUZZY_SOURCES, FuzzySearchUnavailable, fuzzy_search
+from src.utils.suggest import SUGGEST_DEFAULT_LIMIT, SUGGEST_MAX_LIMIT, suggest_index
+
+search_bp = Blueprint('search', __name__)
+
+
+@search_bp.route('/suggest', methods=['GET'])
+@cross_origin()
+def suggest():
+    """Sugestões da caixa de busca enquanto o usuário digita (?q=&limit=)"""
+    try:
+        query = request.args.get('q', '')
+        limit = min(request.args.get('limit', SUGGEST_DEFAULT_LIMIT, type=int) or SUGGEST_DEFAULT_LIMIT, SUGGEST_MAX_LIMIT)
+        response = jsonify({'query': query, 'suggestions': suggest_index.search(query, limit)})
+        # Mesmo prefixo repetido por muitos usuários: cache curto no navegador/CDN
+        response.cache_control.public = True
+        response.cache_control.max_age = 60
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Tipo -> chave da resposta
+SEARCH_RESULT_KEYS = {'company': 'companies', 'job': 'jobs', 'property': 'properties'}
+
+
+@search_bp.route('/search', methods=['GET'])
+@cross_origin()
+def search():
+    """Busca tolerante a erros de digitação e acentos (?q=&types=company,job,property&limit=)"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Parâmetro "q" é obrigatório'}), 400
+
+        types = request.args.get('types')
+        types = [kind.strip() for kind in types.split(',') if kind.strip()] if types else list(FUZZY_SOURCES)
+        if any(kind not in FUZZY_SOURCES for kind in types):
+            return jsonify({'error': f'Tipos válidos: {", ".join(FUZZY_SOURCES)}'}), 400
+
+        limit = max(1, min(request.args.get('limit', FUZZY_LIMIT, type=int) or FUZZY_LIMIT, 50))
+        results = {'query': query}
+        for kind in types:
+            items = []
+            for row, similarity in fuzzy_search(kind, query, limit):
+                item = row.to_dict()
+                item['similarity'] = round(float(similarity), 3)
+                items.append(item)
+            results[SEARCH_RESULT_KEYS[kind]] = items
+        return jsonify(results)
+
+    except FuzzySearchUnavailable:
+        return jsonify({'error': 'Busca aproximada indisponível neste banco'}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
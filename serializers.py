@@ -0,0 +1,125 @@
+import os
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import configure_mappers
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+# 'orjson' (padrão quando instalado) ou 'default' (json da stdlib)
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')
+
+
+class ISOJSONProvider(DefaultJSONProvider):
+    """Provider da stdlib que serializa datetimes em ISO 8601 (como o to_dict antigo)"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+
+class ORJSONProvider(JSONProvider):
+    """Provider baseado em orjson, com suporte nativo a datetime"""
+
+    option = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.option)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_json_provider(app):
+    """Selecionar o provider JSON do app (orjson quando disponível)"""
+    app.config.setdefault('JSON_PROVIDER', JSON_PROVIDER)
+    if app.config['JSON_PROVIDER'] == 'orjson' and orjson is not None:
+        app.json = ORJSONProvider(app)
+    else:
+        app.json = ISOJSONProvider(app)
+
+
+def compile_serializer(model, fields, nested=(), extra=None):
+    """Gerar uma função obj -> dict com as chaves de ``fields``, nessa ordem.
+
+    Cada chave é uma coluna mapeada, um relacionamento listado em ``nested``
+    (serializado com o to_dict do modelo relacionado) ou uma chave de
+    ``extra`` (funções obj -> valor). A lista é explícita: colunas novas só
+    entram nas respostas quando acrescentadas de propósito.
+    Datetimes são mantidos como objetos e convertidos pelo provider JSON.
+    """
+    configure_mappers()
+    mapper = sa_inspect(model)
+    extra = extra or {}
+    namespace = {}
+    items = []
+    fast_items = []
+    columns = []
+
+    for key in fields:
+        if key in nested:
+            related = mapper.relationships[key].mapper.class_
+            namespace['_nested_' + key] = related.to_dict
+            item = '%r: [_nested_%s(item) for item in obj.%s]' % (key, key, key)
+            items.append(item)
+            fast_items.append(item)
+        elif key in extra:
+            namespace['_extra_' + key] = extra[key]
+            item = '%r: _extra_%s(obj)' % (key, key)
+            items.append(item)
+            fast_items.append(item)
+        elif key in mapper.column_attrs:
+            items.append('%r: obj.%s' % (key, key))
+            fast_items.append('%r: state[%r]' % (key, key))
+            columns.append(key)
+        else:
+            raise ValueError('%s.to_dict: campo desconhecido %r' % (model.__name__, key))
+
+    # Colunas já carregadas são lidas direto do __dict__ da instância, sem
+    # passar pelo descriptor do ORM; se faltar alguma (expirada, deferred),
+    # o caminho normal carrega como antes
+    namespace['_columns'] = frozenset(columns)
+    source = (
+        'def serialize(obj):\n'
+        '    state = obj.__dict__\n'
+        '    if _columns <= state.keys():\n'
+        '        return {%s}\n'
+        '    return {%s}\n'
+    ) % (', '.join(fast_items), ', '.join(items))
+    exec(compile(source, '<serializer %s>' % model.__name__, 'exec'), namespace)
+    return namespace['serialize']
+
+
+class ModelSerializer:
+    """Descriptor de ``to_dict`` compilado na primeira utilização.
+
+    ``Model.to_dict`` devolve a função compilada (útil em listas) e
+    ``obj.to_dict()`` funciona como o método escrito à mão de antes.
+    """
+
+    def __init__(self, fields, nested=(), extra=None):
+        self.fields = tuple(fields)
+        self.nested = tuple(nested)
+        self.extra = extra
+        self._compiled = {}
+
+    def __get__(self, obj, owner):
+        serialize = self._compiled.get(owner)
+        if serialize is None:
+            serialize = compile_serializer(owner, self.fields, self.nested, self.extra)
+            self._compiled[owner] = serialize
+        if obj is None:
+            return serialize
+        return serialize.__get__(obj, owner)
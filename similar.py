@@ -0,0 +1,179 @@
+import math
+import threading
+import time
+
+from flask import current_app
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy é opcional
+    np = None
+
+from src.models.cms import db, Property
+from src.utils.geo import normalize
+from src.utils.sync import SyncTokenExpired, changes_since, current_token
+
+# Padrões (podem ser sobrescritos via app.config)
+SIMILAR_REFRESH_INTERVAL = 2.0  # segundos entre consultas de alterações, por processo
+SIMILAR_DEFAULT_LIMIT = 6
+SIMILAR_MAX_LIMIT = 24
+
+# Peso de cada atributo na distância. Numéricos entram padronizados (desvio
+# padrão = 1); categóricos somam o peso quando diferem do imóvel de referência.
+NUMERIC_WEIGHTS = {'price': 1.5, 'area': 1.0, 'bedrooms': 0.7, 'bathrooms': 0.5}
+CATEGORY_WEIGHTS = {'purpose': 6.0, 'property_type': 2.0, 'neighborhood': 1.0}
+
+_COLUMNS = (Property.id, Property.active, Property.price, Property.area, Property.bedrooms,
+            Property.bathrooms, Property.purpose, Property.property_type, Property.neighborhood)
+
+
+class RecommendationsUnavailable(Exception):
+    """numpy não instalado (vira resposta 503)"""
+
+
+def _numeric(row):
+    # Preço e área em escala log: diferença relativa importa mais que absoluta
+    def log(value):
+        return math.log1p(value) if value is not None and value >= 0 else math.nan
+
+    def plain(value):
+        return float(value) if value is not None else math.nan
+
+    return [log(row.price), log(row.area), plain(row.bedrooms), plain(row.bathrooms)]
+
+
+class SimilarProperties:
+    """Matriz em memória dos imóveis ativos para busca dos vizinhos mais próximos.
+
+    Cada processo mantém sua cópia: a carga inicial lê só as colunas usadas e
+    depois, no máximo a cada SIMILAR_REFRESH_INTERVAL, aplica as alterações e
+    exclusões do feed de sincronização incremental (changed_at + tombstones).
+    Assim criações, edições (inclusive PATCH direto) e exclusões feitas em
+    qualquer worker chegam a todos sem recarregar a tabela.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._token = None
+        self._checked = 0.0
+        self._slots = {}  # id do imóvel -> linha da matriz
+        self._free = []
+        self._codes = {field: {} for field in CATEGORY_WEIGHTS}
+
+    def _code(self, field, value):
+        value = normalize(value) if field == 'neighborhood' else (value or '')
+        codes = self._codes[field]
+        return codes.setdefault(value, len(codes))
+
+    def _encode(self, row):
+        numeric = np.array(_numeric(row), dtype=np.float32)
+        # Ausente = média (distância zero naquele atributo)
+        numeric = np.where(np.isnan(numeric), self._mean, numeric) * self._scale
+        return numeric, [self._code(field, getattr(row, field)) for field in CATEGORY_WEIGHTS]
+
+    def _grow(self):
+        size = len(self._ids)
+        capacity = max(size * 2, 64)
+        self._matrix = np.resize(self._matrix, (capacity, len(NUMERIC_WEIGHTS)))
+        self._categories = np.resize(self._categories, (capacity, len(CATEGORY_WEIGHTS)))
+        self._ids = np.concatenate([self._ids, np.full(capacity - size, -1, dtype=np.int64)])
+        self._free.extend(range(capacity - 1, size - 1, -1))
+
+    def _upsert(self, row):
+        if not row.active:
+            self._remove(row.id)
+            return
+        slot = self._slots.get(row.id)
+        if slot is None:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self._slots[row.id] = slot
+            self._ids[slot] = row.id
+        self._matrix[slot], self._categories[slot] = self._encode(row)
+
+    def _remove(self, property_id):
+        slot = self._slots.pop(property_id, None)
+        if slot is not None:
+            self._ids[slot] = -1
+            self._free.append(slot)
+
+    def _build(self):
+        token = current_token()
+        rows = db.session.query(*_COLUMNS).filter(Property.active == True).all()
+        raw = np.array([_numeric(row) for row in rows], dtype=np.float32).reshape(len(rows), len(NUMERIC_WEIGHTS))
+
+        # Escala fixada na carga: linhas novas usam a mesma média/desvio
+        with np.errstate(invalid='ignore'):
+            self._mean = np.nan_to_num(np.nanmean(raw, axis=0)) if len(rows) else np.zeros(len(NUMERIC_WEIGHTS), np.float32)
+            std = np.nan_to_num(np.nanstd(raw, axis=0)) if len(rows) else np.ones(len(NUMERIC_WEIGHTS), np.float32)
+        self._scale = np.array(list(NUMERIC_WEIGHTS.values()), dtype=np.float32) / np.where(std > 0, std, 1)
+        self._category_weights = np.array(list(CATEGORY_WEIGHTS.values()), dtype=np.float32)
+
+        self._matrix = np.where(np.isnan(raw), self._mean, raw) * self._scale
+        self._categories = np.array(
+            [[self._code(field, getattr(row, field)) for field in CATEGORY_WEIGHTS] for row in rows],
+            dtype=np.int32
+        ).reshape(len(rows), len(CATEGORY_WEIGHTS))
+        self._ids = np.array([row.id for row in rows], dtype=np.int64)
+        self._slots = {row.id: slot for slot, row in enumerate(rows)}
+        self._free = []
+        self._token = token
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._token is not None and now - self._checked < current_app.config.get('SIMILAR_REFRESH_INTERVAL', SIMILAR_REFRESH_INTERVAL):
+            return
+        self._checked = now
+        if self._token is None:
+            self._build()
+            return
+        try:
+            has_more = True
+            while has_more:
+                rows, deleted, self._token, has_more = changes_since(Property, self._token, 500)
+                for row in rows:
+                    self._upsert(row)
+                for property_id in deleted:
+                    self._remove(property_id)
+        except SyncTokenExpired:
+            self._build()
+
+    def similar(self, property_obj, limit):
+        """[(distância, id)] dos `limit` imóveis ativos mais parecidos"""
+        if np is None:
+            raise RecommendationsUnavailable()
+        with self._lock:
+            self._refresh()
+            numeric, categories = self._encode(property_obj)
+            distances = np.square(self._matrix - numeric).sum(axis=1)
+            distances += ((self._categories != np.array(categories)) * self._category_weights).sum(axis=1)
+            distances[self._ids < 0] = np.inf
+            own_slot = self._slots.get(property_obj.id)
+            if own_slot is not None:
+                distances[own_slot] = np.inf
+
+            limit = min(limit, len(self._slots) - (own_slot is not None))
+            if limit <= 0:
+                return []
+            nearest = np.argpartition(distances, limit - 1)[:limit]
+            nearest = nearest[np.argsort(distances[nearest])]
+            return [(float(distances[slot]), int(self._ids[slot])) for slot in nearest]
+
+
+similar_properties = SimilarProperties()
+
+
+def similar_properties_for(property_obj, limit=None):
+    """Imóveis parecidos (dicts com similarity entre 0 e 1), do mais parecido ao menos"""
+    limit = min(limit or SIMILAR_DEFAULT_LIMIT, current_app.config.get('SIMILAR_MAX_LIMIT', SIMILAR_MAX_LIMIT))
+    ranked = similar_properties.similar(property_obj, limit)
+    rows = {row.id: row for row in Property.query.filter(Property.id.in_([property_id for _, property_id in ranked]))}
+
+    items = []
+    for distance, property_id in ranked:
+        if property_id in rows:
+            item = rows[property_id].to_dict()
+            item['similarity'] = round(1 / (1 + math.sqrt(distance)), 4)
+            items.append(item)
+    return items
@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.utils.instrumentation import STATEMENT_START_KEYS
+
+logger = logging.getLogger('slow_query')
+
+# Configuração (pode ser sobrescrita via app.config em init_slow_query_log)
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '200'))
+SLOW_QUERY_EXPLAIN_FIRST_N = int(os.environ.get('SLOW_QUERY_EXPLAIN_FIRST_N', '0'))
+SLOW_QUERY_MAX_STATEMENTS = 500
+
+# Parâmetros cujo valor nunca deve ir para o log
+PII_FIELDS = ('contact_email', 'author_email', 'email', 'contact_phone', 'phone', 'password')
+
+_config = {
+    'threshold': SLOW_QUERY_THRESHOLD_MS / 1000.0,
+    'explain_first_n': SLOW_QUERY_EXPLAIN_FIRST_N,
+}
+_stats = {}
+_lock = threading.Lock()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_statement(statement):
+    """Remover literais e espaços para agrupar consultas equivalentes"""
+    normalized = _STRING_RE.sub('?', statement)
+    normalized = _NUMBER_RE.sub('?', normalized)
+    normalized = re.sub(r'%\(\w+\)s|:\w+|\$\d+|%s', '?', normalized)
+    normalized = _IN_LIST_RE.sub('(?, ...)', normalized)
+    return _SPACE_RE.sub(' ', normalized).strip()
+
+
+def _is_pii(name):
+    name = (name or '').lower()
+    return any(name == field or name.startswith(field + '_') for field in PII_FIELDS)
+
+
+def redact_parameters(parameters, context):
+    """Substituir valores de campos sensíveis (ex.: contact_email) por '***'"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: '***' if _is_pii(key) else value for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            # executemany
+            return [redact_parameters(params, context) for params in parameters]
+        compiled = getattr(context, 'compiled', None)
+        names = getattr(compiled, 'positiontup', None) or []
+        return [
+            '***' if index < len(names) and _is_pii(names[index]) else value
+            for index, value in enumerate(parameters)
+        ]
+    return parameters
+
+
+def _explain(conn, statement, parameters):
+    """Capturar o plano de execução usando a mesma conexão DBAPI.
+
+    Fora do SQLite o EXPLAIN roda dentro de um SAVEPOINT: no PostgreSQL um
+    erro abortaria a transação da requisição e todas as instruções seguintes.
+    """
+    if not statement.lstrip().upper().startswith('SELECT'):
+        return None
+
+    savepoint = conn.dialect.name != 'sqlite'
+    if conn.dialect.name == 'sqlite':
+        explain_sql = 'EXPLAIN QUERY PLAN ' + statement
+    else:
+        explain_sql = 'EXPLAIN ' + statement
+
+    cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute(explain_sql, parameters)
+            return [' | '.join(str(col) for col in row) for row in cursor.fetchall()]
+        except Exception as e:
+            if savepoint:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return ['EXPLAIN falhou: %s' % e]
+        finally:
+            if savepoint:
+                cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+    except Exception as e:
+        # SAVEPOINT indisponível (ex.: conexão em autocommit): sem transação a proteger
+        return ['EXPLAIN falhou: %s' % e]
+    finally:
+        cursor.close()
+
+
+def _record(conn, statement, parameters, context, duration, executemany):
+    route = request.endpoint if has_request_context() else None
+    normalized = normalize_statement(statement)
+    redacted = redact_parameters(parameters, context)
+
+    with _lock:
+        entry = _stats.get(normalized)
+        if entry is None:
+            if len(_stats) >= SLOW_QUERY_MAX_STATEMENTS:
+                # Descartar a entrada com menor tempo acumulado
+                cheapest = min(_stats, key=lambda key: _stats[key]['total_time'])
+                del _stats[cheapest]
+            entry = _stats[normalized] = {
+                'statement': normalized,
+                'count': 0,
+                'total_time': 0.0,
+                'max_time': 0.0,
+                'routes': {},
+                'plans': [],
+            }
+        entry['count'] += 1
+        entry['total_time'] += duration
+        entry['max_time'] = max(entry['max_time'], duration)
+        entry['routes'][route] = entry['routes'].get(route, 0) + 1
+        entry['last_parameters'] = redacted
+        want_plan = not executemany and entry['count'] <= _config['explain_first_n']
+
+    plan = _explain(conn, statement, parameters) if want_plan else None
+    if plan is not None:
+        with _lock:
+            entry['plans'].append(plan)
+
+    logger.warning(json.dumps({
+        'duration_ms': round(duration * 1000, 2),
+        'route': route,
+        'statement': statement,
+        'parameters': redacted,
+        'plan': plan,
+    }, default=str))
+
+
+# Descartada pelo handle_error compartilhado quando a instrução falha
+STATEMENT_START_KEYS.add('_slow_query_start')
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_slow_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_slow_query_start')
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    if duration >= _config['threshold']:
+        try:
+            _record(conn, statement, parameters, context, duration, executemany)
+        except Exception:
+            logger.exception('Falha ao registrar consulta lenta')
+
+
+def get_top_offenders(limit=20, order_by='total_time'):
+    """Consultas lentas agregadas por instrução normalizada"""
+    with _lock:
+        entries = [dict(entry, routes=dict(entry['routes']), plans=list(entry['plans']))
+                   for entry in _stats.values()]
+
+    entries.sort(key=lambda entry: entry.get(order_by, 0), reverse=True)
+    result = []
+    for entry in entries[:limit]:
+        entry['avg_ms'] = round(entry['total_time'] / entry['count'] * 1000, 2)
+        entry['total_ms'] = round(entry.pop('total_time') * 1000, 2)
+        entry['max_ms'] = round(entry.pop('max_time') * 1000, 2)
+        result.append(entry)
+    return result
+
+
+def reset_slow_queries():
+    with _lock:
+        _stats.clear()
+
+
+def init_slow_query_log(app):
+    """Aplicar a configuração do app ao registro de consultas lentas"""
+    app.config.setdefault('SLOW_QUERY_THRESHOLD_MS', SLOW_QUERY_THRESHOLD_MS)
+    app.config.setdefault('SLOW_QUERY_EXPLAIN_FIRST_N', SLOW_QUERY_EXPLAIN_FIRST_N)
+    _config['threshold'] = app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000.0
+    _config['explain_first_n'] = app.config['SLOW_QUERY_EXPLAIN_FIRST_N']
@@ -0,0 +1,50 @@
+"""Pacote src.* montado com links para os módulos soltos na raiz.
+
+Os módulos importam uns aos outros como src.models/src.routes/src.utils;
+testes e benchmarks usam esta montagem para rodar a partir do repositório.
+O banco e o índice de sugestões ficam em src/database, no diretório montado.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SRC_LAYOUT = {
+    'main.py': 'main1.py',
+    'models/cms.py': 'cms.py',
+    'models/flipbook.py': 'flipbook.py',
+    'routes/admin.py': 'admin1.py',
+    **{f'routes/{name}.py': f'{name}.py' for name in (
+        'auth', 'companies', 'news', 'jobs', 'properties', 'health', 'home', 'batch',
+        'uploads', 'flipbooks', 'realtime', 'maps', 'search',
+    )},
+    **{f'utils/{name}.py': f'{name}.py' for name in (
+        'instrumentation', 'metrics', 'slow_queries', 'serializers', 'formats', 'compression',
+        'cache', 'pagination', 'schema', 'patching', 'file_cleanup', 'images', 'flipbook_pages',
+        'tasks', 'events', 'sync', 'geo', 'clusters', 'similar', 'related', 'suggest', 'fuzzy',
+    )},
+}
+
+
+def build_src(base):
+    """Criar base/src com os pacotes e os links; retorna ``base`` (a entrada do sys.path)"""
+    src = os.path.join(base, 'src')
+    for package in ('', 'models', 'routes', 'utils'):
+        os.makedirs(os.path.join(src, package), exist_ok=True)
+        open(os.path.join(src, package, '__init__.py'), 'a').close()
+    for folder in ('database', 'static/uploads'):
+        os.makedirs(os.path.join(src, folder), exist_ok=True)
+    for target, source in SRC_LAYOUT.items():
+        os.symlink(os.path.join(ROOT, source), os.path.join(src, target))
+    return base
+
+
+def bootstrap():
+    """Montar src/ em um diretório temporário (removido na saída) e colocá-lo no sys.path"""
+    base = build_src(tempfile.mkdtemp(prefix='cms-src-'))
+    atexit.register(shutil.rmtree, base, ignore_errors=True)
+    sys.path.insert(0, base)
+    return base
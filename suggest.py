@@ -0,0 +1,396 @@
+import bisect
+import fcntl
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.models.cms import db, BackgroundTask, Company, Job, News, Property
+from src.utils.geo import normalize
+from src.utils.sync import SyncTokenExpired, changes_since, current_token
+from src.utils.tasks import enqueue, task
+
+# Índice em arquivo, aberto com mmap por todos os workers (páginas compartilhadas
+# pelo cache do sistema operacional); só a tarefa da fila o reescreve.
+SUGGEST_INDEX_PATH = os.environ.get('SUGGEST_INDEX_PATH') or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'database', 'suggest.idx'
+)
+
+# Padrões (podem ser sobrescritos via app.config)
+SUGGEST_RELOAD_INTERVAL = 1.0  # segundos entre verificações de um arquivo novo
+SUGGEST_REFRESH_DELAY = 1  # agrupa escritas próximas em menos reescritas
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+SUGGEST_NEWS_LIMIT = 2000  # manchetes mais recentes indexadas
+
+# Prefixos com mais registros que isso têm a lista dos mais relevantes
+# pré-calculada; os demais são lidos por inteiro (no máximo SCAN_LIMIT)
+SCAN_LIMIT = 64
+TOP_PER_PREFIX = 20
+
+MAGIC = b'SUGG2'
+_HEADER = struct.Struct('<III')  # tamanho do cabeçalho JSON, registros, prefixos pré-calculados
+_NO_RECORD = 0xFFFFFFFF
+
+PLAN_WEIGHTS = {'basico': 0.0, 'simples': 0.5, 'intermediario': 1.0, 'avancado': 1.5, 'master_plus': 2.0}
+
+# Tipos atualizados pelo feed de alterações; os demais são recalculados a cada reescrita
+_FEED_TYPES = {'company': Company, 'job': Job}
+
+
+def _keys(label):
+    """Chaves do rótulo: o texto todo e cada palavra significativa em diante"""
+    words = normalize(label).split()
+    for position, word in enumerate(words):
+        if position == 0 or len(word) >= 3:
+            yield ' '.join(words[position:])
+
+
+def _records(kind, item_id, label, weight):
+    label = ' '.join((label or '').split())
+    if not label:
+        return []
+    return [(key, round(weight, 3), kind, item_id, label) for key in _keys(label)]
+
+
+def _company_records(company):
+    if not company.approved:
+        return []
+    weight = (2.0 + 3.0 * bool(company.featured) + PLAN_WEIGHTS.get(company.plan, 0.0)
+              + math.log1p(company.review_count or 0) * (company.rating or 0) / 5)
+    return _records('company', company.id, company.name, weight)
+
+
+def _job_records(job):
+    return _records('job', job.id, job.title, 1.5) if job.active else []
+
+
+_FEED_RECORDS = {'company': _company_records, 'job': _job_records}
+
+
+def _aggregate_records():
+    """Categorias, bairros e manchetes: consultas agregadas/limitadas, relidas inteiras"""
+    records = []
+    for category, count in db.session.query(Company.category, db.func.count(Company.id)).filter(
+        Company.approved == True
+    ).group_by(Company.category):
+        records.extend(_records('category', None, category, 1.0 + math.log1p(count)))
+    for neighborhood, count in db.session.query(Property.neighborhood, db.func.count(Property.id)).filter(
+        Property.active == True, Property.neighborhood.isnot(None)
+    ).group_by(Property.neighborhood):
+        records.extend(_records('neighborhood', None, neighborhood, 1.0 + math.log1p(count)))
+    for news_id, title, featured, views in db.session.query(News.id, News.title, News.featured, News.views).filter(
+        News.published == True
+    ).order_by(News.created_at.desc()).limit(current_app.config.get('SUGGEST_NEWS_LIMIT', SUGGEST_NEWS_LIMIT)):
+        records.extend(_records('news', news_id, title, 1.0 + 2.0 * bool(featured) + math.log1p(views or 0) / 2))
+    return records
+
+
+def _top_prefixes(keys, weights):
+    """Lista dos mais relevantes de cada prefixo com mais de SCAN_LIMIT registros.
+
+    Desce pela ordem das chaves: só os intervalos grandes são subdivididos,
+    então o custo fica proporcional ao número de registros em prefixos grandes.
+    """
+    top = {}
+
+    def visit(low, high, depth):
+        if depth:
+            top[keys[low][:depth]] = heapq.nlargest(TOP_PER_PREFIX, range(low, high), key=weights.__getitem__)
+        position = low
+        while position < high:
+            if len(keys[position]) <= depth:
+                position += 1
+                continue
+            child = keys[position][:depth + 1]
+            end = bisect.bisect_left(keys, child + '\U0010ffff', position, high)
+            if end - position > SCAN_LIMIT:
+                visit(position, end, depth + 1)
+            position = end
+
+    if len(keys) > SCAN_LIMIT:
+        visit(0, len(keys), 0)
+    return top
+
+
+def _pack(blobs):
+    offsets, position = [], 0
+    for blob in blobs:
+        offsets.append(position)
+        position += len(blob)
+    offsets.append(position)
+    return struct.pack(f'<{len(offsets)}I', *offsets) + b''.join(blobs)
+
+
+def _write(path, records, tokens):
+    """Gravar o índice ordenado de forma atômica (arquivo novo + rename)"""
+    records.sort(key=lambda record: (record[0], -record[1]))
+    keys = [record[0] for record in records]
+    top = _top_prefixes(keys, [record[1] for record in records])
+    prefixes = sorted(top)
+
+    header = json.dumps({'tokens': tokens, 'built_at': time.time()}).encode()
+    sections = [
+        MAGIC + _HEADER.pack(len(header), len(records), len(prefixes)) + header,
+        _pack([
+            '\t'.join((key, str(weight), kind, '' if item_id is None else str(item_id), label)).encode()
+            for key, weight, kind, item_id, label in records
+        ]),
+        _pack([prefix.encode() for prefix in prefixes]),
+        b''.join(
+            struct.pack(f'<{TOP_PER_PREFIX}I', *(top[prefix] + [_NO_RECORD] * (TOP_PER_PREFIX - len(top[prefix]))))
+            for prefix in prefixes
+        )
+    ]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as target:
+        target.writelines(sections)
+    os.replace(temporary, path)
+
+
+def _parse(blob):
+    key, weight, kind, item_id, label = blob.decode().split('\t', 4)
+    return key, float(weight), kind, int(item_id) if item_id else None, label
+
+
+class _Strings:
+    """Sequência de strings (bytes) no mapa: offsets uint32 seguidos dos dados"""
+
+    def __init__(self, buffer, start, count, separator=None):
+        self._buffer = buffer
+        self._offsets = memoryview(buffer)[start:start + 4 * (count + 1)].cast('I')
+        self._base = start + 4 * (count + 1)
+        self._separator = separator
+        self.count = count
+        self.end = self._base + self._offsets[count]
+
+    def __len__(self):
+        return self.count
+
+    def item(self, index):
+        return self._buffer[self._base + self._offsets[index]:self._base + self._offsets[index + 1]]
+
+    def __getitem__(self, index):
+        # Registros: só a chave, que é o que a busca binária compara
+        blob = self.item(index)
+        return blob[:blob.index(self._separator)] if self._separator else blob
+
+
+class _Segment:
+    """Arquivo mapeado: registros ordenados pela chave + prefixos pré-calculados"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as source:
+            self.stat = os.fstat(source.fileno())
+            self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError('Índice de sugestões inválido')
+        start = len(MAGIC) + _HEADER.size
+        header_size, count, prefix_count = _HEADER.unpack(self._map[len(MAGIC):start])
+        self.header = json.loads(self._map[start:start + header_size])
+        self.keys = _Strings(self._map, start + header_size, count, b'\t')
+        self.prefixes = _Strings(self._map, self.keys.end, prefix_count)
+        self._top = memoryview(self._map)[self.prefixes.end:self.prefixes.end + 4 * TOP_PER_PREFIX * prefix_count].cast('I')
+
+    def record(self, index):
+        return _parse(self.keys.item(index))
+
+    def records(self):
+        return [self.record(index) for index in range(len(self.keys))]
+
+    def top(self, prefix):
+        """Índices dos registros mais relevantes do prefixo (None se não pré-calculado)"""
+        position = bisect.bisect_left(self.prefixes, prefix)
+        if position == len(self.prefixes) or self.prefixes[position] != prefix:
+            return None
+        slots = self._top[position * TOP_PER_PREFIX:(position + 1) * TOP_PER_PREFIX]
+        return [index for index in slots if index != _NO_RECORD]
+
+
+@contextmanager
+def _exclusive(path):
+    """Um único escritor por vez entre processos (flock no arquivo .lock)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _index_path():
+    return current_app.config.get('SUGGEST_INDEX_PATH', SUGGEST_INDEX_PATH)
+
+
+def _full_records():
+    records = _aggregate_records()
+    for company in Company.query.filter(Company.approved == True):
+        records.extend(_company_records(company))
+    for job in Job.query.filter(Job.active == True):
+        records.extend(_job_records(job))
+    return records
+
+
+def build_index():
+    """Reconstrução completa a partir do banco"""
+    path = _index_path()
+    with _exclusive(path):
+        tokens = {kind: current_token() for kind in _FEED_TYPES}
+        records = _full_records()
+        _write(path, records, tokens)
+        return len(records)
+
+
+@task('suggest.refresh', priority=-5)
+def refresh_index():
+    """Aplicar ao índice as alterações desde a última gravação.
+
+    Empresas e vagas vêm do feed de sincronização (changed_at + tombstones),
+    então só as linhas alteradas são relidas; agregados e manchetes são
+    consultas pequenas e entram inteiros. O arquivo é regravado de uma vez.
+    """
+    path = _index_path()
+    with _exclusive(path):
+        try:
+            segment = _Segment(path)
+            tokens = dict(segment.header['tokens'])
+            changed = {kind: {} for kind in _FEED_TYPES}
+            for kind, model in _FEED_TYPES.items():
+                has_more = True
+                while has_more:
+                    rows, deleted, tokens[kind], has_more = changes_since(model, tokens[kind], 500)
+                    for row in rows:
+                        changed[kind][row.id] = _FEED_RECORDS[kind](row)
+                    for item_id in deleted:
+                        changed[kind][item_id] = []
+        except (FileNotFoundError, ValueError, struct.error, SyncTokenExpired):
+            # Arquivo ausente, de outra versão ou corrompido: reconstruir do zero
+            tokens = {kind: current_token() for kind in _FEED_TYPES}
+            _write(path, _full_records(), tokens)
+            return
+
+        records = [
+            record for record in segment.records()
+            if record[2] in _FEED_TYPES and record[3] not in changed[record[2]]
+        ]
+        for kind_changes in changed.values():
+            for item_records in kind_changes.values():
+                records.extend(item_records)
+        records.extend(_aggregate_records())
+        _write(path, records, tokens)
+
+
+def _refresh_pending(session):
+    """Já existe um suggest.refresh ainda não retirado por um worker?"""
+    with session.no_autoflush:
+        return session.query(BackgroundTask.id).filter(
+            BackgroundTask.name == 'suggest.refresh', BackgroundTask.status == 'pending'
+        ).first() is not None
+
+
+def schedule_refresh(session=None):
+    """Agendar a atualização do índice na transação atual.
+
+    A tarefa lê o feed de alterações quando roda, então uma pendente já cobre
+    esta escrita: só enfileira se não houver nenhuma aguardando um worker.
+    """
+    session = session or db.session
+    if not session.info.get('suggest_refresh_scheduled'):
+        session.info['suggest_refresh_scheduled'] = True
+        if not _refresh_pending(session):
+            enqueue('suggest.refresh', delay=SUGGEST_REFRESH_DELAY, session=session)
+
+
+_SOURCE_MODELS = (Company, Job, News, Property)
+
+
+@event.listens_for(Session, 'before_commit')
+def _schedule_on_write(session):
+    # Inclui PATCH via UPDATE direto (patch_row registra o modelo em changed_models)
+    changed = set(session.info.get('changed_models', ()))
+    changed.update(type(obj) for obj in list(session.new) + list(session.dirty) + list(session.deleted))
+    if any(issubclass(model, _SOURCE_MODELS) for model in changed):
+        schedule_refresh(session)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _reset_schedule(session):
+    session.info.pop('suggest_refresh_scheduled', None)
+
+
+class SuggestIndex:
+    """Leitor do índice: busca binária pelo prefixo + ordenação por peso"""
+
+    def __init__(self):
+        self._segment = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _current(self):
+        now = time.monotonic()
+        if self._segment is not None and now - self._checked < current_app.config.get(
+            'SUGGEST_RELOAD_INTERVAL', SUGGEST_RELOAD_INTERVAL
+        ):
+            return self._segment
+        with self._lock:
+            self._checked = now
+            path = _index_path()
+            if not os.path.exists(path):
+                # Primeiro uso: quem pegar o lock constrói, os demais só atualizam
+                refresh_index()
+            stat = os.stat(path)
+            if self._segment is None or (stat.st_ino, stat.st_mtime_ns) != (
+                self._segment.stat.st_ino, self._segment.stat.st_mtime_ns
+            ):
+                try:
+                    self._segment = _Segment(path)
+                except (ValueError, struct.error):
+                    # Arquivo inválido: refresh_index o regrava por inteiro
+                    refresh_index()
+                    self._segment = _Segment(path)
+        return self._segment
+
+    def search(self, query, limit=SUGGEST_DEFAULT_LIMIT):
+        prefix = ' '.join(normalize(query).split())
+        if not prefix:
+            return []
+        segment = self._current()
+        encoded = prefix.encode()
+        start = bisect.bisect_left(segment.keys, encoded)
+        end = bisect.bisect_left(segment.keys, encoded + b'\xff', start)
+
+        candidates = range(start, end)
+        if end - start > SCAN_LIMIT:
+            candidates = segment.top(encoded) or range(start, start + SCAN_LIMIT)
+
+        best = {}
+        for index in candidates:
+            key, weight, kind, item_id, label = segment.record(index)
+            identity = (kind, item_id if item_id is not None else label)
+            if identity not in best or weight > best[identity]['score']:
+                best[identity] = {'type': kind, 'id': item_id, 'text': label, 'score': weight}
+        return heapq.nlargest(limit, best.values(), key=lambda item: item['score'])
+
+
+suggest_index = SuggestIndex()
+
+
+@click.command('suggest-rebuild')
+@with_appcontext
+def suggest_rebuild_command():
+    """Reconstruir o índice de sugestões da busca"""
+    click.echo(f'{build_index()} chave(s) indexada(s)')
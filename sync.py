@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, jsonify
+from flask.cli import with_appcontext
+from sqlalchemy import and_, event, inspect, or_
+from sqlalchemy.orm import Session, selectinload
+
+from src.models.cms import db, Company, Job, Property, Tombstone
+from src.utils.formats import list_response
+from src.utils.pagination import decode_cursor, encode_cursor, parse_limit
+
+# Modelos com sincronização incremental -> nome gravado nos tombstones
+SYNC_ENTITIES = {Company: 'company', Job: 'job', Property: 'property'}
+
+# Linhas alteradas nos últimos segundos são reenviadas no próximo sync:
+# cobre transações que gravaram changed_at antes de um commit mais lento
+SYNC_OVERLAP = timedelta(seconds=5)
+SYNC_TOMBSTONE_RETENTION = timedelta(days=90)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class SyncTokenExpired(Exception):
+    """Token mais antigo que os tombstones guardados: refazer o sync completo (410)"""
+
+
+def record_tombstones(model, ids, session=None):
+    """Registrar exclusões feitas em massa (query.delete não passa pelo flush)"""
+    session = session or db.session
+    now = datetime.utcnow()
+    session.add_all([Tombstone(entity=SYNC_ENTITIES[model], entity_id=entity_id, deleted_at=now) for entity_id in ids])
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_deletes(session, flush_context, instances):
+    for obj in list(session.deleted):
+        entity = SYNC_ENTITIES.get(type(obj))
+        if entity is not None:
+            session.add(Tombstone(entity=entity, entity_id=obj.id))
+
+
+def touch(obj):
+    """Marcar a linha como alterada (ex.: mudança só nas fotos)"""
+    obj.changed_at = datetime.utcnow()
+
+
+def _after(column, id_column, position):
+    value, last_id = position
+    return or_(column > value, and_(column == value, id_column > last_id))
+
+
+def _advance(position, last, overflow):
+    if overflow:
+        return last
+    # Fluxo completo: seguir até "agora - margem" (nunca voltar)
+    return max(position, (datetime.utcnow() - current_app.config.get('SYNC_OVERLAP', SYNC_OVERLAP), 0))
+
+
+def changes_since(model, token, limit, options=()):
+    """Linhas alteradas e ids excluídos desde o token.
+
+    O token guarda duas posições (changed_at, id): uma na tabela do modelo e
+    outra nos tombstones; '0' começa do zero (sync inicial). ``options`` são
+    aplicadas à consulta das linhas (ex.: selectinload). Retorna
+    (linhas, ids_excluidos, próximo_token, has_more).
+    """
+    if token == '0':
+        rows_position = tombs_position = (EPOCH, 0)
+    else:
+        values = decode_cursor(token, (model.changed_at, model.id, Tombstone.deleted_at, Tombstone.id))
+        rows_position, tombs_position = tuple(values[:2]), tuple(values[2:])
+        retention = current_app.config.get('SYNC_TOMBSTONE_RETENTION', SYNC_TOMBSTONE_RETENTION)
+        if tombs_position[0] < datetime.utcnow() - retention:
+            raise SyncTokenExpired()
+
+    rows = model.query.options(*options).filter(
+        _after(model.changed_at, model.id, rows_position)
+    ).order_by(model.changed_at, model.id).limit(limit + 1).all()
+
+    tombs = db.session.query(Tombstone.id, Tombstone.entity_id, Tombstone.deleted_at).filter(
+        Tombstone.entity == SYNC_ENTITIES[model],
+        _after(Tombstone.deleted_at, Tombstone.id, tombs_position)
+    ).order_by(Tombstone.deleted_at, Tombstone.id).limit(limit + 1).all()
+
+    rows_overflow, tombs_overflow = len(rows) > limit, len(tombs) > limit
+    rows, tombs = rows[:limit], tombs[:limit]
+
+    rows_position = _advance(rows_position, rows and (rows[-1].changed_at, rows[-1].id), rows_overflow)
+    tombs_position = _advance(tombs_position, tombs and (tombs[-1].deleted_at, tombs[-1].id), tombs_overflow)
+
+    next_token = encode_cursor(list(rows_position) + list(tombs_position))
+    return rows, [tomb.entity_id for tomb in tombs], next_token, rows_overflow or tombs_overflow
+
+
+def current_token():
+    """Token que começa agora, para quem acabou de ler o estado completo.
+
+    Como no fluxo normal, a margem SYNC_OVERLAP é reenviada no próximo sync.
+    """
+    position = datetime.utcnow() - current_app.config.get('SYNC_OVERLAP', SYNC_OVERLAP)
+    return encode_cursor([position, 0, position, 0])
+
+
+def sync_response(key, model, token, visible, limit=None):
+    """Resposta do modo changed_since de uma listagem.
+
+    `visible(linha)` decide se a linha alterada ainda aparece na listagem
+    pública; as que deixaram de aparecer vão para `deleted`, junto com os
+    tombstones. Filtros de busca/categoria não se aplicam neste modo.
+    """
+    # Fotos em uma consulta para o lote inteiro (to_dict inclui as fotos)
+    options = [selectinload(model.photos)] if 'photos' in inspect(model).relationships else []
+    try:
+        rows, deleted, next_token, has_more = changes_since(model, token, parse_limit(limit), options)
+    except SyncTokenExpired:
+        return jsonify({'error': 'sync_token expirado: faça a sincronização completa (changed_since=0)'}), 410
+
+    items = []
+    for row in rows:
+        if visible(row):
+            items.append(row.to_dict())
+        else:
+            deleted.append(row.id)
+
+    return list_response(key, items, deleted=deleted, sync_token=next_token, has_more=has_more)
+
+
+@click.command('sync-purge')
+@with_appcontext
+def sync_purge_command():
+    """Remover tombstones mais antigos que o período de retenção"""
+    retention = current_app.config.get('SYNC_TOMBSTONE_RETENTION', SYNC_TOMBSTONE_RETENTION)
+    affected = Tombstone.query.filter(
+        Tombstone.deleted_at < datetime.utcnow() - retention
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    click.echo(f'{affected} tombstone(s) removido(s)')
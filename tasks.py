@@ -0,0 +1,298 @@
+import json
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import time
+import traceback
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func
+
+from src.models.cms import db, BackgroundTask
+
+logger = logging.getLogger('tasks')
+
+# Padrões (podem ser sobrescritos via app.config)
+TASK_VISIBILITY_TIMEOUT = 300  # segundos até outro worker poder reassumir a tarefa
+TASK_POLL_INTERVAL = 1.0
+TASK_BACKOFF_BASE = 10  # 10 s, 20 s, 40 s... com variação aleatória de ±20%
+TASK_BACKOFF_MAX = 3600
+TASK_MAX_ATTEMPTS = 5
+
+TaskSpec = namedtuple('TaskSpec', 'func priority max_attempts')
+
+_handlers = {}
+
+
+def task(name, priority=0, max_attempts=TASK_MAX_ATTEMPTS):
+    """Registrar um handler: func(**payload), executado dentro de um app context"""
+    def decorator(func):
+        _handlers[name] = TaskSpec(func, priority, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, priority=None, delay=0, session=None):
+    """Adicionar uma tarefa na transação atual (sem commit).
+
+    A tarefa só fica visível para os workers depois do commit da requisição
+    e desaparece junto com um rollback.
+    """
+    spec = _handlers[name]
+    session = session or db.session
+    background_task = BackgroundTask(
+        name=name,
+        payload=json.dumps(payload or {}, default=str),
+        priority=spec.priority if priority is None else priority,
+        max_attempts=spec.max_attempts,
+        run_at=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    session.add(background_task)
+    return background_task
+
+
+def _backoff(attempts):
+    base = current_app.config.get('TASK_BACKOFF_BASE', TASK_BACKOFF_BASE)
+    limit = current_app.config.get('TASK_BACKOFF_MAX', TASK_BACKOFF_MAX)
+    return min(base * 2 ** (attempts - 1), limit) * random.uniform(0.8, 1.2)
+
+
+def claim_next(worker_id):
+    """Retirar a próxima tarefa pronta com um único UPDATE ... RETURNING.
+
+    Tarefas 'running' cujo locked_until passou (worker morreu) voltam a ser
+    elegíveis. No PostgreSQL o SKIP LOCKED evita disputa entre workers; no
+    SQLite as escritas já são serializadas. Sem RETURNING (SQLite anterior
+    à 3.35) a linha é relida logo após o UPDATE, na mesma transação.
+    """
+    now = datetime.utcnow()
+    timeout = current_app.config.get('TASK_VISIBILITY_TIMEOUT', TASK_VISIBILITY_TIMEOUT)
+    locked_until = now + timedelta(seconds=timeout)
+    ready = db.or_(
+        db.and_(BackgroundTask.status == 'pending', BackgroundTask.run_at <= now),
+        db.and_(BackgroundTask.status == 'running', BackgroundTask.locked_until < now)
+    )
+    candidate = db.select(BackgroundTask.id).where(ready).order_by(
+        BackgroundTask.priority.desc(), BackgroundTask.run_at, BackgroundTask.id
+    ).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+
+    claim = db.update(BackgroundTask).where(BackgroundTask.id == candidate, ready).values(
+        status='running',
+        attempts=BackgroundTask.attempts + 1,
+        locked_until=locked_until,
+        locked_by=worker_id
+    )
+    columns = (
+        BackgroundTask.id, BackgroundTask.name, BackgroundTask.payload,
+        BackgroundTask.attempts, BackgroundTask.max_attempts
+    )
+
+    if db.engine.dialect.update_returning:
+        row = db.session.execute(claim.returning(*columns)).first()
+    else:
+        # SQLite < 3.35 (sem RETURNING): reler pelo dono e validade recém-gravados
+        row = None
+        if db.session.execute(claim).rowcount:
+            row = db.session.execute(db.select(*columns).where(
+                BackgroundTask.locked_by == worker_id,
+                BackgroundTask.locked_until == locked_until
+            ).order_by(BackgroundTask.id.desc()).limit(1)).first()
+    db.session.commit()
+    return row
+
+
+def _finish(task_id, worker_id, **values):
+    # Só quem ainda detém a tarefa pode concluí-la
+    db.session.execute(
+        db.update(BackgroundTask)
+        .where(BackgroundTask.id == task_id, BackgroundTask.locked_by == worker_id)
+        .values(locked_until=None, **values)
+    )
+
+
+def execute(row, worker_id):
+    """Executar uma tarefa retirada; sucesso e conclusão no mesmo commit"""
+    if row.attempts > row.max_attempts:
+        # Esgotou as tentativas estourando o tempo de visibilidade
+        _finish(row.id, worker_id, status='failed', finished_at=datetime.utcnow(),
+                last_error='Tempo de visibilidade esgotado')
+        db.session.commit()
+        return False
+
+    try:
+        spec = _handlers.get(row.name)
+        if spec is None:
+            raise LookupError(f'Tarefa desconhecida: {row.name}')
+        spec.func(**json.loads(row.payload or '{}'))
+        _finish(row.id, worker_id, status='done', finished_at=datetime.utcnow(), last_error=None)
+        db.session.commit()
+        return True
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc(limit=5)
+        logger.exception('Tarefa %s (%s) falhou na tentativa %d', row.id, row.name, row.attempts)
+        if row.attempts >= row.max_attempts:
+            _finish(row.id, worker_id, status='failed', finished_at=datetime.utcnow(), last_error=error)
+        else:
+            _finish(row.id, worker_id, status='pending', last_error=error,
+                    run_at=datetime.utcnow() + timedelta(seconds=_backoff(row.attempts)))
+        db.session.commit()
+        return False
+
+
+def run_worker(app, worker_id=None, once=False):
+    """Laço do worker: retira e executa tarefas até receber SIGTERM/SIGINT"""
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    poll_interval = app.config.get('TASK_POLL_INTERVAL', TASK_POLL_INTERVAL)
+    processed = 0
+    logger.info('Worker %s iniciado', worker_id)
+    while not stopping:
+        # Um app context por tarefa: sessão nova a cada execução
+        with app.app_context():
+            try:
+                row = claim_next(worker_id)
+                if row is not None:
+                    execute(row, worker_id)
+                    processed += 1
+            except Exception:
+                # Banco indisponível/travado: tentar de novo no próximo ciclo
+                logger.exception('Worker %s: erro ao acessar a fila', worker_id)
+                db.session.rollback()
+                row = None
+        if row is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+    logger.info('Worker %s encerrado (%d tarefas)', worker_id, processed)
+    return processed
+
+
+def _worker_process(app):
+    # Conexões herdadas do processo pai não podem ser reutilizadas após o fork
+    with app.app_context():
+        db.engine.dispose(close=False)
+    run_worker(app)
+
+
+def queue_stats():
+    """Contagem por status e idade da tarefa pronta mais antiga"""
+    counts = dict(db.session.query(BackgroundTask.status, func.count(BackgroundTask.id)).group_by(
+        BackgroundTask.status
+    ))
+    oldest = db.session.query(func.min(BackgroundTask.run_at)).filter(
+        BackgroundTask.status == 'pending', BackgroundTask.run_at <= datetime.utcnow()
+    ).scalar()
+    db.session.rollback()
+    return {
+        'pending': counts.get('pending', 0),
+        'running': counts.get('running', 0),
+        'done': counts.get('done', 0),
+        'failed': counts.get('failed', 0),
+        'oldest_ready_seconds': round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else 0
+    }
+
+
+def readiness_check():
+    # Informativo: atraso da fila não deve tirar o nó web do balanceador
+    return True, queue_stats()
+
+
+tasks_cli = AppGroup('tasks', help='Fila de tarefas em segundo plano')
+
+
+@tasks_cli.command('worker')
+@click.option('--processes', default=1, show_default=True, help='Número de processos worker')
+@click.option('--once', is_flag=True, help='Esvaziar a fila e sair')
+def worker_command(processes, once):
+    """Executar workers da fila"""
+    app = current_app._get_current_object()
+    if processes <= 1 or once:
+        run_worker(app, once=once)
+        return
+
+    children = [multiprocessing.Process(target=_worker_process, args=(app,)) for _ in range(processes)]
+    for child in children:
+        child.start()
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        for child in children:
+            child.terminate()
+            child.join()
+
+
+@tasks_cli.command('stats')
+def stats_command():
+    """Resumo da fila por status"""
+    stats = queue_stats()
+    click.echo(
+        f"{stats['pending']} pendentes, {stats['running']} em execução, "
+        f"{stats['done']} concluídas, {stats['failed']} com falha; "
+        f"mais antiga pronta há {stats['oldest_ready_seconds']} s"
+    )
+
+
+@tasks_cli.command('list')
+@click.option('--status', default=None, help='pending, running, done ou failed')
+@click.option('--limit', default=20, show_default=True)
+def list_command(status, limit):
+    """Listar tarefas (mais recentes primeiro)"""
+    query = BackgroundTask.query
+    if status:
+        query = query.filter(BackgroundTask.status == status)
+    for background_task in query.order_by(BackgroundTask.id.desc()).limit(limit):
+        error = (background_task.last_error or '').strip().splitlines()
+        click.echo(
+            f'#{background_task.id} {background_task.name} [{background_task.status}] '
+            f'prioridade={background_task.priority} tentativas={background_task.attempts}/{background_task.max_attempts} '
+            f'executar_em={background_task.run_at:%Y-%m-%d %H:%M:%S}'
+            + (f' erro={error[-1]}' if error else '')
+        )
+
+
+@tasks_cli.command('retry')
+@click.argument('task_ids', nargs=-1, type=int)
+@click.option('--all-failed', is_flag=True, help='Reenfileirar todas as tarefas com falha')
+def retry_command(task_ids, all_failed):
+    """Reenfileirar tarefas com falha"""
+    query = BackgroundTask.query.filter(BackgroundTask.status == 'failed')
+    if not all_failed:
+        query = query.filter(BackgroundTask.id.in_(task_ids))
+    affected = query.update({
+        'status': 'pending',
+        'attempts': 0,
+        'run_at': datetime.utcnow(),
+        'finished_at': None
+    }, synchronize_session=False)
+    db.session.commit()
+    click.echo(f'{affected} tarefa(s) reenfileirada(s)')
+
+
+@tasks_cli.command('purge')
+@click.option('--older-than', default=7, show_default=True, help='Idade mínima em dias')
+@click.option('--include-failed', is_flag=True, help='Remover também tarefas com falha')
+def purge_command(older_than, include_failed):
+    """Remover tarefas concluídas antigas"""
+    statuses = ['done', 'failed'] if include_failed else ['done']
+    affected = BackgroundTask.query.filter(
+        BackgroundTask.status.in_(statuses),
+        BackgroundTask.finished_at < datetime.utcnow() - timedelta(days=older_than)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    click.echo(f'{affected} tarefa(s) removida(s)')
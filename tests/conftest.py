@@ -0,0 +1,65 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src_layout import build_src
+
+
+def pytest_configure(config):
+    # Antes da coleta: os módulos de teste importam src.* no topo
+    config._src_base = build_src(tempfile.mkdtemp(prefix='cms-tests-'))
+    os.environ.pop('SUGGEST_INDEX_PATH', None)
+    sys.path.insert(0, config._src_base)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(getattr(config, '_src_base', ''), ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from src.main import app
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture(autouse=True)
+def database(app):
+    """Banco vazio a cada teste, com as mesmas triggers criadas na inicialização"""
+    from src.models.cms import db
+    from src.utils.clusters import init_cluster_index
+    from src.utils.fuzzy import init_fuzzy_index
+    from src.utils.geo import init_spatial_index
+    from src.utils.schema import sync_schema
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        sync_schema(db)
+        init_spatial_index(db)
+        init_cluster_index(db)
+        init_fuzzy_index(db)
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_client(app, database):
+    from src.models.cms import User
+
+    admin = User(email='admin@example.com', name='Admin', is_admin=True)
+    database.session.add(admin)
+    database.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = admin.id
+    return client
@@ -0,0 +1,64 @@
+import pytest
+
+from src.models.cms import Company, Review
+
+
+@pytest.fixture
+def companies(database):
+    companies = [
+        Company(name='Padaria', category='alimentacao', approved=False),
+        Company(name='Mercado', category='alimentacao', approved=False),
+        Company(name='Oficina', category='servicos', approved=False),
+    ]
+    database.session.add_all(companies)
+    database.session.commit()
+    database.session.add_all([
+        Review(company_id=company.id, author_name='Ana', rating=rating, approved=False)
+        for company, rating in zip(companies, (5, 3, 1))
+    ])
+    database.session.commit()
+    return companies
+
+
+@pytest.mark.parametrize('filters', [
+    {'catgory': 'alimentacao'},
+    {'category': ''},
+    {'category': None},
+    {'category': 'alimentacao', 'approvd': 'false'},
+])
+def test_company_bulk_rejects_unusable_filters(admin_client, database, companies, filters):
+    response = admin_client.post('/api/admin/companies/bulk', json={'action': 'delete', 'filter': filters})
+    assert response.status_code == 400
+    assert Company.query.count() == 3
+    assert Review.query.count() == 3
+
+
+def test_company_bulk_applies_filter(admin_client, database, companies):
+    response = admin_client.post('/api/admin/companies/bulk', json={
+        'action': 'approve', 'filter': {'category': 'alimentacao'}
+    })
+    assert response.status_code == 200
+    assert response.get_json()['affected'] == 2
+    assert {company.name for company in Company.query.filter_by(approved=True)} == {'Padaria', 'Mercado'}
+
+    response = admin_client.post('/api/admin/companies/bulk', json={
+        'action': 'delete', 'ids': [companies[2].id]
+    })
+    assert response.get_json()['affected'] == 1
+    assert Company.query.count() == 2
+    assert Review.query.count() == 2
+
+
+def test_review_bulk_filters(admin_client, database, companies):
+    response = admin_client.post('/api/admin/reviews/bulk', json={'action': 'delete', 'filter': {'ratng': 1}})
+    assert response.status_code == 400
+    assert Review.query.count() == 3
+
+    response = admin_client.post('/api/admin/reviews/bulk', json={'action': 'delete', 'filter': {'rating': 1}})
+    assert response.get_json()['affected'] == 1
+    assert sorted(review.rating for review in Review.query) == [3, 5]
+
+
+def test_bulk_requires_ids_or_filter(admin_client, companies):
+    for body in ({'action': 'approve'}, {'action': 'approve', 'filter': {}}):
+        assert admin_client.post('/api/admin/companies/bulk', json=body).status_code == 400
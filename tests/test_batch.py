@@ -0,0 +1,53 @@
+import os
+
+from src.models.cms import Company
+from src.routes.companies import UPLOAD_FOLDER
+from src.utils.events import hub
+
+
+def _batch(client, requests):
+    response = client.post('/api/batch', json={'requests': requests})
+    assert response.status_code == 200
+    return response.get_json()['responses']
+
+
+def test_batch_runs_each_get(client, database):
+    database.session.add(Company(name='Padaria Central', category='alimentacao', approved=True))
+    database.session.commit()
+
+    responses = _batch(client, ['/api/companies', {'id': 'missing', 'path': '/api/nao-existe'}])
+
+    assert [item['status'] for item in responses] == [200, 404]
+    assert responses[0]['id'] == 0
+    assert responses[0]['body']['companies'][0]['name'] == 'Padaria Central'
+    assert responses[1]['id'] == 'missing'
+
+
+def test_batch_rejects_invalid_items(client):
+    responses = _batch(client, [
+        42,
+        {'path': ['/api/companies']},
+        {'path': '/api/companies', 'method': 'POST'},
+        {'path': '/api/batch'},
+        '/outside',
+    ])
+    assert [item['status'] for item in responses] == [400, 400, 405, 400, 400]
+    assert responses[0]['id'] == 0
+
+
+def test_batch_refuses_streams_and_files(client):
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    with open(os.path.join(UPLOAD_FOLDER, 'lote.jpg'), 'wb') as photo:
+        photo.write(b'\xff\xd8\xff\xd9')
+
+    responses = _batch(client, ['/api/events/news', '/api/photos/lote.jpg', '/api/companies'])
+
+    assert [item['status'] for item in responses] == [415, 415, 200]
+    # O SSE nem chegou a assinar o feed
+    assert hub.client_count() == 0
+
+
+def test_batch_limit(client, app):
+    limit = app.config.get('BATCH_MAX_REQUESTS', 20)
+    response = client.post('/api/batch', json={'requests': ['/api/companies'] * (limit + 1)})
+    assert response.status_code == 400
@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import text
+
+from src.models.cms import Company, Property
+from src.utils.clusters import CLUSTER_SOURCES, cell_of, get_clusters, rebuild_clusters
+
+
+def _cells(database):
+    rows = database.session.execute(text(
+        'SELECT kind, zoom, x, y, count, lat_sum, lng_sum, id_sum FROM map_cell WHERE count != 0'
+    )).all()
+    return {row[:4]: (row[4], pytest.approx(row[5]), pytest.approx(row[6]), row[7]) for row in rows}
+
+
+def _property(**values):
+    return Property(title='Casa', property_type='casa', purpose='venda', price=1.0, active=True, **values)
+
+
+def test_triggers_match_full_rebuild(database):
+    companies = [
+        Company(name=f'Empresa {index}', category='servicos', approved=True,
+                latitude=-23.30 + index * 0.013, longitude=-47.10 - index * 0.017)
+        for index in range(12)
+    ]
+    companies.append(Company(name='Sem endereço', category='servicos', approved=True))
+    # Ids acima de 2^31: id_sum é bigint
+    companies.append(Company(id=3_000_000_000, name='Grande', category='servicos', approved=True,
+                             latitude=-23.30, longitude=-47.10))
+    properties = [_property(latitude=-23.28 + index * 0.02, longitude=-47.12) for index in range(5)]
+    database.session.add_all(companies + properties)
+    database.session.commit()
+
+    companies[0].latitude, companies[0].longitude = -23.20, -47.00  # mudou de célula
+    companies[1].approved = False  # some do mapa
+    companies[2].latitude = None
+    companies[12].latitude, companies[12].longitude = -23.31, -47.11  # ganhou coordenadas
+    properties[0].active = False
+    properties[1].longitude = -47.05
+    database.session.delete(companies[3])
+    database.session.delete(properties[2])
+    database.session.commit()
+
+    incremental = _cells(database)
+    assert incremental
+
+    with database.engine.begin() as conn:
+        for model in CLUSTER_SOURCES:
+            rebuild_clusters(conn, model)
+    database.session.expire_all()
+
+    assert _cells(database) == incremental
+
+
+def test_single_pin_cluster_carries_id(app, database):
+    company = Company(name='Padaria', category='alimentacao', approved=True, latitude=-23.30, longitude=-47.10)
+    database.session.add(company)
+    database.session.commit()
+
+    zoom, clusters = get_clusters((-47.2, -23.4, -47.0, -23.2), 16, ['company'])
+    assert zoom <= 16
+    assert [(cluster['count'], cluster['id']) for cluster in clusters] == [(1, company.id)]
+    assert cell_of(-23.30, -47.10, zoom) == cell_of(clusters[0]['lat'], clusters[0]['lng'], zoom)
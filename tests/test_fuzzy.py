@@ -0,0 +1,89 @@
+from sqlalchemy import event
+
+from src.models.cms import Company, Job, SearchTrigram
+from src.routes.search import SEARCH_RESULT_KEYS
+from src.utils.fuzzy import fuzzy_search, trigrams
+
+
+def _indexed(database, entity, item_id):
+    return sorted(database.session.execute(
+        database.select(SearchTrigram.trigram).where(SearchTrigram.entity == entity, SearchTrigram.item_id == item_id)
+    ).scalars())
+
+
+def test_triggers_keep_trigrams_in_sync(database):
+    company = Company(name='Padaria São José', category='alimentacao', approved=True)
+    job = Job(title='Auxiliar de cozinha', company_name='Padaria', description='-')
+    database.session.add_all([company, job])
+    database.session.commit()
+    assert _indexed(database, 'company', company.id) == trigrams('Padaria São José')
+    assert _indexed(database, 'job', job.id) == trigrams('Auxiliar de cozinha')
+
+    company.name = 'Mercado Central'
+    database.session.commit()
+    assert _indexed(database, 'company', company.id) == trigrams('Mercado Central')
+
+    company_id = company.id
+    database.session.delete(company)
+    database.session.commit()
+    assert _indexed(database, 'company', company_id) == []
+    assert _indexed(database, 'job', job.id) == trigrams('Auxiliar de cozinha')
+
+
+def test_search_tolerates_typos_and_hides_unapproved(database):
+    bakery = Company(name='Padaria São José', category='alimentacao', approved=True)
+    hidden = Company(name='Padaria Escondida', category='alimentacao', approved=False)
+    other = Company(name='Mercado Central', category='alimentacao', approved=True)
+    database.session.add_all([bakery, hidden, other])
+    database.session.commit()
+
+    results = fuzzy_search('company', 'padria sao jose')
+    assert [row.id for row, _ in results] == [bakery.id]
+    assert 0 < results[0][1] <= 1
+
+
+def test_search_uses_covering_primary_key(database):
+    database.session.add(Company(name='Padaria São José', category='alimentacao', approved=True))
+    database.session.commit()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'search_trigram' in statement:
+            statements.append((statement, parameters))
+
+    event.listen(database.engine, 'before_cursor_execute', record)
+    try:
+        fuzzy_search('company', 'padaria')
+    finally:
+        event.remove(database.engine, 'before_cursor_execute', record)
+
+    [(statement, parameters)] = statements
+    plan = [row[3] for row in database.session.connection().exec_driver_sql(
+        'EXPLAIN QUERY PLAN ' + statement, parameters
+    )]
+    trigram_steps = [step for step in plan if 'search_trigram' in step]
+    assert trigram_steps
+    assert all(step.startswith('SEARCH') and 'COVERING INDEX sqlite_autoindex_search_trigram_1' in step
+               for step in trigram_steps), plan
+
+
+def test_search_route(client, database):
+    database.session.add(Company(name='Padaria São José', category='alimentacao', approved=True))
+    database.session.commit()
+
+    response = client.get('/api/search?q=padaira')
+    assert response.status_code == 200
+    companies = response.get_json()[SEARCH_RESULT_KEYS['company']]
+    assert [item['name'] for item in companies] == ['Padaria São José']
+
+
+def test_search_limit_is_clamped(client, database):
+    database.session.add_all([
+        Company(name=f'Padaria {name}', category='alimentacao', approved=True) for name in ('Sol', 'Lua', 'Mar')
+    ])
+    database.session.commit()
+
+    response = client.get('/api/search?q=padaria&types=company&limit=-5')
+    assert response.status_code == 200
+    assert len(response.get_json()[SEARCH_RESULT_KEYS['company']]) == 1
@@ -0,0 +1,23 @@
+from src.models.cms import Property
+from src.utils.geo import geocode
+
+
+def test_every_listed_neighborhood_geocodes(client):
+    neighborhoods = client.get('/api/properties/neighborhoods').get_json()['neighborhoods']
+    assert neighborhoods
+    assert [name for name in neighborhoods if geocode(neighborhood=name) is None] == []
+
+
+def test_patch_without_match_clears_coordinates(admin_client, database):
+    home = Property(title='Casa', property_type='casa', purpose='venda', price=1.0, active=True, neighborhood='Centro')
+    database.session.add(home)
+    database.session.commit()
+    home_id = home.id
+
+    response = admin_client.patch(f'/api/properties/{home_id}', json={'neighborhood': 'Centro', 'version': 1})
+    body = response.get_json()['property']
+    assert (body['latitude'], body['longitude']) == geocode(neighborhood='Centro')
+
+    response = admin_client.patch(f'/api/properties/{home_id}', json={'neighborhood': 'Lugar Nenhum', 'version': 2})
+    body = response.get_json()['property']
+    assert (body['latitude'], body['longitude']) == (None, None)
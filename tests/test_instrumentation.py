@@ -0,0 +1,14 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+def test_failed_statement_clears_every_start_stack(app, database, monkeypatch):
+    monkeypatch.setitem(app.config, 'PERF_SAMPLE_RATE', 1.0)
+    with app.test_request_context():
+        app.preprocess_request()  # sorteia a amostragem (g._perf)
+        with database.engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM tabela_inexistente'))
+            assert not conn.info.get('_perf_start')
+            assert not conn.info.get('_slow_query_start')
@@ -0,0 +1,71 @@
+import pytest
+
+from src.models.cms import Company
+from src.utils.patching import RowNotFound, VersionConflict, patch_row
+
+
+@pytest.fixture
+def company(database):
+    company = Company(name='Padaria Central', category='alimentacao', approved=True)
+    database.session.add(company)
+    database.session.commit()
+    return company
+
+
+def test_patch_row_increments_version(database, company):
+    row = patch_row(Company, company.id, {'phone': '11 4529-0000'}, version=1)
+    database.session.commit()
+
+    assert row['phone'] == '11 4529-0000'
+    assert row['version'] == 2
+    assert database.session.get(Company, company.id, populate_existing=True).version == 2
+
+
+def test_patch_row_stale_version_conflicts(database, company):
+    patch_row(Company, company.id, {'phone': '1'}, version=1)
+    database.session.commit()
+
+    with pytest.raises(VersionConflict) as conflict:
+        patch_row(Company, company.id, {'phone': '2'}, version=1)
+    assert conflict.value.current_version == 2
+    database.session.rollback()
+    assert database.session.get(Company, company.id, populate_existing=True).phone == '1'
+
+
+def test_patch_row_without_version_is_unconditional(database, company):
+    patch_row(Company, company.id, {'phone': '1'}, version=1)
+    row = patch_row(Company, company.id, {'phone': '2'})
+    assert row['version'] == 3
+
+
+def test_patch_row_missing_row(database):
+    with pytest.raises(RowNotFound):
+        patch_row(Company, 999, {'phone': '1'}, version=1)
+
+
+def test_patch_route_requires_version(admin_client, company):
+    response = admin_client.patch(f'/api/companies/{company.id}', json={'phone': '1'})
+    assert response.status_code == 428
+
+
+def test_patch_route_conflict_and_success(admin_client, company):
+    response = admin_client.patch(f'/api/companies/{company.id}', json={'phone': '1', 'version': 1})
+    assert response.status_code == 200
+    body = response.get_json()['company']
+    assert body['version'] == 2
+    assert body['phone'] == '1'
+    assert 'photos' in body  # mesmo formato do to_dict()
+
+    response = admin_client.patch(f'/api/companies/{company.id}', json={'phone': '2', 'version': 1})
+    assert response.status_code == 409
+    assert response.get_json()['current_version'] == 2
+
+    response = admin_client.patch(f'/api/companies/{company.id}', json={'phone': '2'}, headers={'If-Match': '"2"'})
+    assert response.status_code == 200
+    assert response.get_json()['company']['version'] == 3
+
+
+def test_put_without_version_is_unconditional(admin_client, company):
+    response = admin_client.put(f'/api/companies/{company.id}', json={'phone': '1'})
+    assert response.status_code == 200
+    assert response.get_json()['company']['version'] == 2
@@ -0,0 +1,18 @@
+from src.models.cms import Company, RelatedItem
+
+
+def test_related_limit_is_clamped(client, database):
+    companies = [Company(name=f'Padaria {index}', category='alimentacao', approved=True) for index in range(4)]
+    database.session.add_all(companies)
+    database.session.commit()
+    source = companies[0]
+    database.session.add_all([
+        RelatedItem(entity='company', item_id=source.id, related_id=other.id, score=1.0 / position)
+        for position, other in enumerate(companies[1:], start=1)
+    ])
+    database.session.commit()
+
+    for limit, expected in (('-5', 1), ('0', 1), ('2', 2)):
+        response = client.get(f'/api/companies/{source.id}/related?limit={limit}')
+        assert response.status_code == 200
+        assert len(response.get_json()['companies']) == expected
@@ -0,0 +1,15 @@
+from src.models.cms import Company, CompanyPhoto
+
+
+def test_loaded_and_expired_instances_serialize_alike(database):
+    company = Company(name='Padaria', category='alimentacao', approved=True, latitude=-23.3, longitude=-47.1)
+    company.photos = [CompanyPhoto(filename='a.jpg')]
+    database.session.add(company)
+    database.session.commit()
+
+    expired = company.to_dict()  # após o commit: colunas recarregadas pelo ORM
+    loaded = company.to_dict()  # tudo no __dict__: leitura direta
+    assert loaded == expired
+    assert tuple(loaded) == Company.__dict__['to_dict'].fields
+    assert loaded['photos'][0]['url'] == '/api/photos/a.jpg'
+    assert loaded['version'] == 1
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from src.models.cms import BackgroundTask, Company, News
+from src.routes.news import add_views
+from src.utils.suggest import _index_path, suggest_index
+
+
+@pytest.fixture(autouse=True)
+def fresh_index():
+    path = _index_path()
+    if os.path.exists(path):
+        os.remove(path)
+    suggest_index._segment = None
+    suggest_index._checked = 0.0
+    yield path
+
+
+def test_writes_share_one_pending_refresh(database):
+    for index in range(3):
+        database.session.add(Company(name=f'Padaria {index}', category='alimentacao', approved=True))
+        database.session.commit()
+
+    assert BackgroundTask.query.filter_by(name='suggest.refresh', status='pending').count() == 1
+
+
+@pytest.mark.parametrize('content', [b'', b'garbage', b'SUGG2\x01'])
+def test_corrupt_index_is_rebuilt(app, database, fresh_index, content):
+    database.session.add(Company(name='Padaria Central', category='alimentacao', approved=True))
+    database.session.commit()
+    with open(fresh_index, 'wb') as index_file:
+        index_file.write(content)
+
+    with app.test_request_context():
+        results = suggest_index.search('pada')
+    assert [item['text'] for item in results] == ['Padaria Central']
+
+
+def test_view_counts_schedule_a_refresh(database):
+    article = News(title='Feira', content='-', category='cidade', author='Redação', published=True)
+    database.session.add(article)
+    database.session.commit()
+    BackgroundTask.query.update({'status': 'done'})
+    database.session.commit()
+
+    add_views(article.id, count=5)
+    database.session.commit()
+    assert BackgroundTask.query.filter_by(name='suggest.refresh', status='pending').count() == 1
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from src.models.cms import Company, CompanyPhoto
+from src.utils.pagination import encode_cursor
+from src.utils.sync import SyncTokenExpired, changes_since, current_token
+
+
+@pytest.fixture(autouse=True)
+def no_overlap(app, monkeypatch):
+    # Sem a margem de reenvio: cada sync devolve só o que mudou depois do token
+    monkeypatch.setitem(app.config, 'SYNC_OVERLAP', timedelta(0))
+
+
+def _companies(database, *names):
+    companies = [Company(name=name, category='alimentacao', approved=True) for name in names]
+    database.session.add_all(companies)
+    database.session.commit()
+    return companies
+
+
+def test_token_round_trip(database):
+    first, second, third = _companies(database, 'Padaria', 'Mercado', 'Farmácia')
+
+    rows, deleted, token, has_more = changes_since(Company, '0', 2)
+    assert [row.id for row in rows] == [first.id, second.id]
+    assert has_more
+
+    rows, deleted, token, has_more = changes_since(Company, token, 2)
+    assert [row.id for row in rows] == [third.id]
+    assert not has_more
+
+    rows, deleted, token, has_more = changes_since(Company, token, 2)
+    assert rows == [] and deleted == []
+
+    second.phone = '11 4529-0000'
+    database.session.delete(third)
+    database.session.commit()
+
+    rows, deleted, token, has_more = changes_since(Company, token, 10)
+    assert [row.id for row in rows] == [second.id]
+    assert deleted == [third.id]
+
+    rows, deleted, _, _ = changes_since(Company, token, 10)
+    assert rows == [] and deleted == []
+
+
+def test_current_token_skips_existing_rows(database):
+    _companies(database, 'Padaria')
+    token = current_token()
+    rows, deleted, _, _ = changes_since(Company, token, 10)
+    assert rows == [] and deleted == []
+
+
+def test_expired_token(client, database):
+    old = datetime.utcnow() - timedelta(days=365)
+    token = encode_cursor([old, 0, old, 0])
+
+    with pytest.raises(SyncTokenExpired):
+        changes_since(Company, token, 10)
+    assert client.get(f'/api/companies?changed_since={token}').status_code == 410
+
+
+def test_listing_reports_hidden_rows_as_deleted(client, database):
+    visible, hidden = _companies(database, 'Padaria', 'Mercado')
+    response = client.get('/api/companies?changed_since=0')
+    body = response.get_json()
+    assert [item['id'] for item in body['companies']] == [visible.id, hidden.id]
+
+    hidden.approved = False
+    database.session.commit()
+
+    body = client.get(f'/api/companies?changed_since={body["sync_token"]}').get_json()
+    assert body['companies'] == []
+    assert body['deleted'] == [hidden.id]
+
+
+def test_listing_loads_photos_in_one_query(client, database):
+    for company in _companies(database, 'Padaria', 'Mercado', 'Farmácia'):
+        database.session.add(CompanyPhoto(company_id=company.id, filename=f'{company.id}.jpg'))
+    database.session.commit()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(database.engine, 'before_cursor_execute', record)
+    try:
+        body = client.get('/api/companies?changed_since=0').get_json()
+    finally:
+        event.remove(database.engine, 'before_cursor_execute', record)
+
+    assert all(len(item['photos']) == 1 for item in body['companies'])
+    assert sum('FROM company_photo' in statement for statement in statements) == 1
@@ -0,0 +1,36 @@
+import pytest
+
+from src.models.cms import BackgroundTask, News
+from src.routes.news import flush_views
+from src.utils.tasks import claim_next, enqueue, run_worker
+
+
+@pytest.mark.parametrize('returning', [True, False])
+def test_claim_next_with_and_without_returning(app, database, monkeypatch, returning):
+    monkeypatch.setattr(database.engine.dialect, 'update_returning', returning)
+    first = enqueue('news.add_views', {'news_id': 1}, priority=0)
+    urgent = enqueue('news.add_views', {'news_id': 2}, priority=5)
+    database.session.commit()
+
+    row = claim_next('worker-1')
+    assert (row.id, row.name, row.attempts) == (urgent.id, 'news.add_views', 1)
+    assert claim_next('worker-2').id == first.id
+    assert claim_next('worker-3') is None
+    assert database.session.get(BackgroundTask, urgent.id, populate_existing=True).locked_by == 'worker-1'
+
+
+def test_views_are_flushed_outside_the_request(app, client, database):
+    article = News(title='Feira', content='-', category='cidade', author='Redação', published=True)
+    database.session.add(article)
+    database.session.commit()
+
+    for _ in range(3):
+        assert client.get(f'/api/news/{article.id}').status_code == 200
+    views = BackgroundTask.query.filter_by(name='news.add_views')
+    assert views.count() == 0  # GET não grava nada
+
+    flush_views()
+    assert [task.payload for task in views] == [f'{{"news_id": {article.id}, "count": 3}}']
+
+    run_worker(app, once=True)
+    assert database.session.get(News, article.id, populate_existing=True).views == 3
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from src.models.cms import Flipbook, UploadSession
+from src.routes import uploads
+from src.utils.flipbook_pages import FLIPBOOK_FOLDER, FlipbookUnavailable, pymupdf
+
+
+def _pdf():
+    document = pymupdf.open()
+    document.new_page(width=200, height=300)
+    return document.tobytes()
+
+
+def _upload(client, flipbook_id, content):
+    upload = client.post('/api/uploads', json={
+        'kind': 'flipbook_pdf', 'target_id': flipbook_id, 'filename': 'revista.pdf', 'size': len(content)
+    }).get_json()['upload']
+    assert client.put(f'/api/uploads/{upload["id"]}?offset=0', data=content).status_code == 200
+    return upload['id']
+
+
+@pytest.mark.skipif(pymupdf is None, reason='PyMuPDF não instalado')
+def test_failed_pdf_finalize_can_be_retried(admin_client, database, monkeypatch):
+    flipbook = Flipbook(title='Revista')
+    database.session.add(flipbook)
+    database.session.commit()
+    upload_id = _upload(admin_client, flipbook.id, _pdf())
+    before = set(os.listdir(FLIPBOOK_FOLDER)) if os.path.isdir(FLIPBOOK_FOLDER) else set()
+
+    def broken(flipbook):
+        raise FlipbookUnavailable('falhou')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(uploads, 'generate_thumbnail', broken)
+        assert admin_client.post(f'/api/uploads/{upload_id}/finalize').status_code == 400
+    assert set(os.listdir(FLIPBOOK_FOLDER)) == before
+    assert database.session.get(UploadSession, upload_id) is not None
+
+    response = admin_client.post(f'/api/uploads/{upload_id}/finalize')
+    assert response.status_code == 201
+    pdf_filename = response.get_json()['flipbook']['pdf_filename']
+    assert os.path.exists(os.path.join(FLIPBOOK_FOLDER, pdf_filename))
+    assert database.session.get(UploadSession, upload_id, populate_existing=True) is None
@@ -0,0 +1,358 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_cors import cross_origin
+from datetime import datetime, timedelta
+import click
+import os
+import shutil
+import uuid
+from flask.cli import with_appcontext
+
+from src.models.cms import db, Company, Flipbook, Property, UploadSession
+from src.routes.auth import require_admin
+from src.routes.companies import allowed_file, store_company_photo
+from src.routes.properties import store_property_photo
+from src.utils.file_cleanup import delete_files_after_commit
+from src.utils.images import ImageRejected
+from src.utils.tasks import enqueue
+from src.utils.flipbook_pages import (
+    FLIPBOOK_FOLDER, FlipbookUnavailable, generate_thumbnail, pymupdf
+)
+
+uploads_bp = Blueprint('uploads', __name__)
+
+# Partes recebidas ficam fora de static/ até a finalização
+UPLOAD_SESSIONS_DIR = os.environ.get('UPLOAD_SESSIONS_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'database', 'upload_sessions'
+)
+
+# Padrões (podem ser sobrescritos via app.config)
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+MAX_PHOTO_UPLOAD_SIZE = 32 * 1024 * 1024
+MAX_PDF_UPLOAD_SIZE = 200 * 1024 * 1024
+RECOMMENDED_CHUNK_SIZE = 1024 * 1024
+COPY_BUFFER_SIZE = 64 * 1024
+
+# tipo -> (modelo de destino, limite de tamanho, validação do nome)
+UPLOAD_KINDS = {
+    'company_photo': (Company, MAX_PHOTO_UPLOAD_SIZE, allowed_file),
+    'property_photo': (Property, MAX_PHOTO_UPLOAD_SIZE, allowed_file),
+    'flipbook_pdf': (Flipbook, MAX_PDF_UPLOAD_SIZE, lambda name: name.lower().endswith('.pdf')),
+}
+
+# Flipbooks só são alterados por admin (como nas rotas de admin)
+ADMIN_UPLOAD_KINDS = {'flipbook_pdf'}
+
+FLIPBOOK_URL_PREFIX = '/uploads/flipbooks/'
+
+
+def _admin_error(kind):
+    """Resposta 401/403 se o tipo exige admin e a sessão não é de admin (senão None)"""
+    if kind not in ADMIN_UPLOAD_KINDS:
+        return None
+    return require_admin(lambda: None)()
+
+
+def _part_path(upload):
+    return os.path.join(UPLOAD_SESSIONS_DIR, upload.id + '.part')
+
+
+def _session_dict(upload):
+    return {
+        'id': upload.id,
+        'kind': upload.kind,
+        'target_id': upload.target_id,
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.received,
+        'expires_at': upload.expires_at,
+        'chunk_size': RECOMMENDED_CHUNK_SIZE
+    }
+
+
+def _get_active_session(upload_id):
+    upload = UploadSession.query.get(upload_id)
+    if upload is None or upload.expires_at < datetime.utcnow():
+        return None
+    return upload
+
+
+def expire_upload_sessions(limit=100):
+    """Remover sessões abandonadas (linha + arquivo parcial)"""
+    expired = UploadSession.query.filter(
+        UploadSession.expires_at < datetime.utcnow()
+    ).limit(limit).all()
+    for upload in expired:
+        try:
+            os.remove(_part_path(upload))
+        except FileNotFoundError:
+            pass
+        db.session.delete(upload)
+    db.session.commit()
+    return len(expired)
+
+
+@uploads_bp.route('/uploads', methods=['POST'])
+@cross_origin()
+def create_upload_session():
+    """Iniciar um upload em partes: {kind, target_id, filename, size}"""
+    try:
+        data = request.json or {}
+        kind = data.get('kind')
+        filename = os.path.basename(data.get('filename') or '')
+        target_id = data.get('target_id')
+        size = data.get('size')
+
+        if kind not in UPLOAD_KINDS:
+            return jsonify({'error': f'Tipo inválido: use {", ".join(UPLOAD_KINDS)}'}), 400
+        denied = _admin_error(kind)
+        if denied:
+            return denied
+
+        model, max_size, valid_name = UPLOAD_KINDS[kind]
+
+        if not filename or not valid_name(filename):
+            return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
+        if not isinstance(size, int) or size <= 0 or size > max_size:
+            return jsonify({'error': f'Tamanho inválido (máximo de {max_size // (1024 * 1024)} MB)'}), 400
+        if not isinstance(target_id, int) or model.query.get(target_id) is None:
+            return jsonify({'error': 'Destino do upload não encontrado'}), 404
+
+        # Limpeza oportunista de sessões abandonadas
+        expire_upload_sessions()
+
+        ttl = current_app.config.get('UPLOAD_SESSION_TTL', UPLOAD_SESSION_TTL)
+        upload = UploadSession(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            target_id=target_id,
+            filename=filename,
+            size=size,
+            received=0,
+            expires_at=datetime.utcnow() + ttl
+        )
+
+        os.makedirs(UPLOAD_SESSIONS_DIR, exist_ok=True)
+        open(_part_path(upload), 'wb').close()
+
+        db.session.add(upload)
+        db.session.commit()
+
+        return jsonify({'success': True, 'upload': _session_dict(upload)}), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@uploads_bp.route('/uploads/<upload_id>', methods=['GET'])
+@cross_origin()
+def get_upload_session(upload_id):
+    """Consultar o offset atual para retomar o envio"""
+    upload = _get_active_session(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Sessão de upload não encontrada ou expirada'}), 404
+    denied = _admin_error(upload.kind)
+    if denied:
+        return denied
+    return jsonify({'upload': _session_dict(upload)})
+
+
+@uploads_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@cross_origin()
+def upload_chunk(upload_id):
+    """Enviar uma parte: corpo binário, ?offset=N (deve ser o offset atual)"""
+    try:
+        upload = _get_active_session(upload_id)
+        if upload is None:
+            return jsonify({'error': 'Sessão de upload não encontrada ou expirada'}), 404
+        denied = _admin_error(upload.kind)
+        if denied:
+            return denied
+
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({'error': 'Informe o parâmetro offset'}), 400
+        if offset != upload.received:
+            return jsonify({'error': 'Offset fora de ordem', 'offset': upload.received}), 409
+
+        written = 0
+        with open(_part_path(upload), 'r+b') as part:
+            part.seek(offset)
+            while True:
+                chunk = request.stream.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                if offset + written + len(chunk) > upload.size:
+                    return jsonify({'error': 'Parte ultrapassa o tamanho declarado'}), 400
+                part.write(chunk)
+                written += len(chunk)
+
+        if written == 0:
+            return jsonify({'error': 'Parte vazia'}), 400
+
+        # Só avança se ninguém avançou antes (partes concorrentes do mesmo upload)
+        ttl = current_app.config.get('UPLOAD_SESSION_TTL', UPLOAD_SESSION_TTL)
+        updated = UploadSession.query.filter_by(id=upload.id, received=offset).update({
+            'received': offset + written,
+            'expires_at': datetime.utcnow() + ttl
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if not updated:
+            db.session.refresh(upload)
+            return jsonify({'error': 'Offset fora de ordem', 'offset': upload.received}), 409
+
+        return jsonify({'success': True, 'offset': offset + written, 'size': upload.size})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+def _finalize_photo(upload, path):
+    if upload.kind == 'company_photo':
+        target = Company.query.get(upload.target_id)
+        store = store_company_photo
+    else:
+        target = Property.query.get(upload.target_id)
+        store = store_property_photo
+    if target is None:
+        return None
+    with open(path, 'rb') as stream:
+        photo = store(target, stream, upload.filename)
+    db.session.flush()
+    return {'photo': photo.to_dict()}
+
+
+def _finalize_pdf(upload, path, created):
+    flipbook = Flipbook.query.get(upload.target_id)
+    if flipbook is None:
+        return None
+    with open(path, 'rb') as stream:
+        if stream.read(5) != b'%PDF-':
+            raise ImageRejected('Arquivo PDF inválido')
+
+    # PDF e capa anteriores saem só depois do commit
+    replaced = [flipbook.pdf_filename] if flipbook.pdf_filename else []
+    if flipbook.thumbnail_url and flipbook.thumbnail_url.startswith(FLIPBOOK_URL_PREFIX):
+        replaced.append(flipbook.thumbnail_url[len(FLIPBOOK_URL_PREFIX):])
+
+    os.makedirs(FLIPBOOK_FOLDER, exist_ok=True)
+    filename = uuid.uuid4().hex + '.pdf'
+    target = os.path.join(FLIPBOOK_FOLDER, filename)
+    # A .part fica até o commit: se a capa ou o commit falharem, a sessão
+    # (received == size) continua válida para uma nova finalização
+    try:
+        os.link(path, target)
+    except OSError:
+        shutil.copyfile(path, target)
+    created.append(target)
+
+    flipbook.pdf_filename = filename
+    flipbook.pdf_url = f'{FLIPBOOK_URL_PREFIX}{filename}'
+
+    # Capa gerada a partir da primeira página (também valida o PDF)
+    if pymupdf is not None:
+        try:
+            generate_thumbnail(flipbook)
+        except (FlipbookUnavailable, IndexError) as e:
+            raise ImageRejected('Arquivo PDF inválido') from e
+        created.append(os.path.join(FLIPBOOK_FOLDER, flipbook.thumbnail_url[len(FLIPBOOK_URL_PREFIX):]))
+        # Primeiras páginas renderizadas em segundo plano após o commit
+        enqueue('flipbooks.prerender', {'flipbook_id': flipbook.id, 'pdf_filename': filename})
+
+    delete_files_after_commit(
+        [name for name in replaced if os.path.join(FLIPBOOK_FOLDER, name) not in created], folder='flipbooks'
+    )
+    return {'flipbook': flipbook.to_dict()}
+
+
+def _discard(paths):
+    # Arquivos gravados por uma finalização que não chegou ao commit
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@uploads_bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@cross_origin()
+def finalize_upload(upload_id):
+    """Concluir o upload e entregar o arquivo ao processamento normal"""
+    created = []
+    try:
+        upload = _get_active_session(upload_id)
+        if upload is None:
+            return jsonify({'error': 'Sessão de upload não encontrada ou expirada'}), 404
+        denied = _admin_error(upload.kind)
+        if denied:
+            return denied
+        if upload.received != upload.size:
+            return jsonify({'error': 'Upload incompleto', 'offset': upload.received, 'size': upload.size}), 409
+
+        path = _part_path(upload)
+        if upload.kind == 'flipbook_pdf':
+            result = _finalize_pdf(upload, path, created)
+        else:
+            result = _finalize_photo(upload, path)
+
+        if result is None:
+            return jsonify({'error': 'Destino do upload não encontrado'}), 404
+
+        db.session.delete(upload)
+        db.session.commit()
+
+        if os.path.exists(path):
+            os.remove(path)
+
+        result.update({'success': True, 'message': 'Upload concluído com sucesso'})
+        return jsonify(result), 201
+
+    except ImageRejected as e:
+        db.session.rollback()
+        _discard(created)
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        _discard(created)
+        return jsonify({'error': str(e)}), 500
+
+
+@uploads_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@cross_origin()
+def abort_upload(upload_id):
+    """Cancelar um upload em partes"""
+    try:
+        upload = UploadSession.query.get(upload_id)
+        if upload is None:
+            return jsonify({'error': 'Sessão de upload não encontrada'}), 404
+        denied = _admin_error(upload.kind)
+        if denied:
+            return denied
+
+        path = _part_path(upload)
+        db.session.delete(upload)
+        db.session.commit()
+
+        if os.path.exists(path):
+            os.remove(path)
+
+        return jsonify({'success': True, 'message': 'Upload cancelado'})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@click.command('uploads-expire')
+@with_appcontext
+def expire_uploads_command():
+    """Remover sessões de upload em partes expiradas"""
+    total = 0
+    while True:
+        removed = expire_upload_sessions()
+        total += removed
+        if removed == 0:
+            break
+    click.echo(f'{total} sessões de upload expiradas removidas')